@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比 Premailer 与预编译样式表的 CSS 内联吞吐量，并校验两者输出逐字节一致。
+
+用法:
+    python benchmarks/bench_css_inliner.py [--paragraphs 400] [--rounds 20]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from premailer import Premailer
+
+from publishers.css_inliner import CompiledStylesheet
+
+ROOT = Path(__file__).parent.parent
+
+
+def build_body(paragraphs: int) -> str:
+    """生成一篇带标题、列表、代码、引用和表格的长文章"""
+    parts = []
+    for i in range(paragraphs):
+        parts.append(f'<h2>第 {i} 节</h2><p>正文 <a href="#s{i}">链接</a> 与 <code>code</code>。</p>')
+        if i % 5 == 0:
+            parts.append('<ul><li>一</li><li>二</li></ul><blockquote><p>引用</p></blockquote>')
+        if i % 10 == 0:
+            parts.append('<pre><code>print("hello")</code></pre><img src="a.png">'
+                         '<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>1</td></tr></tbody></table>')
+    return ''.join(parts)
+
+
+def measure(label: str, func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {rounds / elapsed:8.2f} 篇/秒 ({elapsed / rounds * 1000:.1f} ms/篇)")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='CSS 内联吞吐量基准')
+    parser.add_argument('--paragraphs', type=int, default=400, help='文章段落数')
+    parser.add_argument('--rounds', type=int, default=20, help='每种实现的重复次数')
+    args = parser.parse_args()
+
+    css = (ROOT / 'publishers' / 'style.css').read_text(encoding='utf-8')
+    html = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>bench</title><style>{css}</style></head>'
+            f'<body><article class="markdown-body">{build_body(args.paragraphs)}</article></body></html>')
+
+    expected = Premailer(html, remove_classes=True).transform()
+    compiled = CompiledStylesheet(css, remove_classes=True)
+    if compiled.inline(html) != expected:
+        print("输出不一致！")
+        return 1
+    print(f"输出逐字节一致 ({len(expected)} 字节)")
+
+    baseline = measure('Premailer', lambda: Premailer(html, remove_classes=True).transform(), args.rounds)
+    fast = measure('Compiled', lambda: compiled.inline(html), args.rounds)
+    print(f"加速比: {baseline / fast:.2f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比上传大文件时的峰值内存：requests 的 files= 与流式 multipart 编码，
+以及封面图压缩时整图解码与按比例缩小解码。
+
+每个场景在独立的子进程中运行，报告子进程自身的峰值 RSS（PIL 在 C 层分配的内存
+tracemalloc 统计不到）。请求体发往本地的丢弃型 HTTP 服务器，走完整的发送路径。
+
+用法:
+    python benchmarks/bench_upload_memory.py [--size-mb 40] [--pixels 6000x4000]
+"""
+
+import argparse
+import http.server
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SCENARIOS = {
+    'requests-files': '上传 (requests files=)',
+    'streaming': '上传 (流式编码)',
+    'decode-full': '压缩 (整图解码)',
+    'decode-draft': '压缩 (缩小解码)',
+}
+
+
+class DiscardHandler(http.server.BaseHTTPRequestHandler):
+    """读取并丢弃请求体"""
+
+    def do_POST(self):
+        remaining = int(self.headers['Content-Length'])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+def run_scenario(scenario: str, path: str) -> None:
+    """在当前（子）进程中执行一个场景"""
+    if scenario in ('requests-files', 'streaming'):
+        import requests
+        from utils.multipart import post_file
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), DiscardHandler)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_port}/upload'
+        with requests.Session() as session:
+            if scenario == 'requests-files':
+                with open(path, 'rb') as f:
+                    session.post(url, files={'media': (os.path.basename(path), f)}).raise_for_status()
+            else:
+                post_file(session, url, 'media', path).raise_for_status()
+    else:
+        from PIL import Image
+
+        from utils.image_pipeline import DEFAULT_MAX_DIMENSION as COMPRESS_MAX_DIMENSION
+
+        with Image.open(path) as img:
+            if scenario == 'decode-full':
+                img = img.convert('RGB')
+            else:
+                img.draft('RGB', (COMPRESS_MAX_DIMENSION, COMPRESS_MAX_DIMENSION))
+                img.thumbnail((COMPRESS_MAX_DIMENSION, COMPRESS_MAX_DIMENSION))
+                img = img.convert('RGB')
+        with tempfile.TemporaryFile() as out:
+            img.save(out, 'jpeg', quality=85, optimize=True)
+
+
+def own_peak_rss_mb() -> float:
+    """当前进程的峰值 RSS（MB）"""
+    try:
+        # VmHWM 只统计 exec 之后的地址空间，不会继承父进程 fork 时的内存
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def peak_rss_mb(scenario: str, path: str) -> float:
+    """在子进程中运行场景，返回其峰值 RSS（MB）"""
+    result = subprocess.run([sys.executable, __file__, '--child', scenario, path],
+                            check=True, capture_output=True, text=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='大文件上传与图片压缩的峰值内存基准')
+    parser.add_argument('--size-mb', type=int, default=40, help='上传文件大小（MB）')
+    parser.add_argument('--pixels', default='6000x4000', help='待压缩 JPEG 的尺寸，如 6000x4000')
+    parser.add_argument('--child', nargs=2, metavar=('SCENARIO', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        scenario, path = args.child
+        if scenario != 'baseline':
+            run_scenario(scenario, path)
+        else:
+            import requests  # noqa: F401
+            import utils.multipart  # noqa: F401
+        print(f'{own_peak_rss_mb():.1f}')
+        return 0
+
+    from PIL import Image
+
+    with tempfile.TemporaryDirectory() as tmp:
+        blob = os.path.join(tmp, 'original.bin')
+        with open(blob, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1 << 20))
+
+        width, height = (int(v) for v in args.pixels.split('x'))
+        photo = os.path.join(tmp, 'original.jpg')
+        Image.linear_gradient('L').resize((width, height)).convert('RGB').save(photo, 'jpeg', quality=95)
+
+        print(f"{'基线 (仅导入 requests)':<20} {peak_rss_mb('baseline', ''):8.1f} MB")
+        for scenario, source in (('requests-files', blob), ('streaming', blob),
+                                 ('decode-full', photo), ('decode-draft', photo)):
+            print(f"{SCENARIOS[scenario]:<20} {peak_rss_mb(scenario, source):8.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
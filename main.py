@@ -2,27 +2,43 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sqlite3
 import sys
+import threading
 import time
 from pathlib import Path
 import argparse
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional
 import logging
-# from watchdog.observers import Observer
-# from watchdog.events import FileSystemEventHandler, LoggingEventHandler
-# Watchdog 在当前环境下行为异常，我们用手动轮询替代。
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+# Watchdog 在当前环境下行为异常，目录监控由 utils.watcher 实现 (inotify / 轮询回退)。
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent.absolute()))
 
-from utils.config import Config
+from utils.config import Config, as_list
 from utils.logger import setup_logging, get_logger
-from publishers.base import BasePublisher
-from utils.file_utils import move_file_to_published
+from publishers.registry import PUBLISHER_REGISTRY, LazyPublishers, get_publisher_class
+from utils.file_utils import move_file_to_published, wait_for_quiescence
+from utils.job_queue import JobQueue, activate
+from utils.metrics import PUBLISH_SECONDS, PUBLISHES, get_metrics, start_metrics_exporter
+from utils.scan_index import ScanIndex
+from utils.timing import StepTimer
+from utils.worker_pool import WorkerPool
+from utils.watcher import (EVENT_CREATED, EVENT_DELETED, EVENT_MOVED, create_watcher,
+                           normalize_file_types, scan_directory)
+
+if TYPE_CHECKING:
+    # 发布器基类会导入 requests 等较重的依赖，运行时只在扫描 publishers 目录时导入
+    from publishers.base import BasePublisher
 
 logger = get_logger('main')
 
+# 检查是否有到期需要重试的发布任务的间隔（秒）
+JOB_RETRY_CHECK_INTERVAL = 5.0
+
 class AccountNameFilter(logging.Filter):
     """为没有 account_name 的日志记录添加默认值 'System'"""
     def filter(self, record):
@@ -31,12 +47,35 @@ class AccountNameFilter(logging.Filter):
         return True
 
 class DocumentHandler:
-    """处理文件发布逻辑"""
-    def __init__(self, config: Config, publishers: Dict[str, BasePublisher]):
+    """
+    处理文件发布逻辑，文件被提交到有界线程池中并发发布。
+
+    给出 worker_pool 时，publish 调用在工作进程中执行，线程池中的线程只负责调度和移动文件。
+    """
+    def __init__(self, config: Config, publishers: Dict[str, 'BasePublisher'], scan_index: Optional[ScanIndex] = None,
+                 job_queue: Optional[JobQueue] = None, worker_pool: Optional[WorkerPool] = None):
         self.config = config
         self.publishers = publishers
+        self.scan_index = scan_index if scan_index is not None else ScanIndex()
+        self.job_queue = job_queue if job_queue is not None else JobQueue()
+        self.worker_pool = worker_pool
         self.logger = get_logger('handler')
+
+        publish_config = self.config.get('publish', {}) or {}
+        self.max_workers = max(1, int(publish_config.get('max_workers', 4)))
+        if worker_pool is not None:
+            # 每个工作进程至少需要一个调度线程等待它的结果
+            self.max_workers = max(self.max_workers, worker_pool.workers)
+        self.quiescence = float(publish_config.get('quiescence', 0.5))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='publish')
+
+        # 以下集合均由 _lock 保护
+        self._lock = threading.Lock()
         self.processing_files = set()
+        self._rerun_files = set()
+        self._futures = set()
+        self._account_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._fanout: Optional[ThreadPoolExecutor] = None
 
     def _is_markdown_file(self, file_path: str) -> bool:
         """检查文件是否是Markdown文件"""
@@ -45,17 +84,138 @@ class DocumentHandler:
         allowed_exts = watch_config.get('file_types', ['.md', '.markdown'])
         return file_ext in [ext if ext.startswith('.') else f'.{ext}' for ext in allowed_exts]
 
-    def _process_file(self, file_path: str, processed_files: set) -> None:
-        """处理单个文件"""
-        file_path_obj = Path(file_path).resolve()
-
-        if str(file_path_obj) in self.processing_files:
-            self.logger.info(f"文件 {file_path_obj.name} 正在处理中，跳过")
+    def forget_file(self, file_path: str) -> None:
+        """文件被删除或移出监控目录后，清除其索引记录和未完成的任务"""
+        file_key = str(Path(file_path).resolve())
+        self.scan_index.remove(file_key)
+        self.job_queue.remove(file_key)
+
+    def submit_due_jobs(self) -> int:
+        """
+        提交到了重试时间的失败任务
+
+        Returns:
+            提交的任务数
+        """
+        submitted = 0
+        for path in self.job_queue.due():
+            with self._lock:
+                # 已在线程池中排队或正在处理的文件不重复提交
+                if path in self.processing_files:
+                    continue
+            if self.submit(path) is not None:
+                submitted += 1
+        return submitted
+
+    def _claim(self, file_key: str) -> bool:
+        """
+        原子地将文件标记为处理中
+
+        Returns:
+            bool: 标记成功返回 True；文件已在处理中则记下需要重跑并返回 False
+        """
+        with self._lock:
+            if file_key in self.processing_files:
+                self._rerun_files.add(file_key)
+                return False
+            self.processing_files.add(file_key)
+            return True
+
+    def _release(self, file_key: str) -> bool:
+        """
+        解除文件的处理中标记
+
+        Returns:
+            bool: 处理期间文件又发生了变更，需要重新提交时返回 True
+        """
+        with self._lock:
+            self.processing_files.discard(file_key)
+            if file_key in self._rerun_files:
+                self._rerun_files.discard(file_key)
+                return True
+            return False
+
+    def _account_slot(self, account_name: str, publisher: 'BasePublisher') -> threading.BoundedSemaphore:
+        """获取账户的并发槽位，限制同一账户同时进行的发布数量"""
+        with self._lock:
+            slot = self._account_slots.get(account_name)
+            if slot is None:
+                slot = threading.BoundedSemaphore(max(1, publisher.max_concurrency))
+                self._account_slots[account_name] = slot
+            return slot
+
+    def submit(self, file_path: str) -> Optional[Future]:
+        """
+        将文件提交到线程池处理
+
+        Returns:
+            Future 对象；文件已在处理中时返回 None，处理结束后会自动重新提交
+        """
+        file_key = str(Path(file_path).resolve())
+        if not self._claim(file_key):
+            self.logger.info(f"文件 {Path(file_key).name} 正在处理中，将在本次处理结束后重新检查")
+            return None
+
+        future = self.executor.submit(self._run_claimed, file_key)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(lambda f: self._task_done(file_key, f))
+        return future
+
+    def _task_done(self, file_key: str, future: Future) -> None:
+        """线程池任务完成时的回调函数"""
+        with self._lock:
+            self._futures.discard(future)
+        if future.cancelled():
+            self._release(file_key)
             return
+        exc = future.exception()
+        if exc is not None:
+            self.logger.error(f"后台处理文件 {Path(file_key).name} 时发生严重错误: {exc}", exc_info=exc)
+
+    def _run_claimed(self, file_key: str) -> None:
+        """在工作线程中处理已标记的文件，结束后按需重新提交"""
+        try:
+            self._process_claimed(file_key)
+        finally:
+            if self._release(file_key):
+                self.submit(file_key)
 
-        if file_path in processed_files:
-            self.logger.info(f"文件 {file_path_obj.name} 已经处理过，跳过")
+    def wait(self) -> None:
+        """等待所有已提交（包括处理过程中重新提交）的任务完成"""
+        while True:
+            with self._lock:
+                pending = list(self._futures)
+            if not pending:
+                return
+            futures_wait(pending)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        if wait:
+            self.wait()
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        with self._lock:
+            fanout, self._fanout = self._fanout, None
+        if fanout is not None:
+            fanout.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _process_file(self, file_path: str) -> None:
+        """在当前线程中同步处理单个文件"""
+        file_key = str(Path(file_path).resolve())
+        if not self._claim(file_key):
+            self.logger.info(f"文件 {Path(file_key).name} 正在处理中，跳过")
             return
+        try:
+            self._process_claimed(file_key)
+        finally:
+            rerun = self._release(file_key)
+        if rerun:
+            self._process_file(file_key)
+
+    def _process_claimed(self, file_key: str) -> None:
+        """处理单个已被标记为处理中的文件"""
+        file_path_obj = Path(file_key)
 
         watch_dir = Path(self.config.get_paths().get('watch_dir', 'documents')).resolve()
         try:
@@ -64,33 +224,71 @@ class DocumentHandler:
             self.logger.warning(f"文件 {file_path_obj} 不在监控目录 {watch_dir} 中，跳过")
             return
 
+        try:
+            fingerprint = self.scan_index.fingerprint(file_key)
+        except FileNotFoundError:
+            self.logger.info(f"文件 {file_path_obj.name} 已不存在，跳过")
+            self.job_queue.remove(file_key)
+            return
+
+        # 发布成功但移动文件失败的任务仍在队列中，需要继续完成
+        if self.scan_index.is_unchanged(file_key, fingerprint) and not self.job_queue.has_job(file_key):
+            self.logger.debug(f"文件 {file_path_obj.name} 已经处理过且内容未变化，跳过")
+            return
+
         self.logger.info(f"检测到文件变更: {file_path_obj}")
-        self.processing_files.add(str(file_path_obj))
 
-        time.sleep(1)
+        # 等待文件写入完成，而不是固定休眠
+        if not wait_for_quiescence(file_path_obj, settle=self.quiescence):
+            self.logger.info(f"文件 {file_path_obj.name} 在等待写入完成时被删除，跳过")
+            return
 
+        results = {}
+        publishers = {}
+        moved = False
+        checkpoints = []
         try:
-            results = {}
+            # 等待写入完成后重新计算指纹，记录的是实际发布的内容
+            fingerprint = self.scan_index.fingerprint(file_key)
+
             rel_path = file_path_obj.relative_to(watch_dir)
-            account_name = rel_path.parts[0] if len(rel_path.parts) > 1 else None
+            targets = self._resolve_targets(file_path_obj, rel_path)
 
-            if not account_name:
-                self.logger.warning(f"文件 {file_path_obj.name} 不在任何账户子目录下，跳过")
+            if not targets:
+                self.logger.warning(f"文件 {file_path_obj.name} 不在任何账户子目录下，也没有指定发布目标，跳过")
                 return
 
-            publisher = self.publishers.get(account_name)
-
-            if not publisher:
-                self.logger.warning(f"在 config.yaml 中未找到名为 '{account_name}' 的账户配置，跳过")
+            for account_name in targets:
+                publisher = self.publishers.get(account_name)
+                if publisher:
+                    publishers[account_name] = publisher
+                else:
+                    self.logger.warning(f"在 config.yaml 中未找到名为 '{account_name}' 的账户配置，跳过")
+            if not publishers:
                 return
 
-            self.logger.info(f"使用发布器 {account_name} 处理文件: {file_path_obj.name}")
-            try:
-                success = publisher.publish(str(file_path_obj))
-                results[account_name] = success
-            except Exception as e:
-                self.logger.error(f"发布器 {account_name} 处理时发生异常: {e}", exc_info=True)
-                results[account_name] = False
+            pending = {}
+            for account_name, publisher in publishers.items():
+                checkpoint = self.job_queue.start(file_key, account_name, fingerprint.content_hash)
+                checkpoints.append(checkpoint)
+                if checkpoint.done('draft'):
+                    # 上次运行已在平台上创建成功，只差移动文件
+                    self.logger.info(f"文件 {file_path_obj.name} 已发布到 {account_name}，从移动文件步骤继续")
+                    results[account_name] = True
+                else:
+                    pending[account_name] = (publisher, checkpoint)
+
+            if len(pending) > 1:
+                # 扇出发布：正文只渲染一次，各账户并发发布，结果按账户汇总
+                self._prerender(file_key, [publisher for publisher, _ in pending.values()])
+                futures = {account_name: self._fanout_executor().submit(
+                               self._publish_target, account_name, publisher, file_key, checkpoint)
+                           for account_name, (publisher, checkpoint) in pending.items()}
+                for account_name, future in futures.items():
+                    results[account_name] = future.result()
+            else:
+                for account_name, (publisher, checkpoint) in pending.items():
+                    results[account_name] = self._publish_target(account_name, publisher, file_key, checkpoint)
             
             if not results:
                 self.logger.warning(f"没有为文件 {file_path_obj.name} 找到匹配的发布器")
@@ -102,19 +300,157 @@ class DocumentHandler:
                (move_on_success == 'any' and any(results.values())):
                 self.logger.info(f"文件 {file_path_obj.name} 发布成功，将被移动。")
                 published_dir = self.config.get_paths().get('published_dir', 'published')
-                move_file_to_published(file_path_obj, str(watch_dir), published_dir)
+                with get_metrics().stage('move'):
+                    moved = move_file_to_published(file_path_obj, str(watch_dir), published_dir) is not None
+                if moved:
+                    for checkpoint in checkpoints:
+                        checkpoint.complete('move')
             else:
                 failed_platforms = [k for k, v in results.items() if not v]
                 self.logger.error(f"文件 {file_path_obj.name} 未能成功发布到: {', '.join(failed_platforms)}")
 
+        except FileNotFoundError:
+            self.logger.info(f"文件 {file_path_obj.name} 已不存在，跳过")
         except Exception as e:
             self.logger.error(f"处理文件时发生错误: {e}", exc_info=True)
         finally:
-            self.processing_files.discard(str(file_path_obj))
-            processed_files.add(file_path)
+            if moved:
+                self.scan_index.remove(file_key)
+                self._forget_publish(file_key, publishers)
+            elif results:
+                # 只记录真正执行过发布的文件，未配置账户的文件在配置更新后仍会被重新处理
+                self.scan_index.record(file_key, fingerprint, results)
+            for checkpoint in checkpoints:
+                self._finish_job(checkpoint, file_path_obj.name, results, moved)
+
+    def _forget_publish(self, file_key: str, publishers: Dict[str, 'BasePublisher']) -> None:
+        """文件已移到发布目录，删除各账户的发布记录，之后放入的同名文件按新文章发布"""
+        for account_name, publisher in publishers.items():
+            forget = getattr(publisher, 'forget_publish', None)
+            if forget is None:
+                continue
+            try:
+                forget(file_key)
+            except Exception as e:
+                self.logger.warning(f"删除 {account_name} 的发布记录失败: {e}")
+
+    def _resolve_targets(self, file_path: Path, rel_path: Path) -> List[str]:
+        """
+        确定文件要发布到的账户
+
+        front matter 中的 targets 优先；否则按 config.yaml 中 routing 表查找文件所在的子目录；
+        子目录不在路由表中时，子目录名即账户名。
+        """
+        targets = read_front_matter_targets(file_path)
+        if not targets:
+            directory = rel_path.parts[0] if len(rel_path.parts) > 1 else None
+            routing = self.config.get('routing') or {}
+            if directory in routing:
+                targets = as_list(routing[directory])
+            elif directory:
+                targets = [directory]
+        return list(dict.fromkeys(targets))
+
+    def _fanout_executor(self) -> ThreadPoolExecutor:
+        """
+        扇出发布使用的线程池
+
+        文件级线程池的线程会阻塞等待各账户的发布结果，账户发布放在独立的线程池中以免互相等待而死锁。
+        """
+        with self._lock:
+            if self._fanout is None:
+                self._fanout = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fanout')
+            return self._fanout
+
+    def _prerender(self, file_key: str, publishers: List['BasePublisher']) -> None:
+        """
+        扇出发布前渲染一次正文
+
+        渲染结果按内容缓存在进程内，各发布器的 process_markdown 直接取得缓存的结果；
+        Markdown 扩展不同的发布器渲染结果不同，各渲染一次。发布在工作进程中执行时由工作进程各自渲染。
+        """
+        if self.worker_pool is not None:
+            return
+        rendered = set()
+        for publisher in publishers:
+            render = getattr(publisher, 'process_markdown', None)
+            extensions = tuple(getattr(publisher, 'markdown_extensions', ()))
+            if render is None or extensions in rendered:
+                continue
+            rendered.add(extensions)
+            try:
+                render(file_key)
+            except Exception as e:
+                self.logger.warning(f"预先渲染文件 {Path(file_key).name} 失败，将由各发布器分别渲染: {e}")
+
+    def _publish_target(self, account_name: str, publisher: 'BasePublisher', file_key: str, checkpoint) -> bool:
+        """在账户的并发槽位内发布到一个账户，成功后记录草稿步骤"""
+        if checkpoint.attempts > 1:
+            done_steps = list(checkpoint.steps) or ['无']
+            self.logger.info(f"第 {checkpoint.attempts} 次处理文件 {Path(file_key).name} ({account_name})，"
+                             f"已完成的步骤: {', '.join(done_steps)}")
+        self.logger.info(f"使用发布器 {account_name} 处理文件: {Path(file_key).name}")
+        with self._account_slot(account_name, publisher):
+            start = time.perf_counter()
+            try:
+                result = self._publish(account_name, publisher, file_key, checkpoint)
+            except Exception as e:
+                self.logger.error(f"发布器 {account_name} 处理时发生异常: {e}", exc_info=True)
+                result = False
+            labels = {'platform': getattr(publisher, 'platform_name', ''), 'account': account_name}
+            get_metrics().observe(PUBLISH_SECONDS, time.perf_counter() - start, **labels)
+            get_metrics().inc(PUBLISHES, result='success' if result else 'failure', **labels)
+        if result and not checkpoint.done('draft'):
+            checkpoint.complete('draft')
+        return bool(result)
+
+    def _publish(self, account_name: str, publisher: 'BasePublisher', file_key: str, checkpoint) -> bool:
+        """在当前线程或工作进程中执行 publish，各阶段的耗时汇总为一行日志"""
+        if self.worker_pool is not None:
+            return self.worker_pool.publish(account_name, file_key, checkpoint)
+        with activate(checkpoint), get_metrics().trace() as trace:
+            result = publisher.publish(file_key)
+        self.logger.info(f"发布耗时 ({account_name}): {trace.summary()}")
+        return result
+
+    def _finish_job(self, checkpoint, file_name: str, results: Dict[str, bool], moved: bool) -> None:
+        """发布和移动都完成时结束任务，否则安排重试"""
+        if not results.get(checkpoint.account):
+            error = 'publish'
+        elif not moved and not checkpoint.done('move'):
+            error = 'move'
+        else:
+            self.job_queue.finish(checkpoint.path, checkpoint.account)
+            return
+        next_run_at = self.job_queue.fail(checkpoint.path, checkpoint.account, error)
+        if next_run_at is None:
+            self.logger.error(f"文件 {file_name} 已尝试 {checkpoint.attempts} 次仍未完成，"
+                              f"在文件内容变化或程序重启前不再重试")
+        else:
+            self.logger.info(f"文件 {file_name} 将在 {max(0.0, next_run_at - time.time()):.0f} 秒后重试")
+
+
+def read_front_matter_targets(file_path: Path) -> List[str]:
+    """
+    读取文件 front matter 中的 targets（要发布到的账户），没有或无法解析时返回空列表
+
+    解析结果缓存在进程内，随后各发布器读取同一文件时不再重复解析。
+    """
+    from publishers.document import load_document
+    try:
+        metadata = load_document(file_path).metadata
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        logger.warning(f"[System] - 解析文件 {file_path.name} 的 front matter 失败: {e}")
+        return []
+    return as_list(metadata.get('targets'))
 
-def load_publisher_classes(directory: str) -> Dict[str, type[BasePublisher]]:
+
+def load_publisher_classes(directory: str) -> Dict[str, 'type[BasePublisher]']:
     """动态加载指定目录下的所有发布器类。"""
+    from publishers.base import BasePublisher
+
     publisher_classes = {}
     publishers_dir = Path(__file__).parent / directory
     for filename in os.listdir(publishers_dir):
@@ -134,32 +470,59 @@ def load_publisher_classes(directory: str) -> Dict[str, type[BasePublisher]]:
                 logger.error(f"[System] - 导入模块 {module_name} 失败: {e}")
     return publisher_classes
 
-def initialize_publishers(config: Dict) -> Dict[str, BasePublisher]:
-    """根据配置初始化所有发布器。"""
-    publishers = {}
-    common_config = config.get('common', {})
+def initialize_publishers(config: Dict) -> Mapping[str, 'BasePublisher']:
+    """
+    根据配置登记所有账户的发布器。
+
+    发布器模块在账户第一次处理文件时才导入、实例才创建（登录也推迟到第一次调用平台接口时），
+    未登记在 PUBLISHER_REGISTRY 中的平台才会扫描 publishers 目录查找。
+    """
+    factories = {}
+    common_config = dict(config.get('common', {}) or {})
+    # 上传缓存默认持久化到文件，重启后内容未变的图片无需再次上传
+    common_config.setdefault('upload_cache_file', '.publisher_upload_cache.db')
+    # 访问令牌在多个进程之间共享，避免各自刷新而互相顶掉
+    common_config.setdefault('token_cache_file', '.publisher_tokens.json')
+    # 图片转码结果按内容寻址缓存，同一张图片对每种规格只转码一次
+    common_config.setdefault('image_cache_dir', (config.get('paths') or {}).get('image_cache_dir',
+                                                                                 '.publisher_image_cache'))
+    # 网络图片的下载缓存，超过 download_cache_max_mb 后淘汰最久未使用的文件
+    common_config.setdefault('download_cache_dir', (config.get('paths') or {}).get('download_cache_dir',
+                                                                                       '.publisher_download_cache'))
+    # 按源文件记录上次发布的草稿和文章各部分的哈希，再次发布时只重做变化的部分并原地更新草稿
+    common_config.setdefault('publish_state_file', (config.get('paths') or {}).get('publish_state_file',
+                                                                                       '.publisher_state.db'))
+    # 共享的 HTTP 连接池和超时设置
+    common_config.setdefault('http', config.get('http') or {})
     accounts_config = config.get('accounts', {})
-    publisher_classes = load_publisher_classes('publishers')
+    scanned_classes = None
 
     if not accounts_config:
         logger.error("[System] - 配置文件 config.yaml 中未找到 'accounts' 部分。")
-        return {}
+        return LazyPublishers({})
 
     for account_name, account_config in accounts_config.items():
-        platform = account_config.get('platform')
+        # 示例配置中使用 type 字段指定平台
+        platform = account_config.get('platform') or account_config.get('type')
         if not platform:
             logger.error(f"[System] - 账户 '{account_name}' 缺少 'platform' 字段。")
             continue
 
-        if platform not in publisher_classes:
-            logger.warning(f"[System] - 未找到平台 '{platform}' 的发布器实现 (账户: {account_name})。")
-            continue
+        if platform not in PUBLISHER_REGISTRY:
+            if scanned_classes is None:
+                scanned_classes = load_publisher_classes('publishers')
+            if platform not in scanned_classes:
+                logger.warning(f"[System] - 未找到平台 '{platform}' 的发布器实现 (账户: {account_name})。")
+                continue
+
+        def create(platform=platform, account_name=account_name, account_config=account_config):
+            publisher_class = get_publisher_class(platform) or scanned_classes[platform]
+            return publisher_class(account_name, account_config, common_config)
 
-        PublisherClass = publisher_classes[platform]
-        publishers[account_name] = PublisherClass(account_name, account_config, common_config)
-        logger.info(f"[System] - 成功加载账户: {account_name} (平台: {platform})")
+        factories[account_name] = create
+        logger.info(f"[System] - 成功登记账户: {account_name} (平台: {platform})")
 
-    return publishers
+    return LazyPublishers(factories)
 
 def create_directories(config: Config):
     """创建必要的目录"""
@@ -182,12 +545,17 @@ def main():
     parser.add_argument('--config', '-c', default='config.yaml', help='配置文件路径')
     parser.add_argument('--env', '-e', default='.env', help='环境变量文件路径')
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='在 N 个工作进程中执行发布，以利用多个 CPU 核心 (默认 0: 在主进程的线程中执行)')
 
     args = parser.parse_args()
+    # 记录启动各步骤的耗时
+    startup = StepTimer()
 
     # 提前加载配置以获取日志设置
     try:
-        config = Config(config_path=args.config, env_path=args.env)
+        with startup.step('加载配置'):
+            config = Config(config_path=args.config, env_path=args.env)
     except Exception as e:
         logging.basicConfig()
         logging.error(f"初始化配置失败: {e}", exc_info=True)
@@ -225,8 +593,10 @@ def main():
 
     logger.info("--- 正在启动多平台内容发布工具 ---")
     try:
-        create_directories(config)
-        publishers = initialize_publishers(config.get_config())
+        with startup.step('创建目录'):
+            create_directories(config)
+        with startup.step('登记发布器'):
+            publishers = initialize_publishers(config.get_config())
         if not publishers:
             logger.error("没有加载任何发布器，程序将退出。请检查您的配置。")
             return 1
@@ -245,65 +615,133 @@ def main():
         logger.error(f"错误：监控目录不存在: {watch_dir}")
         return 1
 
-    event_handler = DocumentHandler(config, publishers)
-    processed_files = set()
-    file_states = {}
-    POLL_INTERVAL = 2  # 每2秒检查一次
+    index_file = config.get_paths().get('index_file', '.publisher_index.db')
+    try:
+        with startup.step('打开扫描索引'):
+            scan_index = ScanIndex(index_file)
+    except sqlite3.Error as e:
+        logger.error(f"打开扫描索引 {index_file} 失败: {e}", exc_info=True)
+        return 1
+    logger.info(f"扫描索引: {Path(index_file).absolute()} (已记录 {len(scan_index)} 个文件)")
 
-    logger.info(f"--- 启动文件监控轮询 (每 {POLL_INTERVAL} 秒)... 按 CTRL+C 退出 ---")
+    job_queue_file = config.get_paths().get('job_queue_file', '.publisher_jobs.db')
+    try:
+        with startup.step('打开任务队列'):
+            job_queue = JobQueue(job_queue_file, retry=(config.get('publish', {}) or {}).get('job_retry'))
+            recovered = job_queue.recover()
+    except sqlite3.Error as e:
+        logger.error(f"打开任务队列 {job_queue_file} 失败: {e}", exc_info=True)
+        scan_index.close()
+        return 1
+    logger.info(f"任务队列: {Path(job_queue_file).absolute()} (未完成 {len(job_queue)} 个任务"
+                f"{f'，其中 {recovered} 个在上次运行中中断' if recovered else ''})")
 
+    worker_pool = None
+    if args.workers > 0:
+        with startup.step('启动工作进程'):
+            worker_pool = WorkerPool(args.workers, args.config, args.env, initialize_publishers,
+                                     job_queue_path=job_queue_file, log_level=log_level)
+        logger.info(f"多进程模式: {worker_pool.workers} 个发布工作进程")
+
+    metrics_exporter = None
     try:
-        while True:
-            print(f"\n[{time.strftime('%H:%M:%S')}] --- 正在轮询目录: {watch_dir}")
-            # 扫描目录获取当前所有md文件
-            current_files = set()
-            for root, _, files in os.walk(watch_dir):
-                for file in files:
-                    if file.endswith(('.md', '.markdown')):
-                        current_files.add(os.path.join(root, file))
-            
-            if not current_files:
-                print(f"[{time.strftime('%H:%M:%S')}] -> 未发现 .md/.markdown 文件。")
-            else:
-                print(f"[{time.strftime('%H:%M:%S')}] -> 发现文件: {[Path(f).name for f in current_files]}")
-
-            # 检查文件变更
-            for path in current_files:
-                try:
-                    mtime = os.path.getmtime(path)
-                    print(f"[{time.strftime('%H:%M:%S')}]    - 正在检查: {Path(path).name} (修改时间: {mtime})")
-                    if path not in file_states:
-                        print(f"[{time.strftime('%H:%M:%S')}]      -> [发现新文件]，准备处理...")
-                        logger.info(f"发现新文件: {path}")
-                        file_states[path] = mtime
-                        event_handler._process_file(path, processed_files)
-                    elif file_states[path] != mtime:
-                        print(f"[{time.strftime('%H:%M:%S')}]      -> [文件被修改] (旧时间: {file_states[path]})，准备处理...")
-                        logger.info(f"文件被修改: {path}")
-                        file_states[path] = mtime
-                        event_handler._process_file(path, processed_files)
-                except FileNotFoundError:
-                    # 文件可能在扫描和获取mtime之间被删除
-                    if path in file_states: del file_states[path]
-                    continue
-            
-            # 检查已删除的文件
-            deleted_files = set(file_states.keys()) - current_files
-            for path in deleted_files:
-                logger.info(f"文件被删除: {path}")
-                del file_states[path]
+        metrics_exporter = start_metrics_exporter(config.get('metrics'))
+    except OSError as e:
+        logger.error(f"启动指标导出失败，将不导出指标: {e}")
+    if metrics_exporter is not None:
+        if metrics_exporter.address:
+            logger.info(f"指标接口: http://{metrics_exporter.address[0]}:{metrics_exporter.address[1]}/metrics")
+        if metrics_exporter.file:
+            logger.info(f"指标文件: {Path(metrics_exporter.file).absolute()}")
+
+    event_handler = DocumentHandler(config, publishers, scan_index, job_queue, worker_pool)
+    watch_config = config.get_watch_config()
+    file_types = normalize_file_types(watch_config.get('file_types', ['.md', '.markdown']))
+
+    def process_existing_files():
+        """与索引做一次目录比对，只处理新增或内容变化的文件"""
+        existing = sorted(str(Path(p).resolve()) for p in scan_directory(watch_dir, file_types))
+        pruned = scan_index.prune(existing)
+        if pruned:
+            logger.info(f"已从索引中移除 {pruned} 个不存在的文件记录")
+        for path in existing:
+            event_handler.submit(path)
+        # 上次运行中断或失败、文件已不在扫描结果中的任务（如已发布、等待移动的文件）
+        event_handler.submit_due_jobs()
+
+    # 如果设置了 --once，则只扫描一次现有文件，处理完后退出
+    if args.once:
+        try:
+            with startup.step('扫描现有文件'):
+                process_existing_files()
+            logger.info(f"启动耗时: {startup.summary()}")
+            event_handler.shutdown(wait=True)
+        finally:
+            if worker_pool is not None:
+                worker_pool.shutdown()
+            if metrics_exporter is not None:
+                metrics_exporter.close()
+            scan_index.close()
+            job_queue.close()
+        logger.info("已完成一次性发布任务，程序将退出。")
+        return 0
 
-            # 如果设置了 --once，则在处理完所有文件后退出
-            if args.once:
-                logger.info("已完成一次性发布任务，程序将退出。")
-                break
+    try:
+        # 先建立监控再扫描现有文件，避免两步之间的变更被遗漏
+        with startup.step('建立文件监控'):
+            watcher = create_watcher(
+                watch_dir,
+                file_types=file_types,
+                backend=watch_config.get('backend', 'auto'),
+                debounce=float(watch_config.get('debounce', 0.5)),
+                poll_interval=float(watch_config.get('poll_interval', 2)),
+            )
+    except (OSError, ValueError) as e:
+        logger.error(f"初始化文件监控失败: {e}", exc_info=True)
+        event_handler.shutdown(wait=False)
+        if worker_pool is not None:
+            worker_pool.shutdown(wait=False)
+        if metrics_exporter is not None:
+            metrics_exporter.close()
+        scan_index.close()
+        job_queue.close()
+        return 1
 
-            time.sleep(POLL_INTERVAL)
+    logger.info(f"--- 启动文件监控 (后端: {watcher.backend_name})... 按 CTRL+C 退出 ---")
+
+    try:
+        with startup.step('扫描现有文件'):
+            process_existing_files()
+        logger.info(f"启动耗时: {startup.summary()}")
+
+        while True:
+            # 定期醒来检查到期的重试任务
+            for event in watcher.wait(timeout=JOB_RETRY_CHECK_INTERVAL):
+                if event.event_type == EVENT_DELETED:
+                    logger.info(f"文件被删除: {event.path}")
+                    event_handler.forget_file(event.path)
+                    continue
+                if event.event_type == EVENT_CREATED:
+                    logger.info(f"发现新文件: {event.path}")
+                elif event.event_type == EVENT_MOVED:
+                    logger.info(f"文件被移入: {event.path}")
+                else:
+                    logger.info(f"文件被修改: {event.path}")
+                event_handler.submit(event.path)
+            event_handler.submit_due_jobs()
 
     except KeyboardInterrupt:
-        logger.info("\n检测到手动中断 (CTRL+C)，程序正在退出...")
+        logger.info("\n检测到手动中断 (CTRL+C)，正在等待后台发布任务完成...")
     finally:
-        logger.info("轮询监控已停止。")
+        watcher.close()
+        event_handler.shutdown(wait=True)
+        if worker_pool is not None:
+            worker_pool.shutdown()
+        if metrics_exporter is not None:
+            metrics_exporter.close()
+        scan_index.close()
+        job_queue.close()
+        logger.info("文件监控已停止。")
     
     return 0 # 正常退出
 
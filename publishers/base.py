@@ -1,17 +1,46 @@
 from abc import ABC, abstractmethod
+import asyncio
+import functools
+import hashlib
+import json
 import logging
 import logging
 import os
 import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-from markdown import Markdown
-import frontmatter
-from bs4 import BeautifulSoup
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Any
+import requests
 from urllib.parse import urlparse
 
+from utils.async_http import AsyncHttpError
 from utils.config import Config
+from utils.download_cache import DownloadCache, get_download_cache
+from utils.file_utils import get_file_checksum
+from utils.http_transport import HttpTransport, get_http_transport
+from utils.image_pipeline import ImageProfile, get_image_pipeline
+from utils.job_queue import current_checkpoint
 from utils.logger import get_logger
+from utils.metrics import (API_REQUEST_SECONDS, API_RETRIES, CACHE_HITS, CACHE_MISSES, UPLOAD_BYTES,
+                           MetricsRegistry, get_metrics)
+from utils.publish_state import PublishState, get_publish_state
+from utils.rate_limiter import RateLimiter
+from utils.retry import RetryPolicy, request_not_sent, retry_after
+from utils.upload_cache import get_upload_cache
+
+from .document import SourceDocument, clear_document_cache, get_markdown_converter, load_document
+# 请求本身就表示"未处理"的状态码，任何请求都可以重试
+RETRYABLE_STATUS_CODES = {429, 503}
+# 平台可能已经处理了请求的服务端错误，只重试幂等的请求
+IDEMPOTENT_RETRYABLE_STATUS_CODES = {500, 502, 504}
+
+
+def clear_render_cache() -> None:
+    """清空渲染缓存（解析后的文档及其渲染结果）。"""
+    clear_document_cache()
 
 
 class AccountLogFilter(logging.Filter):
@@ -27,6 +56,13 @@ class AccountLogFilter(logging.Filter):
 
 class BasePublisher(ABC):
     platform_name: str = ''
+    markdown_extensions: Tuple[str, ...] = ('meta', 'extra', 'sane_lists', 'tables', 'fenced_code')
+    # 平台接口的默认限流配置：接口名 -> {rate, burst, max_concurrency, min_concurrency}，
+    # 'default' 用于未单独列出的接口；账户配置中的 rate_limits 会覆盖同名接口的配置
+    rate_limits: Dict[str, Dict[str, Any]] = {}
+    # 上传前的图片规格：用途（如 'content' 正文图片、'cover' 封面）-> {max_dimension, format, quality, max_bytes}，
+    # 未列出的用途直接上传原图；账户配置中的 image_profiles 会覆盖同名用途的配置，设为 null 表示不处理
+    image_profiles: Dict[str, Dict[str, Any]] = {}
     """
     所有发布平台的基类。
     定义了发布器的通用接口和常用功能。
@@ -44,6 +80,31 @@ class BasePublisher(ABC):
         self.account_name = account_name
         self.platform_config = platform_config
         self.common_config = common_config
+        # 同一账户允许同时发布的文件数量，默认串行以避免平台侧的并发冲突
+        self.max_concurrency = int(platform_config.get('max_concurrency', 1))
+        # 同一账户同时进行的图片上传数量上限，跨该账户的所有并发发布共享
+        self.image_upload_concurrency = max(1, int(platform_config.get('image_upload_concurrency', 4)))
+        self._upload_slots = threading.BoundedSemaphore(self.image_upload_concurrency)
+        # 异步上传的并发上限，asyncio.Semaphore 只能在创建它的事件循环中使用，按事件循环分别创建
+        self._async_upload_slots: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = \
+            weakref.WeakKeyDictionary()
+        # 每个接口一个限流器，首次调用该接口时按配置创建
+        self._rate_limiters: Dict[str, RateLimiter] = {}
+        self._rate_limiters_lock = threading.Lock()
+        # 需要登录的平台在首次调用接口时才登录，避免某个平台不可达拖慢所有账户的启动
+        self._logged_in = False
+        self._login_lock = threading.Lock()
+        # 网络错误和平台暂时性错误的重试策略
+        self.retry_policy = RetryPolicy.from_config(platform_config.get('retry'))
+        # 按内容哈希缓存上传结果，所有发布器共享，未配置文件路径时仅在内存中共享
+        self.upload_cache = get_upload_cache((common_config or {}).get('upload_cache_file'))
+        # 发布各阶段的耗时、上传字节数、缓存命中和重试次数，所有发布器共享
+        self.metrics: MetricsRegistry = get_metrics()
+        # 共享的 HTTP 连接池和超时设置，各发布器通过 create_session() 创建自己的会话
+        self.http: HttpTransport = get_http_transport((common_config or {}).get('http'))
+        # 上传前的图片缩放和压缩，转码结果缓存在所有发布器共享的目录中
+        self.image_pipeline = get_image_pipeline((common_config or {}).get('image_cache_dir'),
+                                                 (common_config or {}).get('image_workers'))
         # 使用 self.platform_name() 获取子类定义的平台名，使日志更清晰
         logger_instance = logging.getLogger(f"publisher.{self.platform_name}.{self.account_name}")
 
@@ -69,6 +130,16 @@ class BasePublisher(ABC):
             bool: 如果发布成功则返回 True, 否则返回 False。
         """
         raise NotImplementedError
+
+    async def publish_async(self, file_path: str, **kwargs) -> bool:
+        """
+        异步发布单个文件，参数和返回值同 publish。
+
+        默认在线程池中运行同步的 publish，使尚未提供原生异步实现的发布器也能由事件循环驱动；
+        子类可以覆盖为基于异步 HTTP 客户端的实现。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.publish, file_path, **kwargs))
     
     def process_markdown(self, file_path: str) -> Tuple[str, Dict[str, Any]]:
         """
@@ -81,31 +152,447 @@ class BasePublisher(ABC):
             tuple: 包含(html内容, 元数据字典)的元组。
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                post = frontmatter.load(f)
-            
-            # 使用markdown库转换内容为HTML
-            md = Markdown(extensions=['meta', 'extra', 'sane_lists', 'tables', 'fenced_code'])
-            html_content = md.convert(post.content)
-            
-            # 提取元数据
-            metadata = {}
-            for key, value in post.metadata.items():
-                if isinstance(value, (str, int, float, bool)) or value is None:
-                    metadata[key] = value
-                elif isinstance(value, (list, tuple)) and all(isinstance(x, (str, int, float, bool)) for x in value):
-                    metadata[key] = value[0] if len(value) == 1 else value
-            
-            # 确保有标题
-            if 'title' not in metadata:
-                metadata['title'] = Path(file_path).stem
-            
-            return html_content, metadata
+            # 同一内容只解析、渲染一次，结果由所有账户共享
+            document = self.load_document(file_path)
+            with self.stage('render'):
+                html_content = document.html(tuple(self.markdown_extensions))
+            return html_content, self.article_metadata(file_path, document)
             
         except Exception as e:
             self.log_error(f"处理Markdown文件时出错: {e}", exc_info=True)
             raise
     
+    def load_document(self, file_path: str) -> SourceDocument:
+        """
+        读取文章的平台无关中间表示（元数据、块结构和图片引用），同一内容在进程内只解析一次。
+
+        接受 Markdown 的平台用 `document.render_markdown` 生成正文，需要 HTML 的平台使用 process_markdown。
+        """
+        with self.stage('parse'):
+            return load_document(file_path)
+
+    def stage(self, name: str):
+        """
+        记录发布阶段的耗时（按平台和账户），用法: with self.stage('upload'): ...
+
+        阶段名: parse, render, resolve, compress, upload, cover, images, sanitize, inline_styles, draft。
+        """
+        return self.metrics.stage(name, self.platform_name, self.account_name)
+
+    def _count_cache(self, hit: bool, cache: str, kind: str) -> None:
+        self.metrics.inc(CACHE_HITS if hit else CACHE_MISSES, cache=cache, kind=kind,
+                         platform=self.platform_name, account=self.account_name)
+
+    def _count_upload(self, file_path: str, kind: str) -> None:
+        """统计实际上传的字节数"""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return
+        self.metrics.inc(UPLOAD_BYTES, size, kind=kind, platform=self.platform_name, account=self.account_name)
+
+    @staticmethod
+    def article_metadata(file_path: str, document: SourceDocument) -> Dict[str, Any]:
+        """文章的元数据副本，调用方可以修改；未指定标题时以文件名为标题。"""
+        metadata = dict(document.metadata)
+        # 默认标题取决于文件名，不放入按内容缓存的文档中
+        if 'title' not in metadata:
+            metadata['title'] = Path(file_path).stem
+        return metadata
+
+    @property
+    def publish_state(self) -> Optional[PublishState]:
+        """
+        按源文件记录的上次发布结果，所有发布器共享；未配置 publish_state_file 时不记录，
+        每次发布都按新文章处理。
+        """
+        db_path = (self.common_config or {}).get('publish_state_file')
+        return get_publish_state(db_path) if db_path else None
+
+    def forget_publish(self, content_path: str) -> None:
+        """
+        删除源文件在本账户的发布记录。
+
+        文件发布后被移出监控目录，之后放入的同名文件是另一篇文章，不能沿用旧的草稿。
+        """
+        state = self.publish_state
+        if state is not None:
+            state.remove(self.platform_name, self.account_name, os.path.abspath(content_path))
+
+    def cached_upload(self, file_path: str, upload: Callable[[str], Optional[str]],
+                      kind: str = 'image', ttl: Optional[float] = None) -> Optional[str]:
+        """
+        带缓存的上传：文件内容与之前上传过的完全相同时直接返回上次的结果。
+
+        Args:
+            file_path: 本地文件路径。
+            upload: 实际执行上传的函数，返回远程地址或 media_id，失败返回 None。
+            kind: 上传类型，同一文件以不同方式上传（如正文图片与封面）时需要区分。
+            ttl: 结果的有效期（秒），用于平台返回的地址或 media_id 会过期的情况。
+
+        Returns:
+            远程地址或 media_id，上传失败返回 None。
+        """
+        try:
+            content_hash = get_file_checksum(file_path, 'sha256')
+        except OSError:
+            # 文件无法读取时交给上传函数报告具体错误
+            return upload(file_path)
+
+        cached = self.upload_cache.get(self.platform_name, self.account_name, content_hash, kind)
+        self._count_cache(bool(cached), 'upload', kind)
+        if cached:
+            self.log_info(f"命中上传缓存，跳过上传: {os.path.basename(file_path)}")
+            return cached
+
+        result = upload(file_path)
+        if result:
+            self._count_upload(file_path, kind)
+            self.upload_cache.put(self.platform_name, self.account_name, content_hash, result, kind, ttl)
+        return result
+
+    def image_profile(self, purpose: str) -> Optional[ImageProfile]:
+        """
+        获取某种用途的图片规格，没有配置时返回 None（上传原图）。
+
+        Args:
+            purpose: 图片用途，如 'content'、'cover'。
+        """
+        overrides = self.platform_config.get('image_profiles') or {}
+        if purpose in overrides and not overrides[purpose]:
+            return None
+        config = {**self.image_profiles.get(purpose, {}), **(overrides.get(purpose) or {})}
+        return ImageProfile.from_config(f"{self.platform_name}.{purpose}", config) if config else None
+
+    def prepare_images(self, image_paths: List[str], purpose: str) -> Dict[str, str]:
+        """
+        按用途的图片规格缩放、压缩图片，需要转码的多张图片在进程池中并行处理。
+
+        Returns:
+            dict: 原图路径到应当上传的文件路径的映射；无需处理或处理失败的图片映射到原图。
+        """
+        profile = self.image_profile(purpose)
+        if profile is None or not image_paths:
+            return {path: path for path in image_paths}
+        with self.stage('compress'):
+            return self.image_pipeline.prepare(image_paths, profile)
+
+    def create_session(self) -> requests.Session:
+        """创建使用共享连接池的 HTTP 会话，cookie 和请求头只属于该发布器。"""
+        return self.http.session()
+
+    def prepare_image(self, image_path: str, purpose: str) -> str:
+        """prepare_images 的单张图片版本，返回应当上传的文件路径。"""
+        return self.prepare_images([image_path], purpose)[image_path]
+
+    @property
+    def download_cache(self) -> DownloadCache:
+        """网络图片的下载缓存，所有发布器共享，第一次使用时才打开。"""
+        common = self.common_config or {}
+        max_mb = common.get('download_cache_max_mb')
+        return get_download_cache(common.get('download_cache_dir'),
+                                  int(max_mb) * 1024 * 1024 if max_mb is not None else None,
+                                  session_factory=self.http.session)
+
+    def fetch_remote_images(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """
+        并发下载网络图片，已下载过的图片经条件请求验证后直接使用缓存的文件。
+
+        Returns:
+            dict: 图片地址到本地文件路径的映射，下载失败为 None。
+        """
+        with self.stage('resolve'):
+            return self.download_cache.fetch_many(urls)
+
+    def upload_images_concurrently(self, image_paths: List[str],
+                                   upload: Callable[[str], Optional[str]]) -> Dict[str, Optional[str]]:
+        """
+        并发上传多张图片，同一路径只上传一次。
+
+        Args:
+            image_paths: 本地图片路径列表，可以包含重复项。
+            upload: 上传单张图片的函数，返回远程地址，失败返回 None。
+
+        Returns:
+            dict: 图片路径到上传结果的映射。
+        """
+        unique_paths = list(dict.fromkeys(image_paths))
+        if not unique_paths:
+            return {}
+
+        def upload_with_slot(image_path: str) -> Optional[str]:
+            with self._upload_slots:
+                try:
+                    return upload(image_path)
+                except Exception as e:
+                    self.log_error(f"上传图片时发生异常: {image_path}, {e}", exc_info=True)
+                    return None
+
+        workers = min(self.image_upload_concurrency, len(unique_paths))
+        with self.stage('upload'), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"upload-{self.account_name}") as executor:
+            return dict(zip(unique_paths, executor.map(upload_with_slot, unique_paths)))
+
+    async def cached_upload_async(self, file_path: str, upload: Callable[[str], Awaitable[Optional[str]]],
+                                  kind: str = 'image', ttl: Optional[float] = None) -> Optional[str]:
+        """cached_upload 的异步版本，upload 为协程函数。"""
+        try:
+            content_hash = await asyncio.to_thread(get_file_checksum, file_path, 'sha256')
+        except OSError:
+            return await upload(file_path)
+
+        cached = self.upload_cache.get(self.platform_name, self.account_name, content_hash, kind)
+        self._count_cache(bool(cached), 'upload', kind)
+        if cached:
+            self.log_info(f"命中上传缓存，跳过上传: {os.path.basename(file_path)}")
+            return cached
+
+        result = await upload(file_path)
+        if result:
+            self._count_upload(file_path, kind)
+            self.upload_cache.put(self.platform_name, self.account_name, content_hash, result, kind, ttl)
+        return result
+
+    async def upload_images_async(self, image_paths: List[str],
+                                  upload: Callable[[str], Awaitable[Optional[str]]]) -> Dict[str, Optional[str]]:
+        """upload_images_concurrently 的异步版本，upload 为协程函数，并发上限相同。"""
+        unique_paths = list(dict.fromkeys(image_paths))
+        if not unique_paths:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        slots = self._async_upload_slots.get(loop)
+        if slots is None:
+            slots = self._async_upload_slots[loop] = asyncio.Semaphore(self.image_upload_concurrency)
+
+        async def upload_with_slot(image_path: str) -> Optional[str]:
+            async with slots:
+                try:
+                    return await upload(image_path)
+                except Exception as e:
+                    self.log_error(f"上传图片时发生异常: {image_path}, {e}", exc_info=True)
+                    return None
+
+        with self.stage('upload'):
+            results = await asyncio.gather(*(upload_with_slot(path) for path in unique_paths))
+        return dict(zip(unique_paths, results))
+
+    def _login(self) -> bool:
+        """
+        登录平台，需要登录的子类覆盖此方法；不应在 __init__ 中直接调用，而是通过 ensure_login 按需登录。
+
+        Returns:
+            bool: 登录成功返回 True。
+        """
+        return True
+
+    def ensure_login(self) -> bool:
+        """
+        确保已登录：首次调用时登录，成功后不再重复登录，失败时下次调用会重试。
+        同一账户的多个线程同时调用时只登录一次。
+        """
+        with self._login_lock:
+            if not self._logged_in:
+                start = time.perf_counter()
+                self._logged_in = bool(self._login())
+                self.log_debug(f"登录耗时 {time.perf_counter() - start:.2f}s")
+            return self._logged_in
+
+    def rate_limiter(self, endpoint: str) -> RateLimiter:
+        """获取本账户某个接口的限流器。"""
+        with self._rate_limiters_lock:
+            limiter = self._rate_limiters.get(endpoint)
+            if limiter is None:
+                limits = {**self.rate_limits, **(self.platform_config.get('rate_limits') or {})}
+                limiter = RateLimiter.from_config(limits.get(endpoint, limits.get('default')))
+                self._rate_limiters[endpoint] = limiter
+            return limiter
+
+    def is_throttled(self, status_code: int, data: Any) -> bool:
+        """
+        判断响应是否表示请求被平台限流，子类可按平台的错误码扩展。
+
+        Args:
+            status_code: HTTP 状态码。
+            data: 解析后的 JSON 响应体，不是 JSON 时为 None。
+        """
+        return status_code == 429
+
+    def is_retryable_error(self, error: BaseException, idempotent: bool) -> bool:
+        """
+        判断发送请求时抛出的异常是否值得重试。
+
+        Args:
+            error: send 抛出的异常。
+            idempotent: 请求是否幂等；非幂等的请求只在确定尚未发出时重试。
+        """
+        if request_not_sent(error):
+            return True
+        return idempotent and isinstance(error, (requests.ConnectionError, requests.Timeout, AsyncHttpError))
+
+    def is_retryable_response(self, status_code: int, data: Any, idempotent: bool) -> bool:
+        """
+        判断响应是否表示可重试的暂时性错误，子类可按平台的错误码扩展。
+
+        Args:
+            status_code: HTTP 状态码。
+            data: 解析后的 JSON 响应体，不是 JSON 时为 None。
+            idempotent: 请求是否幂等。
+        """
+        if status_code in RETRYABLE_STATUS_CODES:
+            return True
+        return idempotent and status_code in IDEMPOTENT_RETRYABLE_STATUS_CODES
+
+    def _record_response(self, endpoint: str, limiter: RateLimiter, response: Any) -> Any:
+        """把响应是否被限流反馈给限流器，返回解析后的 JSON 响应体。"""
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        throttled = self.is_throttled(response.status_code, data)
+        limiter.record(throttled)
+        if throttled:
+            self.log_warning(f"接口 {endpoint} 触发平台限流，并发上限降至 {int(limiter.concurrency.limit)}")
+        return data
+
+    def _retry_delay(self, endpoint: str, attempt: int, idempotent: bool,
+                     error: Optional[BaseException] = None, response: Any = None,
+                     data: Any = None) -> Optional[float]:
+        """
+        判断第 attempt 次尝试的结果是否需要重试。
+
+        Returns:
+            重试前需要等待的秒数，不重试时返回 None。
+        """
+        if attempt >= self.retry_policy.max_attempts:
+            return None
+        if error is not None:
+            if not self.is_retryable_error(error, idempotent):
+                return None
+            reason = f"{type(error).__name__}: {error}"
+            delay = self.retry_policy.backoff(attempt)
+        else:
+            if not self.is_retryable_response(response.status_code, data, idempotent):
+                return None
+            reason = f"HTTP {response.status_code}"
+            if isinstance(data, dict):
+                code = data.get('errcode', data.get('err_no', data.get('code')))
+                if code is not None:
+                    reason += f", 错误码 {code}"
+            delay = self.retry_policy.backoff(attempt, retry_after(response))
+        self.log_warning(f"接口 {endpoint} 第 {attempt} 次请求失败（{reason}），{delay:.1f} 秒后重试")
+        self.metrics.inc(API_RETRIES, endpoint=endpoint, platform=self.platform_name, account=self.account_name)
+        return delay
+
+    def call_api(self, endpoint: str, send: Callable[[], Any], idempotent: bool = True) -> Any:
+        """
+        经由接口的限流器发送请求，网络错误和暂时性错误按重试策略退避后重试。
+
+        Args:
+            endpoint: 接口名，用于选择限流器，如 'draft/add'。
+            send: 发送请求的函数，返回带 status_code 和 json() 的响应对象；
+                每次重试都会重新调用，因此应在函数内构造请求体（如文件流）。
+            idempotent: 请求是否幂等。创建草稿等非幂等请求只在平台明确拒绝
+                或请求确定未发出时重试，并应配合 `create_once` 使用。
+
+        Returns:
+            最后一次尝试得到的响应。
+
+        Raises:
+            最后一次尝试中 send 抛出的异常。
+        """
+        limiter = self.rate_limiter(endpoint)
+        attempt = 1
+        while True:
+            try:
+                with limiter, self.metrics.timer(API_REQUEST_SECONDS, endpoint=endpoint,
+                                                 platform=self.platform_name, account=self.account_name):
+                    response = send()
+            except Exception as e:
+                delay = self._retry_delay(endpoint, attempt, idempotent, error=e)
+                if delay is None:
+                    raise
+            else:
+                data = self._record_response(endpoint, limiter, response)
+                delay = self._retry_delay(endpoint, attempt, idempotent, response=response, data=data)
+                if delay is None:
+                    return response
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_api_async(self, endpoint: str, send: Callable[[], Awaitable[Any]],
+                             idempotent: bool = True) -> Any:
+        """call_api 的异步版本，send 为协程函数。"""
+        limiter = self.rate_limiter(endpoint)
+        attempt = 1
+        while True:
+            try:
+                async with limiter:
+                    with self.metrics.timer(API_REQUEST_SECONDS, endpoint=endpoint,
+                                            platform=self.platform_name, account=self.account_name):
+                        response = await send()
+            except Exception as e:
+                delay = self._retry_delay(endpoint, attempt, idempotent, error=e)
+                if delay is None:
+                    raise
+            else:
+                data = self._record_response(endpoint, limiter, response)
+                delay = self._retry_delay(endpoint, attempt, idempotent, response=response, data=data)
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def idempotency_key(self, payload: Any) -> str:
+        """
+        计算请求内容的幂等键，内容完全相同的请求得到相同的键。
+
+        Args:
+            payload: 请求体，bytes 或可以序列化为 JSON 的对象。
+        """
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def create_once(self, create: Callable[[], Optional[str]], step: str = 'draft') -> Optional[str]:
+        """
+        保护非幂等的创建操作：创建成功后把平台侧的 ID 记入当前任务的 step 步骤，
+        同一任务重试时直接返回本任务已创建的 ID，而不再调用 create。
+
+        记录属于任务（文件 + 账户 + 内容），任务完成后即删除；有意的重新发布会创建新的内容。
+
+        Args:
+            create: 执行创建的函数，返回平台侧的 ID，失败返回 None。
+            step: 记录结果的任务步骤。
+
+        Returns:
+            平台侧的 ID，失败返回 None。
+        """
+        checkpoint = current_checkpoint()
+        created = checkpoint.result(step)
+        self._count_cache(bool(created), 'idempotency', step)
+        if created:
+            self.log_info(f"本任务已创建过 (ID: {created})，跳过重复创建")
+            return created
+        result = create()
+        if result:
+            checkpoint.complete(step, result)
+        return result
+
+    async def create_once_async(self, create: Callable[[], Awaitable[Optional[str]]],
+                                step: str = 'draft') -> Optional[str]:
+        """create_once 的异步版本，create 为协程函数。"""
+        checkpoint = current_checkpoint()
+        created = checkpoint.result(step)
+        self._count_cache(bool(created), 'idempotency', step)
+        if created:
+            self.log_info(f"本任务已创建过 (ID: {created})，跳过重复创建")
+            return created
+        result = await create()
+        if result:
+            checkpoint.complete(step, result)
+        return result
+
     def log_debug(self, message: str):
         """记录调试信息"""
         self.logger.debug(message)
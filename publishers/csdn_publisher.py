@@ -4,14 +4,18 @@ import time
 import json
 import uuid
 import hashlib
-import requests
 from typing import Dict, Optional, List, Any, Tuple
 from urllib.parse import urljoin, quote
 
+from utils.config import as_list
+from utils.multipart import post_file
+
 from .base import BasePublisher
+from .document import render_markdown
 
 class CSDNPublisher(BasePublisher):
     platform_name = 'csdn'
+    image_profiles = {'content': {'max_dimension': 1920, 'quality': 85, 'max_bytes': 5 * 1024 * 1024}}
     """CSDN平台发布器"""
     
     BASE_URL = "https://mp.csdn.net"
@@ -20,7 +24,7 @@ class CSDNPublisher(BasePublisher):
     
     def __init__(self, account_name: str, platform_config: dict, common_config: 'Config'):
         super().__init__(account_name, platform_config, common_config)
-        self.session = requests.Session()
+        self.session = self.create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'https://mp.csdn.net/',
@@ -28,7 +32,6 @@ class CSDNPublisher(BasePublisher):
         })
         self.username = self.platform_config.get('username')
         self.password = self.platform_config.get('password')
-        self._login()
     
     def _get_csrf_token(self) -> Optional[str]:
         """获取CSRF Token"""
@@ -43,8 +46,8 @@ class CSDNPublisher(BasePublisher):
     
     def _login(self) -> bool:
         """登录CSDN账号"""
-        self.username = self.config.get('username')
-        self.password = self.config.get('password')
+        self.username = self.platform_config.get('username')
+        self.password = self.platform_config.get('password')
         
         if not self.username or not self.password:
             self.log_error("缺少CSDN账号或密码配置")
@@ -121,21 +124,28 @@ class CSDNPublisher(BasePublisher):
             return False
     
     def upload_image(self, image_path: str) -> Optional[str]:
+        """上传图片到CSDN，内容相同的图片只上传一次"""
+        return self.cached_upload(self.prepare_image(image_path, 'content'), self._upload_image)
+
+    def _upload_image(self, image_path: str) -> Optional[str]:
         """上传图片到CSDN"""
+        if not self.ensure_login():
+            self.log_error("未登录，无法上传图片")
+            return None
+
         try:
-            with open(image_path, 'rb') as f:
-                files = {
-                    'file': (os.path.basename(image_path), f, 'image/jpeg')
+            response = self.call_api('upload_image', lambda: post_file(
+                self.session,
+                self.UPLOAD_IMAGE_URL,
+                'file',
+                image_path,
+                content_type='image/jpeg',
+                headers={
+                    'Referer': 'https://mp.csdn.net/mdeditor',
+                    'Origin': 'https://mp.csdn.net'
                 }
-                response = self.session.post(
-                    self.UPLOAD_IMAGE_URL,
-                    files=files,
-                    headers={
-                        'Referer': 'https://mp.csdn.net/mdeditor',
-                        'Origin': 'https://mp.csdn.net'
-                    }
-                )
-                
+            ))
+
             if response.status_code != 200:
                 self.log_error(f"上传图片失败: HTTP {response.status_code}")
                 return None
@@ -153,58 +163,28 @@ class CSDNPublisher(BasePublisher):
             self.log_error(f"上传图片过程中发生错误: {e}", exc_info=True)
             return None
     
-    def _process_content(self, content: str, image_dir: str) -> str:
-        """处理内容中的图片"""
-        # 使用正则表达式匹配Markdown图片
-        def replace_image(match):
-            alt_text = match.group(1)
-            image_path = match.group(2)
-            
-            # 处理相对路径
-            if not image_path.startswith(('http://', 'https://')):
-                full_path = os.path.join(image_dir, image_path)
-                if os.path.exists(full_path):
-                    remote_url = self.upload_image(full_path)
-                    if remote_url:
-                        return f'![{alt_text}]({remote_url})'
-            
-            # 如果上传失败或已经是远程URL，则返回原内容
-            return match.group(0)
-        
-        # 匹配Markdown图片语法 ![alt](url)
-        content = re.sub(r'!\[(.*?)\]\((.*?)\)', replace_image, content)
-        
-        return content
-    
     def publish(self, content_path: str, **kwargs) -> bool:
         """发布内容到CSDN"""
+        if not self.ensure_login():
+            self.log_error("未登录，无法发布内容")
+            return False
+
         try:
-            # 读取Markdown内容
-            with open(content_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 提取元数据
-            metadata = {}
-            if content.startswith('---'):
-                _, frontmatter, content = content.split('---', 2)
-                for line in frontmatter.strip().split('\n'):
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        metadata[key.strip()] = value.strip()
-            
+            # 解析一次得到元数据和图片引用，图片并发上传后生成替换了图片地址的 Markdown
+            document = self.load_document(content_path)
+            metadata = document.metadata
             title = metadata.get('title', os.path.splitext(os.path.basename(content_path))[0])
-            
-            # 处理内容中的图片
-            content_dir = os.path.dirname(content_path)
-            processed_content = self._process_content(content, content_dir)
+            image_urls = self.upload_images_concurrently(document.local_images, self.upload_image)
+            processed_content = render_markdown(document, image_urls)
             
             # 准备发布数据
             article_data = {
                 'title': title,
                 'content': processed_content,
-                'description': metadata.get('description', '')[:200],
-                'tags': metadata.get('tags', self.config.get('tags', '技术,编程')).split(','),
-                'categories': metadata.get('categories', self.config.get('categories', '后端,Python')).split(','),
+                'description': str(metadata.get('description') or '')[:200],
+                'tags': as_list(metadata.get('tags', self.platform_config.get('tags', '技术,编程'))),
+                'categories': as_list(metadata.get('categories',
+                                                         self.platform_config.get('categories', '后端,Python'))),
                 'articleedittype': '1',  # 1: markdown, 2: 富文本
                 'markdowncontent': processed_content,
                 'contentType': '1',  # 1: 原创, 2: 转载, 3: 翻译
@@ -233,22 +213,29 @@ class CSDNPublisher(BasePublisher):
                 'Origin': 'https://mp.csdn.net'
             }
             
-            response = self.session.post(
-                publish_url,
-                json=article_data,
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                self.log_error(f"发布失败: HTTP {response.status_code}")
-                return False
-                
-            data = response.json()
-            if data.get('code') != 200:
-                self.log_error(f"发布失败: {data.get('message')}")
+            def create_article() -> Optional[str]:
+                response = self.call_api('article/publish', lambda: self.session.post(
+                    publish_url,
+                    json=article_data,
+                    headers=headers
+                ), idempotent=False)
+
+                if response.status_code != 200:
+                    self.log_error(f"发布失败: HTTP {response.status_code}")
+                    return None
+
+                data = response.json()
+                if data.get('code') != 200:
+                    self.log_error(f"发布失败: {data.get('message')}")
+                    return None
+                return str(data['data']['id'])
+
+            # 任务重试时不再重复创建本任务已创建的文章
+            with self.stage('draft'):
+                article_id = self.create_once(create_article)
+            if not article_id:
                 return False
-                
-            article_id = data['data']['id']
+
             article_url = f"https://blog.csdn.net/article/details/{article_id}"
             
             self.log_success(f"文章发布成功: {article_url}")
@@ -0,0 +1,319 @@
+"""
+预编译的 CSS 内联器
+
+Premailer 每次 transform 都要重新整理样式表规则、逐条选择器遍历整棵文档树，
+并重新规范化每条声明。对于发布时反复使用的同一份静态样式表，这里把这些工作
+提前做一次：规则按优先级排好序、声明解析为键值对、选择器预编译。内联时只需
+遍历一次文档树建立 标签/class/id 索引，简单选择器直接查索引，复杂选择器才回退
+到预编译的 XPath。
+
+规则解析、样式合并和 HTML 属性转换都直接复用 Premailer 自身的实现，输出与
+`Premailer(html, ...).transform()` 逐字节一致；遇到无法保证一致的输入
+（外链样式表、多个 <style> 等）时整体回退到 Premailer。
+
+快速路径用到了 Premailer 的内部函数和私有方法，只在 requirements.txt 中固定的版本上
+验证过；这些内部实现不存在（ImportError / AttributeError）时同样整体回退到
+`Premailer(html, ...).transform()`。
+"""
+
+import logging
+import operator
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import cssutils
+from lxml import etree
+from lxml.cssselect import CSSSelector
+from premailer import Premailer
+
+try:
+    from premailer.merge_style import csstext_to_pairs, merge_styles
+    from premailer.premailer import (FILTER_PSEUDOSELECTORS, capitalize_float_margin, get_or_create_head,
+                                     _importants)
+    _PREMAILER_INTERNALS = True
+except ImportError:
+    _PREMAILER_INTERNALS = False
+
+logger = logging.getLogger(__name__)
+
+# 快速路径调用的 Premailer 私有方法
+_PREMAILER_METHODS = ('_parse_style_rules', '_css_rules_to_string', '_style_to_basic_html_attributes')
+
+# 形如 tag、.cls、#id、tag.cls1.cls2#id 的简单复合选择器，可以直接从索引中解析
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[A-Za-z][\w-]*)?(?P<rest>(?:[.#][\w-]+)*)$')
+_SIMPLE_PART = re.compile(r'([.#])([\w-]+)')
+# 与 XPath normalize-space() 的空白定义一致
+_CLASS_SEPARATOR = re.compile(r'[ \t\r\n]+')
+
+
+def parse_document(html: str) -> Tuple[etree._ElementTree, etree._Element]:
+    """
+    以与 Premailer 相同的方式解析 HTML 文档
+
+    Returns:
+        tuple: (文档树, 序列化时使用的根节点)；原文带 DOCTYPE 时根节点为整棵树
+    """
+    stripped = html.strip()
+    tree = etree.fromstring(stripped, etree.HTMLParser()).getroottree()
+    root = tree if stripped.startswith(tree.docinfo.doctype) else tree.getroot()
+    return tree, root
+
+
+def serialize_document(root) -> str:
+    """以与 Premailer 相同的方式序列化文档"""
+    return etree.tostring(root, method='html', pretty_print=True, encoding='utf-8').decode('utf-8')
+
+
+class _DocumentIndex:
+    """一次遍历文档树建立的 标签/class/id -> 元素列表（文档顺序）索引"""
+
+    def __init__(self, page):
+        self.by_tag: Dict[str, list] = defaultdict(list)
+        self.by_class: Dict[str, list] = defaultdict(list)
+        self.by_id: Dict[str, list] = defaultdict(list)
+        self.classes: Dict[int, frozenset] = {}
+        for element in page.iter():
+            tag = element.tag
+            if not isinstance(tag, str):
+                # 注释、处理指令等节点不参与选择器匹配
+                continue
+            self.by_tag[tag].append(element)
+            class_attr = element.get('class')
+            if class_attr:
+                names = frozenset(n for n in _CLASS_SEPARATOR.split(class_attr) if n)
+                self.classes[id(element)] = names
+                for name in names:
+                    self.by_class[name].append(element)
+            element_id = element.get('id')
+            if element_id is not None:
+                self.by_id[element_id].append(element)
+
+
+class _Selector:
+    """预编译的选择器：简单选择器走索引，其他情况使用 lxml 的 CSSSelector"""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.tag: Optional[str] = None
+        self.class_names: Tuple[str, ...] = ()
+        self.element_id: Optional[str] = None
+        self._xpath: Optional[CSSSelector] = None
+
+        match = _SIMPLE_SELECTOR.match(selector)
+        parts = _SIMPLE_PART.findall(match.group('rest')) if match else []
+        ids = [value for kind, value in parts if kind == '#']
+        if match and (match.group('tag') or parts) and len(ids) <= 1:
+            self.tag = match.group('tag')
+            self.class_names = tuple(value for kind, value in parts if kind == '.')
+            self.element_id = ids[0] if ids else None
+        else:
+            self._xpath = CSSSelector(selector)
+
+    def select(self, page, index: _DocumentIndex) -> list:
+        """返回文档中匹配的元素，顺序与 CSSSelector 相同（文档顺序）"""
+        if self._xpath is not None:
+            return self._xpath(page)
+
+        if self.element_id is not None:
+            candidates = index.by_id.get(self.element_id, [])
+        elif self.tag is not None:
+            candidates = index.by_tag.get(self.tag, [])
+        else:
+            candidates = index.by_class.get(self.class_names[0], [])
+
+        result = []
+        for element in candidates:
+            if self.tag is not None and element.tag != self.tag:
+                continue
+            if self.class_names:
+                names = index.classes.get(id(element), frozenset())
+                if not all(name in names for name in self.class_names):
+                    continue
+            result.append(element)
+        return result
+
+
+class CompiledStylesheet:
+    """
+    只解析一次、可在多次发布之间复用的样式表。
+
+    实例是只读的，可以在多个线程间共享。
+    """
+
+    def __init__(self, css_text: str, **premailer_options):
+        """
+        Args:
+            css_text: 样式表内容，即待内联 HTML 中 <style> 标签的内容。
+            **premailer_options: 传给 Premailer 的选项，回退路径使用同样的选项。
+        """
+        self.css_text = css_text
+        self.premailer_options = premailer_options
+        # 仅用作规则解析和属性转换等辅助方法的载体，不会调用它的 transform
+        self._premailer = Premailer(**premailer_options)
+        self.leftover_css: Optional[str] = None
+        self.rules: List[Tuple[_Selector, str, list]] = []
+        try:
+            self._supported = self._fast_path_supported()
+            if self._supported:
+                self._compile(css_text)
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"当前 Premailer 版本不支持预编译样式表，回退到 Premailer 完整处理: {e!r}")
+            self._supported = False
+
+    def _compile(self, css_text: str) -> None:
+        """整理样式表规则，预编译选择器"""
+        rules, leftover = self._premailer._parse_style_rules(css_text, 0)
+        rules.sort(key=operator.itemgetter(0))
+
+        if leftover or self._premailer.keep_style_tags:
+            leftover_css = css_text if self._premailer.keep_style_tags else self._premailer._css_rules_to_string(leftover)
+            if self._premailer.strip_important:
+                leftover_css = _importants.sub('', leftover_css)
+            self.leftover_css = leftover_css
+
+        validate = not self._premailer.disable_validation
+        for _, selector, style in rules:
+            class_ = ''
+            new_selector = selector
+            if ':' in selector:
+                new_selector, class_ = re.split(':', selector, 1)
+                class_ = ':%s' % class_
+            # 与 Premailer 相同：过滤型伪类保留在选择器中
+            if class_ in FILTER_PSEUDOSELECTORS or class_.startswith(':nth-child'):
+                class_ = ''
+            else:
+                selector = new_selector
+            self.rules.append((_Selector(selector), class_, csstext_to_pairs(style, validate=validate)))
+
+    def _fast_path_supported(self) -> bool:
+        """只有 Premailer 的这些选项组合下才能保证快速路径输出一致"""
+        if not _PREMAILER_INTERNALS:
+            raise ImportError('premailer 内部函数不可用')
+        p = self._premailer
+        for method in _PREMAILER_METHODS:
+            if not callable(getattr(p, method, None)):
+                raise AttributeError(f"Premailer 没有 {method} 方法")
+        return (p.method == 'html' and not p.preserve_handlebar_syntax and not p.base_url
+                and not p.external_styles and not p.css_text and not p.disable_leftover_css)
+
+    def apply(self, tree: etree._ElementTree) -> bool:
+        """
+        在已解析的文档树上就地内联样式。
+
+        Args:
+            tree: `parse_document` 解析得到的文档树，其中唯一的 <style> 标签内容必须是本样式表。
+
+        Returns:
+            bool: 成功内联返回 True；样式来源与预编译的不一致时返回 False，且不修改文档树。
+        """
+        if not self._supported:
+            return False
+
+        page = tree.getroot()
+        style_elements = [el for el in page.iter('style', 'link')
+                          if el.tag == 'style' or 'stylesheet' in (el.get('rel') or '').split()]
+        if (len(style_elements) != 1 or style_elements[0].tag != 'style'
+                or style_elements[0].text != self.css_text or style_elements[0].attrib):
+            return False
+
+        get_or_create_head(tree)
+        style = style_elements[0]
+        if self.leftover_css is not None:
+            style.text = self.leftover_css
+        else:
+            style.getparent().remove(style)
+
+        index = _DocumentIndex(page)
+        elements = {}
+        for selector, class_, pairs in self.rules:
+            for item in selector.select(page, index):
+                entry = elements.get(id(item))
+                if entry is None:
+                    entry = elements[id(item)] = {'item': item, 'classes': [], 'style': []}
+                entry['style'].append(pairs)
+                entry['classes'].append(class_)
+
+        for entry in elements.values():
+            final_style = merge_styles(
+                entry['item'].attrib.get('style', ''),
+                entry['style'],
+                entry['classes'],
+                remove_unset_properties=self._premailer.remove_unset_properties,
+            )
+            if final_style:
+                entry['item'].attrib['style'] = final_style
+            self._premailer._style_to_basic_html_attributes(entry['item'], final_style, force=True)
+
+        if self._premailer.remove_classes:
+            for item in page.xpath('//@class'):
+                del item.getparent().attrib['class']
+
+        if self._premailer.capitalize_float_margin:
+            for item in page.xpath('//@style'):
+                item.getparent().attrib['style'] = capitalize_float_margin(item)
+
+        if self._premailer.align_floating_images:
+            for item in page.xpath('//img[@style]'):
+                # 没有 float 声明时 cssutils 解析结果必然为空，无需解析
+                if 'float' not in item.attrib['style']:
+                    continue
+                image_css = cssutils.parseStyle(item.attrib['style'])
+                if image_css.float == 'right':
+                    item.attrib['align'] = 'right'
+                elif image_css.float == 'left':
+                    item.attrib['align'] = 'left'
+
+        return True
+
+    def premailer_transform(self, html: str) -> str:
+        """使用 Premailer 完整处理 HTML（回退路径）"""
+        return Premailer(html, **self.premailer_options).transform()
+
+    def inline(self, html: str) -> str:
+        """
+        将样式内联到 HTML 中。
+
+        Args:
+            html: 完整的 HTML 文档，其中唯一的 <style> 标签内容应为本样式表。
+
+        Returns:
+            内联后的 HTML，与 Premailer 的输出一致。
+        """
+        tree, root = parse_document(html)
+        if not self.apply(tree):
+            # 样式来源与预编译的不一致，交给 Premailer 完整处理
+            return self.premailer_transform(html)
+        return serialize_document(root)
+
+
+_compiled: Dict[Tuple, CompiledStylesheet] = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_stylesheet(css_path: str, **premailer_options) -> Tuple[str, CompiledStylesheet]:
+    """
+    读取并编译样式表文件，文件未修改时复用已编译的结果。
+
+    Returns:
+        tuple: (样式表内容, 编译后的样式表)
+
+    Raises:
+        FileNotFoundError: 样式表文件不存在。
+    """
+    stat = os.stat(css_path)
+    key = (os.path.abspath(css_path), stat.st_mtime_ns, stat.st_size, tuple(sorted(premailer_options.items())))
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+    if compiled is None:
+        with open(css_path, 'r', encoding='utf-8') as f:
+            css_content = f.read()
+        compiled = CompiledStylesheet(css_content, **premailer_options)
+        with _compiled_lock:
+            # 样式表文件被修改后，旧版本的编译结果不再需要
+            for stale in [k for k in _compiled if k[0] == key[0]]:
+                del _compiled[stale]
+            _compiled[key] = compiled
+    return compiled.css_text, compiled
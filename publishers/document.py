@@ -0,0 +1,409 @@
+"""
+平台无关的文章中间表示
+
+一篇 Markdown 文件只解析一次，得到 front matter 元数据、块级结构（每个块再分为文本、行内代码和图片
+等行内节点）以及图片引用和本地图片的内容哈希。各平台从同一个中间表示生成自己需要的格式：
+
+- `render_markdown`：CSDN、掘金等接受 Markdown 的平台，按上传结果替换图片地址后直接拼接各块的源码；
+- `SourceDocument.html`：微信等需要 HTML 的平台，经 python-markdown 渲染，结果按扩展集合缓存在文档上，
+  之后由 HtmlPipeline 处理图片和样式。
+
+解析结果按 (内容哈希, 所在目录) 缓存在进程内，同一篇文章发往多个账户时只解析一次；
+本地图片的大小或修改时间变化时重新解析，保证图片哈希与文件一致。
+
+块级结构只识别影响图片引用的语法：围栏代码块中的内容和行内代码不是图片；
+缩进代码块、引用式图片 (![alt][ref]) 和正文中的 <img> 标签不在识别范围内，按普通文本保留。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from stat import S_ISREG
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote
+
+import frontmatter
+
+from utils.file_utils import get_file_checksum
+
+if TYPE_CHECKING:
+    from markdown import Markdown
+
+# 文档缓存：(内容哈希, 所在目录) -> SourceDocument
+DOCUMENT_CACHE_SIZE = 128
+_documents: 'OrderedDict[Tuple[str, str], SourceDocument]' = OrderedDict()
+_documents_lock = threading.Lock()
+# 本地图片的内容哈希：(路径, 大小, 修改时间) -> sha256，正文修改后重新解析时未变化的图片不再重新计算
+FILE_HASH_CACHE_SIZE = 4096
+_file_hashes: 'OrderedDict[Tuple[str, int, int], str]' = OrderedDict()
+# 每个线程复用自己的 Markdown 转换器，处理下一篇文档前 reset()
+_converters = threading.local()
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+LIST_RE = re.compile(r'^ {0,3}([-*+]|\d+[.)])\s')
+RULE_RE = re.compile(r'^ {0,3}([-*_])(\s*\1){2,}\s*$')
+CODE_SPAN_RE = re.compile(r'(`+)(.+?)\1', re.S)
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(\s*(<[^>]*>|[^\s)]+)(?:\s+("[^"]*"|\'[^\']*\'|\([^)]*\)))?\s*\)')
+REMOTE_PREFIXES = ('http://', 'https://', '//', 'data:')
+
+
+def get_markdown_converter(extensions: Tuple[str, ...]) -> 'Markdown':
+    """获取当前线程可复用的 Markdown 转换器，已重置为初始状态。"""
+    cache = getattr(_converters, 'by_extensions', None)
+    if cache is None:
+        cache = _converters.by_extensions = {}
+    md = cache.get(extensions)
+    if md is None:
+        # markdown 及其扩展只在第一次渲染时导入，不拖慢启动
+        from markdown import Markdown
+        md = cache[extensions] = Markdown(extensions=list(extensions))
+    else:
+        md.reset()
+    return md
+
+
+@dataclass(frozen=True)
+class Text:
+    """普通文本"""
+    source: str
+
+
+@dataclass(frozen=True)
+class Code:
+    """行内代码，其中的内容不做任何处理"""
+    source: str
+
+
+@dataclass(frozen=True)
+class Image:
+    """图片引用 ![alt](src "title")"""
+    source: str
+    alt: str
+    src: str
+    title: Optional[str] = None
+
+    def with_src(self, src: str) -> str:
+        """生成指向新地址的图片语法"""
+        title = f' "{self.title}"' if self.title else ''
+        return f'![{self.alt}]({src}{title})'
+
+
+Inline = Union[Text, Code, Image]
+
+
+@dataclass(frozen=True)
+class Block:
+    """
+    块级节点
+
+    kind 为 heading、paragraph、list、quote、table、html、rule、code 或 blank；
+    各行内节点的 source 依次拼接即为块的源码，code 和 blank 块只有一个 Text 节点。
+    """
+    kind: str
+    inlines: Tuple[Inline, ...]
+
+    @property
+    def source(self) -> str:
+        return ''.join(node.source for node in self.inlines)
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    """文档引用的一张图片"""
+    src: str
+    alt: str
+    # 存在的本地图片的绝对路径，网络图片或找不到的文件为 None
+    path: Optional[str] = None
+    # 本地图片内容的 sha256
+    sha256: Optional[str] = None
+
+    @property
+    def remote(self) -> bool:
+        return self.src.startswith(REMOTE_PREFIXES)
+
+
+@dataclass
+class SourceDocument:
+    """一篇文章的中间表示，可以在多个线程、多个发布器之间共享，不应修改"""
+    content_hash: str
+    base_dir: str
+    metadata: Dict[str, Any]
+    blocks: Tuple[Block, ...]
+    images: Tuple[ImageRef, ...]
+    # 本地图片的 (大小, 修改时间)，用于判断缓存的文档是否仍然有效
+    image_stats: Dict[str, Optional[Tuple[int, int]]] = field(default_factory=dict, repr=False)
+    _html: Dict[Tuple[str, ...], str] = field(default_factory=dict, repr=False)
+    _html_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def body(self) -> str:
+        """正文的 Markdown 源码（不含 front matter）"""
+        return ''.join(block.source for block in self.blocks)
+
+    @property
+    def local_images(self) -> List[str]:
+        """存在的本地图片路径，按文档顺序去重"""
+        return list(dict.fromkeys(image.path for image in self.images if image.path))
+
+    def html(self, extensions: Tuple[str, ...]) -> str:
+        """用给定的 python-markdown 扩展渲染正文，每个扩展集合只渲染一次"""
+        extensions = tuple(extensions)
+        with self._html_lock:
+            cached = self._html.get(extensions)
+        if cached is not None:
+            return cached
+        html = get_markdown_converter(extensions).convert(self.body)
+        with self._html_lock:
+            return self._html.setdefault(extensions, html)
+
+    @property
+    def block_hashes(self) -> List[str]:
+        """各块源码的哈希（文档顺序）"""
+        return [_sha256(block.source) for block in self.blocks]
+
+    def components(self) -> Dict[str, str]:
+        """
+        文章各部分的哈希，再次发布时用于判断哪些部分发生了变化
+
+        metadata 为 front matter，body 为正文源码，images 为图片引用及本地图片的内容。
+        """
+        return {
+            'metadata': _sha256(json.dumps(self.metadata, ensure_ascii=False, sort_keys=True, default=str)),
+            'body': _sha256(self.body),
+            'images': _sha256(json.dumps([[image.src, image.sha256] for image in self.images])),
+        }
+
+    def is_current(self) -> bool:
+        """引用的本地图片自解析以来没有变化"""
+        return all(_stat(path) == stat for path, stat in self.image_stats.items())
+
+
+def render_markdown(document: SourceDocument, image_urls: Optional[Dict[str, Optional[str]]] = None) -> str:
+    """
+    生成 Markdown 正文，本地图片替换为上传后的地址
+
+    Args:
+        document: 中间表示
+        image_urls: 本地图片路径 -> 远程地址，没有对应地址（未上传或上传失败）的图片保留原引用
+    """
+    image_urls = image_urls or {}
+    # 图片引用与正文中的图片节点按文档顺序一一对应
+    refs = iter(document.images)
+    parts = []
+    for block in document.blocks:
+        for node in block.inlines:
+            if isinstance(node, Image):
+                path = next(refs).path
+                url = image_urls.get(path) if path else None
+                parts.append(node.with_src(url) if url else node.source)
+            else:
+                parts.append(node.source)
+    return ''.join(parts)
+
+
+def load_document(file_path: Union[str, Path]) -> SourceDocument:
+    """
+    读取并解析 Markdown 文件，内容和引用的图片都没有变化时返回缓存的中间表示
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    key = (hashlib.sha256(raw).hexdigest(), base_dir)
+
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is not None:
+            _documents.move_to_end(key)
+    if document is not None and document.is_current():
+        return document
+
+    document = parse_document(raw.decode('utf-8'), base_dir, content_hash=key[0])
+    with _documents_lock:
+        _documents[key] = document
+        while len(_documents) > DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+    return document
+
+
+def clear_document_cache() -> None:
+    """清空文档缓存。"""
+    with _documents_lock:
+        _documents.clear()
+        _file_hashes.clear()
+
+
+def parse_document(text: str, base_dir: str, content_hash: Optional[str] = None) -> SourceDocument:
+    """
+    把 Markdown 文本解析为中间表示
+
+    Args:
+        text: 包含 front matter 的 Markdown 文本
+        base_dir: 解析相对图片路径的基准目录
+        content_hash: 内容哈希，None 时按 text 计算
+    """
+    post = frontmatter.loads(text)
+    metadata = {}
+    for key, value in post.metadata.items():
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            metadata[key] = value
+        elif isinstance(value, (list, tuple)) and all(isinstance(x, (str, int, float, bool)) for x in value):
+            metadata[key] = value[0] if len(value) == 1 else value
+
+    blocks = tuple(_parse_blocks(post.content))
+    images = []
+    image_stats = {}
+    for block in blocks:
+        for node in block.inlines:
+            if not isinstance(node, Image):
+                continue
+            path = _local_path(node.src, base_dir)
+            sha256 = None
+            if path:
+                # 暂时不存在的图片也记录下来，之后补上时重新解析
+                image_stats[path] = _stat(path)
+                if image_stats[path] is None:
+                    path = None
+                else:
+                    sha256 = _file_sha256(path, image_stats[path])
+            images.append(ImageRef(node.src, node.alt, path, sha256))
+
+    return SourceDocument(
+        content_hash=content_hash or _sha256(text),
+        base_dir=base_dir,
+        metadata=metadata,
+        blocks=blocks,
+        images=tuple(images),
+        image_stats=image_stats,
+    )
+
+
+def _parse_blocks(body: str) -> List[Block]:
+    """按空行和围栏代码块切分块，每个块保留包括换行在内的原始源码"""
+    blocks: List[Block] = []
+    lines = body.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            start = i
+            while i < len(lines) and not lines[i].strip():
+                i += 1
+            blocks.append(Block('blank', (Text(''.join(lines[start:i])),)))
+            continue
+
+        fence = FENCE_RE.match(line)
+        if fence:
+            marker = fence.group(1)
+            start = i
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(marker):
+                i += 1
+            i = min(i + 1, len(lines))
+            blocks.append(Block('code', (Text(''.join(lines[start:i])),)))
+            continue
+
+        if line.lstrip().startswith('#'):
+            # ATX 标题只占一行
+            blocks.append(Block('heading', _parse_inlines(line)))
+            i += 1
+            continue
+
+        start = i
+        i += 1
+        while i < len(lines) and lines[i].strip() and not FENCE_RE.match(lines[i]) \
+                and not lines[i].lstrip().startswith('#'):
+            i += 1
+        source = ''.join(lines[start:i])
+        blocks.append(Block(_block_kind(line), _parse_inlines(source)))
+    return blocks
+
+
+def _block_kind(first_line: str) -> str:
+    stripped = first_line.lstrip()
+    if RULE_RE.match(first_line):
+        return 'rule'
+    if stripped.startswith('>'):
+        return 'quote'
+    if LIST_RE.match(first_line):
+        return 'list'
+    if stripped.startswith('|'):
+        return 'table'
+    if stripped.startswith('<'):
+        return 'html'
+    return 'paragraph'
+
+
+def _parse_inlines(source: str) -> Tuple[Inline, ...]:
+    """把块的源码切分为文本、行内代码和图片节点"""
+    nodes: List[Inline] = []
+    position = 0
+    for code in CODE_SPAN_RE.finditer(source):
+        nodes.extend(_parse_images(source[position:code.start()]))
+        nodes.append(Code(code.group(0)))
+        position = code.end()
+    nodes.extend(_parse_images(source[position:]))
+    return tuple(nodes)
+
+
+def _parse_images(text: str) -> List[Inline]:
+    nodes: List[Inline] = []
+    position = 0
+    for match in IMAGE_RE.finditer(text):
+        if match.start() > position:
+            nodes.append(Text(text[position:match.start()]))
+        src = match.group(2)
+        if src.startswith('<') and src.endswith('>'):
+            src = src[1:-1]
+        title = match.group(3)[1:-1] if match.group(3) else None
+        nodes.append(Image(match.group(0), match.group(1), src, title))
+        position = match.end()
+    if position < len(text):
+        nodes.append(Text(text[position:]))
+    return nodes
+
+
+def _local_path(src: str, base_dir: str) -> Optional[str]:
+    """本地图片引用对应的绝对路径，网络图片返回 None"""
+    if not src or src.startswith(REMOTE_PREFIXES):
+        return None
+    path = src[len('file://'):] if src.startswith('file://') else src
+    return os.path.normpath(os.path.join(base_dir, unquote(path)))
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _file_sha256(path: str, stat: Tuple[int, int]) -> str:
+    """文件内容的 sha256，大小和修改时间不变时使用上次计算的结果"""
+    key = (path, stat[0], stat[1])
+    with _documents_lock:
+        digest = _file_hashes.get(key)
+        if digest is not None:
+            _file_hashes.move_to_end(key)
+            return digest
+    digest = get_file_checksum(path, 'sha256')
+    with _documents_lock:
+        _file_hashes[key] = digest
+        while len(_file_hashes) > FILE_HASH_CACHE_SIZE:
+            _file_hashes.popitem(last=False)
+    return digest
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    """普通文件的 (大小, 修改时间)，不存在或不是文件时返回 None"""
+    try:
+        result = os.stat(path)
+    except OSError:
+        return None
+    if not S_ISREG(result.st_mode):
+        return None
+    return result.st_size, result.st_mtime_ns
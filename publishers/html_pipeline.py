@@ -0,0 +1,250 @@
+"""
+单次解析的 HTML 处理流水线
+
+Markdown 渲染出的正文只解析一次成为 lxml 文档树，图片上传替换、清理、样式内联
+等步骤作为可插拔的阶段依次在同一棵树上就地修改，最后统一序列化一次。
+此前每个步骤各自解析、序列化一遍（BeautifulSoup 处理图片、Premailer 内联样式），
+同一篇文章要在字符串和文档树之间来回转换多次。
+
+文档树的解析与序列化方式和 Premailer 相同，样式内联阶段的输出与单独调用
+`CompiledStylesheet.inline` 一致。
+"""
+
+import contextlib
+import html as html_lib
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from lxml import etree
+
+from .css_inliner import CompiledStylesheet, parse_document, serialize_document
+
+logger = logging.getLogger(__name__)
+
+# 由清理阶段连同内容一起移除的标签
+UNSAFE_TAGS = ('script', 'object', 'embed', 'applet')
+# 值以 javascript: 开头时需要移除的 URL 属性
+URL_ATTRIBUTES = ('href', 'src', 'action', 'formaction')
+
+
+class HtmlDocument:
+    """在各个阶段之间传递的、已解析的 HTML 文档"""
+
+    def __init__(self, html: str):
+        """
+        Args:
+            html: 完整的 HTML 文档
+        """
+        self.tree, self._root = parse_document(html)
+        # 由图片阶段填充：文档中存在的本地图片路径（文档顺序）
+        self.local_images: List[str] = []
+
+    @classmethod
+    def from_body(cls, body_html: str, title: str = '', css: Optional[str] = None,
+                  article_class: Optional[str] = None) -> 'HtmlDocument':
+        """
+        用正文片段构造完整文档
+
+        Args:
+            body_html: Markdown 渲染出的正文 HTML
+            title: 文档标题
+            css: 放入 <style> 标签的样式表，None 表示不带样式
+            article_class: 包裹正文的 <article> 的 class
+        """
+        style = f'<style>{css}</style>' if css is not None else ''
+        article = f'<article class="{article_class}">' if article_class else '<article>'
+        return cls(f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html_lib.escape(title)}</title>'
+                   f'{style}</head><body>{article}{body_html}</article></body></html>')
+
+    @classmethod
+    def from_fragment(cls, fragment: str) -> 'HtmlDocument':
+        """用 HTML 片段构造文档，处理完后可用 `body_html()` 取回片段"""
+        return cls(f'<html><body>{fragment}</body></html>')
+
+    @property
+    def root(self) -> etree._Element:
+        """文档的 <html> 根元素"""
+        return self.tree.getroot()
+
+    def replace(self, html: str) -> None:
+        """用新的 HTML 替换整棵文档树（阶段无法就地处理时使用）"""
+        self.tree, self._root = parse_document(html)
+
+    def serialize(self) -> str:
+        """序列化整个文档"""
+        return serialize_document(self._root)
+
+    def body_html(self) -> str:
+        """序列化 <body> 的内容（不含 <body> 标签本身）"""
+        body = self.root.find('body')
+        if body is None:
+            return ''
+        parts = [html_lib.escape(body.text, quote=False) if body.text else '']
+        parts.extend(etree.tostring(child, method='html', encoding='unicode') for child in body)
+        return ''.join(parts)
+
+
+class PipelineStage(ABC):
+    """流水线中的一个处理阶段，就地修改文档"""
+
+    name: str = ''
+
+    @abstractmethod
+    def apply(self, document: HtmlDocument) -> None:
+        """处理文档"""
+        pass
+
+
+class ImageRewriteStage(PipelineStage):
+    """上传文档中的本地图片（以及可选的网络图片），并把 src 替换为上传后的远程地址"""
+
+    name = 'images'
+
+    def __init__(self, base_dir: str, upload_many: Optional[Callable[[List[str]], Dict[str, Optional[str]]]],
+                 log_info: Callable[[str], None] = logger.info,
+                 log_warning: Callable[[str], None] = logger.warning,
+                 fetch_remote: Optional[Callable[[List[str]], Dict[str, Optional[str]]]] = None):
+        """
+        Args:
+            base_dir: 解析相对图片路径的基准目录（Markdown 文件所在目录）
+            upload_many: 批量上传函数，接收本地路径列表，返回 路径 -> 远程地址（失败为 None）；
+                只通过 `collect`/`rewrite` 分步使用（如异步上传）时可以为 None
+            fetch_remote: 批量下载函数，接收网络图片地址列表，返回 地址 -> 本地路径（失败或无需转存为 None）；
+                给出时网络图片下载后与本地图片一起上传，None 表示保留网络图片的原地址
+        """
+        self.base_dir = base_dir
+        self.upload_many = upload_many
+        self.fetch_remote = fetch_remote
+        self.log_info = log_info
+        self.log_warning = log_warning
+
+    def collect(self, document: HtmlDocument) -> List[Tuple[etree._Element, str, str]]:
+        """
+        找出文档中存在的本地图片，并按文档顺序写入 document.local_images
+
+        Returns:
+            待替换的 (img 元素, 原 src, 本地路径) 列表，交给 `rewrite` 使用
+        """
+        images = [(img, img.get('src')) for img in document.root.iter('img')]
+        downloaded: Dict[str, Optional[str]] = {}
+        if self.fetch_remote is not None:
+            # 网络图片先全部并发下载，再按文档顺序与本地图片合并
+            remote_urls = [src for _, src in images if src and src.startswith(('http://', 'https://'))]
+            if remote_urls:
+                downloaded = self.fetch_remote(remote_urls)
+
+        local_images = []
+        for img, src in images:
+            if not src or src.startswith('data:'):
+                continue
+            if src.startswith(('http://', 'https://')):
+                image_path = downloaded.get(src)
+                if image_path:
+                    local_images.append((img, src, image_path))
+                    self.log_info(f"准备转存网络图片: {src}")
+                continue
+
+            image_path = os.path.join(self.base_dir, src)
+            if os.path.exists(image_path):
+                local_images.append((img, src, image_path))
+                self.log_info(f"准备上传本地图片: {src}")
+            else:
+                self.log_warning(f"本地图片未找到，跳过: {image_path}")
+
+        # 本地图片路径保持文档中的原始顺序，首图仍可作为封面
+        document.local_images = [image_path for _, _, image_path in local_images]
+        return local_images
+
+    def rewrite(self, local_images: List[Tuple[etree._Element, str, str]],
+                uploaded: Dict[str, Optional[str]]) -> None:
+        """把上传成功的图片 src 替换为远程地址"""
+        for img, src, image_path in local_images:
+            remote_url = uploaded.get(image_path)
+            if remote_url:
+                img.set('src', remote_url)
+            else:
+                self.log_warning(f"上传图片失败，HTML中的引用将保持原样: {src}")
+
+    def apply(self, document: HtmlDocument) -> None:
+        local_images = self.collect(document)
+        if local_images:
+            self.rewrite(local_images, self.upload_many(document.local_images))
+
+
+class SanitizeStage(PipelineStage):
+    """移除脚本类标签、事件处理属性和 javascript: 链接"""
+
+    name = 'sanitize'
+
+    def __init__(self, remove_tags: Iterable[str] = UNSAFE_TAGS):
+        self.remove_tags = tuple(remove_tags)
+
+    def apply(self, document: HtmlDocument) -> None:
+        for element in list(document.root.iter(*self.remove_tags)):
+            _remove_element(element)
+
+        for element in document.root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            for name in list(element.attrib):
+                lowered = name.lower()
+                if lowered.startswith('on'):
+                    del element.attrib[name]
+                elif lowered in URL_ATTRIBUTES and element.attrib[name].strip().lower().startswith('javascript:'):
+                    del element.attrib[name]
+
+
+class StyleInlineStage(PipelineStage):
+    """使用预编译的样式表把样式内联到文档中"""
+
+    name = 'inline_styles'
+
+    def __init__(self, stylesheet: CompiledStylesheet):
+        self.stylesheet = stylesheet
+
+    def apply(self, document: HtmlDocument) -> None:
+        if not self.stylesheet.apply(document.tree):
+            # 文档中的样式与预编译的不一致，交给 Premailer 完整处理后重新解析
+            document.replace(self.stylesheet.premailer_transform(document.serialize()))
+
+
+class HtmlPipeline:
+    """按顺序在同一棵文档树上执行各个阶段，最后序列化一次"""
+
+    def __init__(self, stages: Sequence[PipelineStage],
+                 timer: Optional[Callable[[str], ContextManager[None]]] = None):
+        """
+        Args:
+            stages: 依次执行的阶段
+            timer: 以阶段名调用、返回计时上下文的函数（如 `BasePublisher.stage`），None 表示不计时
+        """
+        self.stages = list(stages)
+        self.timer = timer
+
+    def run(self, document: HtmlDocument) -> str:
+        """
+        执行流水线
+
+        Returns:
+            序列化后的完整 HTML 文档
+        """
+        for stage in self.stages:
+            with self.timer(stage.name) if self.timer else contextlib.nullcontext():
+                stage.apply(document)
+        return document.serialize()
+
+
+def _remove_element(element: etree._Element) -> None:
+    """移除元素及其内容，保留紧随其后的文本"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
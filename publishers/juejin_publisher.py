@@ -3,13 +3,16 @@ import time
 import json
 import requests
 from typing import Dict, Optional, List, Any
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
+from utils.multipart import post_file
+
 from .base import BasePublisher
+from .document import render_markdown
 
 class JuejinPublisher(BasePublisher):
     platform_name = 'juejin'
+    image_profiles = {'content': {'max_dimension': 1920, 'quality': 85, 'max_bytes': 5 * 1024 * 1024}}
     """掘金平台发布器"""
     
     BASE_URL = "https://api.juejin.cn"
@@ -17,7 +20,7 @@ class JuejinPublisher(BasePublisher):
     
     def __init__(self, account_name: str, platform_config: dict, common_config: 'Config'):
         super().__init__(account_name, platform_config, common_config)
-        self.session = requests.Session()
+        self.session = self.create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'https://juejin.cn/',
@@ -25,12 +28,11 @@ class JuejinPublisher(BasePublisher):
         })
         self.token = None
         self.user_id = None
-        self._login()
     
     def _login(self) -> bool:
         """登录掘金账号"""
-        username = self.config.get('username')
-        password = self.config.get('password')
+        username = self.platform_config.get('username')
+        password = self.platform_config.get('password')
         
         if not username or not password:
             self.log_error("缺少掘金账号或密码配置")
@@ -116,18 +118,21 @@ class JuejinPublisher(BasePublisher):
             return False
     
     def upload_image(self, image_path: str) -> Optional[str]:
+        """上传图片到掘金，内容相同的图片只上传一次"""
+        return self.cached_upload(self.prepare_image(image_path, 'content'), self._upload_image)
+
+    def _upload_image(self, image_path: str) -> Optional[str]:
         """上传图片到掘金"""
-        if not self.token:
+        if not self.ensure_login():
             self.log_error("未登录，无法上传图片")
             return None
             
         upload_url = f"{self.BASE_URL}/article_api/v1/upload_image"
         
         try:
-            with open(image_path, 'rb') as f:
-                files = {'file': (os.path.basename(image_path), f, 'image/jpeg')}
-                response = self.session.post(upload_url, files=files)
-                
+            response = self.call_api('upload_image', lambda: post_file(self.session, upload_url, 'file', image_path,
+                                                                       content_type='image/jpeg'))
+
             if response.status_code != 200:
                 self.log_error(f"上传图片失败: HTTP {response.status_code}")
                 return None
@@ -145,56 +150,28 @@ class JuejinPublisher(BasePublisher):
             self.log_error(f"上传图片过程中发生错误: {e}", exc_info=True)
             return None
     
-    def _process_content(self, content: str, image_dir: str) -> str:
-        """处理内容中的图片"""
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if not src.startswith(('http://', 'https://')):
-                # 处理相对路径
-                image_path = os.path.join(image_dir, src)
-                if os.path.exists(image_path):
-                    remote_url = self.upload_image(image_path)
-                    if remote_url:
-                        img['src'] = remote_url
-        
-        return str(soup)
-    
     def publish(self, content_path: str, **kwargs) -> bool:
         """发布内容到掘金"""
-        if not self.token:
+        if not self.ensure_login():
             self.log_error("未登录，无法发布内容")
             return False
             
         try:
-            # 读取Markdown内容
-            with open(content_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 提取元数据
-            metadata = {}
-            if content.startswith('---'):
-                _, frontmatter, content = content.split('---', 2)
-                for line in frontmatter.strip().split('\n'):
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        metadata[key.strip()] = value.strip()
-            
+            # 解析一次得到元数据和图片引用，图片并发上传后生成替换了图片地址的 Markdown
+            document = self.load_document(content_path)
+            metadata = document.metadata
             title = metadata.get('title', os.path.splitext(os.path.basename(content_path))[0])
-            
-            # 处理内容中的图片
-            content_dir = os.path.dirname(content_path)
-            processed_content = self._process_content(content, content_dir)
+            image_urls = self.upload_images_concurrently(document.local_images, self.upload_image)
+            processed_content = render_markdown(document, image_urls)
             
             # 准备发布数据
             article_data = {
                 'title': title,
                 'mark_content': processed_content,
-                'brief_content': metadata.get('description', '')[:200],
+                'brief_content': str(metadata.get('description') or '')[:200],
                 'cover_image': metadata.get('cover', ''),
-                'category_id': self.config.get('category_id', '6809637767543259144'),  # 默认分类：后端
-                'tag_ids': self.config.get('tag_ids', ['6809640407484334093']),    # 默认标签：后端
+                'category_id': self.platform_config.get('category_id', '6809637767543259144'),  # 默认分类：后端
+                'tag_ids': self.platform_config.get('tag_ids', ['6809640407484334093']),    # 默认标签：后端
                 'edit_type': 10,  # 10:markdown, 20:富文本
                 'html_content': '',
                 'link_url': '',
@@ -206,18 +183,27 @@ class JuejinPublisher(BasePublisher):
             
             # 创建草稿
             draft_url = f"{self.BASE_URL}/content_api/v1/article/create"
-            response = self.session.post(draft_url, json=article_data)
-            
-            if response.status_code != 200:
-                self.log_error(f"创建草稿失败: HTTP {response.status_code}")
-                return False
-                
-            data = response.json()
-            if data.get('err_no') != 0:
-                self.log_error(f"创建草稿失败: {data.get('err_msg')}")
+
+            def create_draft() -> Optional[str]:
+                response = self.call_api('article/create', lambda: self.session.post(draft_url, json=article_data),
+                                         idempotent=False)
+
+                if response.status_code != 200:
+                    self.log_error(f"创建草稿失败: HTTP {response.status_code}")
+                    return None
+
+                data = response.json()
+                if data.get('err_no') != 0:
+                    self.log_error(f"创建草稿失败: {data.get('err_msg')}")
+                    return None
+                return str(data['data']['id'])
+
+            # 任务重试时不再重复创建本任务已创建的草稿
+            with self.stage('draft'):
+                article_id = self.create_once(create_draft)
+            if not article_id:
                 return False
-                
-            article_id = data['data']['id']
+
             article_url = f"https://juejin.cn/editor/drafts/{article_id}"
             
             self.log_success(f"文章草稿创建成功: {article_url}")
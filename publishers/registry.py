@@ -0,0 +1,107 @@
+"""
+发布器注册表
+
+平台名到发布器类的映射以 "模块:类名" 字符串登记，启动时不导入任何发布器模块；
+只有配置中实际使用、并且真正处理到文件的账户才会导入对应模块并创建实例。
+"""
+
+import importlib
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .base import BasePublisher
+
+logger = logging.getLogger(__name__)
+
+# 平台名 -> "模块:类名"
+PUBLISHER_REGISTRY: Dict[str, str] = {
+    'wechat': 'publishers.wechat_publisher:WeChatPublisher',
+    'csdn': 'publishers.csdn_publisher:CSDNPublisher',
+    'juejin': 'publishers.juejin_publisher:JuejinPublisher',
+    'toutiao': 'publishers.toutiao_publisher:ToutiaoPublisher',
+    'zhihu': 'publishers.zhihu_publisher:ZhihuPublisher',
+}
+
+_classes: Dict[str, type] = {}
+_classes_lock = threading.Lock()
+
+
+def register_publisher(platform: str, target: str) -> None:
+    """
+    登记发布器
+
+    Args:
+        platform: 平台名，对应账户配置中的 platform 字段
+        target: "模块:类名"，如 'publishers.wechat_publisher:WeChatPublisher'
+    """
+    PUBLISHER_REGISTRY[platform] = target
+    with _classes_lock:
+        _classes.pop(platform, None)
+
+
+def get_publisher_class(platform: str) -> Optional[type]:
+    """
+    导入并返回平台的发布器类，未登记的平台返回 None
+
+    Raises:
+        ImportError: 发布器模块导入失败
+    """
+    target = PUBLISHER_REGISTRY.get(platform)
+    if target is None:
+        return None
+    with _classes_lock:
+        cls = _classes.get(platform)
+        if cls is None:
+            module_name, _, class_name = target.partition(':')
+            start = time.perf_counter()
+            cls = _classes[platform] = getattr(importlib.import_module(module_name), class_name)
+            logger.debug(f"导入发布器 {platform} ({target}) 耗时 {time.perf_counter() - start:.3f}s")
+        return cls
+
+
+class LazyPublishers(Mapping):
+    """
+    账户名 -> 发布器 的只读映射，实例在第一次被取用时才创建
+
+    遍历、判断账户是否存在、取长度都不会创建实例；`get`/`[]` 取用时才导入模块并构造发布器，
+    同一账户在多个线程中同时取用时只创建一次。
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], 'BasePublisher']]):
+        """
+        Args:
+            factories: 账户名 -> 创建该账户发布器的函数
+        """
+        self._factories = dict(factories)
+        self._instances: Dict[str, 'BasePublisher'] = {}
+        self._locks = {name: threading.Lock() for name in self._factories}
+
+    def __getitem__(self, account_name: str) -> 'BasePublisher':
+        instance = self._instances.get(account_name)
+        if instance is not None:
+            return instance
+        factory = self._factories[account_name]
+        with self._locks[account_name]:
+            instance = self._instances.get(account_name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._instances[account_name] = factory()
+                logger.info(f"[System] - 初始化账户 {account_name} 耗时 {time.perf_counter() - start:.3f}s")
+            return instance
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def __contains__(self, account_name: Any) -> bool:
+        return account_name in self._factories
+
+    def loaded(self) -> Dict[str, 'BasePublisher']:
+        """已经创建的实例"""
+        return dict(self._instances)
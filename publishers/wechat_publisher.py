@@ -1,22 +1,62 @@
+import asyncio
 import os
 import time
 import json
 import requests
 import re
 from datetime import datetime, timedelta
-from PIL import Image
-from markdown import Markdown
-from bs4 import BeautifulSoup
-from premailer import Premailer
 import urllib.parse
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
+
+from utils.async_http import AsyncHttpError, async_http_available, get_async_client
+from utils.batcher import Batcher
+from utils.file_utils import get_file_checksum
+from utils.job_queue import JobCheckpoint, current_checkpoint
+from utils.multipart import post_file
+from utils.token_manager import TokenManager
 
 from .base import BasePublisher
+from .document import SourceDocument
+from .css_inliner import CompiledStylesheet, get_compiled_stylesheet
+from .html_pipeline import HtmlDocument, HtmlPipeline, ImageRewriteStage, SanitizeStage, StyleInlineStage
+
+# 临时素材 (media/upload) 的 media_id 在微信服务器上保留 3 天，提前 1 小时视为过期
+TEMPORARY_MEDIA_TTL = 3 * 24 * 3600 - 3600
+# 上传大小上限（字节）：永久/临时图片素材 10MB，图文消息内的图片 (media/uploadimg) 1MB
+MATERIAL_MAX_BYTES = 10 * 1024 * 1024
+INLINE_IMAGE_MAX_BYTES = 1024 * 1024
+# 旧接口上传缩略图素材前压缩到的大小
+THUMB_MAX_BYTES = 2 * 1024 * 1024
+# 微信自己的图片域名，正文中引用这些地址的图片无需转存
+WECHAT_IMAGE_HOSTS = ('mmbiz.qpic.cn', 'mmbiz.qlogo.cn')
+# draft/add 单次最多包含的图文数
+DRAFT_MAX_ARTICLES = 8
+# 合并创建草稿时，批次中第一篇文章最多等待其他文章多少秒
+DRAFT_BATCH_WINDOW = 5.0
+# draft/update 返回这些错误码时表示草稿已不存在（已发表或被删除），改为创建新草稿
+MISSING_DRAFT_ERRCODES = {40007}
+# 表示 access_token 无效或已过期的错误码，出现时丢弃缓存的令牌
+INVALID_TOKEN_ERRCODES = {40001, 40014, 42001}
+# 表示接口调用频率或配额超限的错误码
+THROTTLE_ERRCODES = {45009, 45011}
+# 可以重试的暂时性错误：-1 系统繁忙，45011 分钟级频率超限（45009 为当日配额用尽，重试无意义）
+RETRYABLE_ERRCODES = {-1, 45011}
+
+class DraftNotFound(Exception):
+    """要更新的草稿已不存在"""
+
 
 class WeChatPublisher(BasePublisher):
     """处理与微信公众号API交互、文档处理和发布的类。"""
 
     platform_name = 'wechat'
+    # 正文显示宽度有限，最长边 1920 像素已足够清晰；封面只以缩略图展示
+    image_profiles = {
+        'content': {'max_dimension': 1920, 'quality': 85, 'max_bytes': MATERIAL_MAX_BYTES},
+        'cover': {'max_dimension': 1280, 'format': 'JPEG', 'quality': 85, 'max_bytes': MATERIAL_MAX_BYTES},
+        'inline': {'max_dimension': 1920, 'format': 'JPEG', 'quality': 85, 'max_bytes': INLINE_IMAGE_MAX_BYTES},
+        'thumb': {'max_dimension': 1920, 'format': 'JPEG', 'quality': 85, 'max_bytes': THUMB_MAX_BYTES},
+    }
 
     def __init__(self, account_name: str, platform_config: dict, common_config: 'Config'):
         super().__init__(account_name, platform_config, common_config)
@@ -25,16 +65,53 @@ class WeChatPublisher(BasePublisher):
         if not self.app_id or not self.app_secret:
             raise ValueError(f"微信公众号 '{account_name}' 的配置缺少 'app_id' 或 'app_secret'")
         self.default_author = self.platform_config.get('author', '')
-        self.access_token: Optional[str] = None
-        self.token_expires_at: int = 0
-        self.session = requests.Session()
-        self.markdown_converter = Markdown(extensions=['meta', 'extra', 'sane_lists', 'tables', 'fenced_code'])
+        self.session = self.create_session()
+        # 同一公众号的令牌通过缓存文件在进程间共享，并在过期前由后台线程刷新
+        self.token_manager = TokenManager(f'wechat:{self.app_id}', self._fetch_access_token,
+                                          cache_file=(common_config or {}).get('token_cache_file'))
+        # 再次发布同一个文件时原地更新上次创建的草稿（需要配置 publish_state_file）
+        self.update_drafts = bool(self.platform_config.get('update_drafts', True))
+        # 合并创建草稿：同时发布的文章合并为一个多图文草稿，一次令牌检查、一次 draft/add 请求
+        self._draft_batcher: Optional[Batcher] = None
+        batch_config = self.platform_config.get('draft_batch')
+        if batch_config:
+            batch_config = batch_config if isinstance(batch_config, dict) else {}
+            max_articles = max(1, min(DRAFT_MAX_ARTICLES,
+                                      int(batch_config.get('max_articles', DRAFT_MAX_ARTICLES))))
+            self._draft_batcher = Batcher(self._create_draft_batch, max_articles,
+                                          float(batch_config.get('window', DRAFT_BATCH_WINDOW)))
+            # 同一批次的文章需要同时处于发布中，账户的并发发布数至少为批次大小
+            self.max_concurrency = max(self.max_concurrency, max_articles)
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """当前缓存的 access_token（不触发刷新）。"""
+        return self.token_manager.token
 
     def _get_access_token(self) -> Optional[str]:
-        """获取或刷新微信公众号的access_token。"""
-        if self.access_token and time.time() < self.token_expires_at:
-            return self.access_token
-
+        """获取微信公众号的access_token，只有没有可用令牌时才会等待刷新。"""
+        return self.token_manager.get()
+
+    def is_throttled(self, status_code: int, data) -> bool:
+        """HTTP 429 之外，微信以 200 状态码返回频率/配额超限的 errcode。"""
+        if super().is_throttled(status_code, data):
+            return True
+        return isinstance(data, dict) and data.get('errcode') in THROTTLE_ERRCODES
+
+    def is_retryable_response(self, status_code: int, data, idempotent: bool) -> bool:
+        """微信的暂时性错误同样以 200 状态码返回，平台拒绝处理的请求无论是否幂等都可以重试。"""
+        if super().is_retryable_response(status_code, data, idempotent):
+            return True
+        return isinstance(data, dict) and data.get('errcode') in RETRYABLE_ERRCODES
+
+    def _check_token_error(self, data: dict, token: str) -> None:
+        """接口报告令牌失效时丢弃缓存的令牌，下次调用重新获取。"""
+        if data.get('errcode') in INVALID_TOKEN_ERRCODES:
+            self.log_warning(f"access_token 已失效 (errcode {data['errcode']})，将重新获取。")
+            self.token_manager.invalidate(token)
+
+    def _fetch_access_token(self) -> Optional[Tuple[str, int]]:
+        """向微信服务器请求新的access_token，返回 (access_token, 有效期秒数)。"""
         url = "https://api.weixin.qq.com/cgi-bin/token"
         params = {
             'grant_type': 'client_credential',
@@ -42,15 +119,12 @@ class WeChatPublisher(BasePublisher):
             'secret': self.app_secret
         }
         try:
-            response = self.session.get(url, params=params)
+            response = self.call_api('token', lambda: self.session.get(url, params=params))
             response.raise_for_status()
             data = response.json()
             if 'access_token' in data:
-                self.access_token = data['access_token']
-                # 提前60秒过期，防止边缘情况
-                self.token_expires_at = time.time() + data.get('expires_in', 7200) - 60
                 self.log_info("成功获取 access_token。")
-                return self.access_token
+                return data['access_token'], data.get('expires_in', 7200)
             else:
                 self.log_error(f"获取 access_token 失败: {data.get('errmsg', '未知错误')}")
                 return None
@@ -59,24 +133,20 @@ class WeChatPublisher(BasePublisher):
             return None
 
     def upload_image(self, image_path: str) -> Optional[str]:
-        """上传本地图片到微信服务器，作为文章内容图片。"""
+        """上传本地图片到微信服务器，作为文章内容图片。内容相同的图片只上传一次。"""
+        return self.cached_upload(image_path, self._upload_image, kind='material')
+
+    def _upload_image(self, image_path: str) -> Optional[str]:
+        """上传本地图片到微信服务器（永久素材），返回图片URL。"""
         token = self._get_access_token()
         if not token:
             return None
 
         url = f"https://api.weixin.qq.com/cgi-bin/material/add_material?access_token={token}&type=image"
         try:
-            with open(image_path, 'rb') as f:
-                files = {'media': (os.path.basename(image_path), f)}
-                response = self.session.post(url, files=files)
-                response.raise_for_status()
-                data = response.json()
-                if 'url' in data:
-                    self.log_success(f"图片上传成功: {os.path.basename(image_path)}")
-                    return data['url']
-                else:
-                    self.log_error(f"上传图片失败: {data.get('errmsg', '未知错误')}")
-                    return None
+            response = self.call_api('material/add_material', lambda: post_file(self.session, url, 'media', image_path))
+            response.raise_for_status()
+            return self._media_result(response.json(), token, 'url', '图片', image_path)
         except FileNotFoundError:
             self.log_error(f"图片文件未找到: {image_path}")
             return None
@@ -84,7 +154,21 @@ class WeChatPublisher(BasePublisher):
             self.log_error(f"上传图片时发生网络错误: {e}")
             return None
 
+    def _media_result(self, data: dict, token: str, key: str, label: str, image_path: str) -> Optional[str]:
+        """从素材上传接口的响应中取出 key 对应的值，失败时记录错误。"""
+        if key in data:
+            self.log_success(f"{label}上传成功: {os.path.basename(image_path)}")
+            return data[key]
+        self._check_token_error(data, token)
+        self.log_error(f"上传{label}失败: {data.get('errmsg', '未知错误')}")
+        return None
+
     def _upload_thumb_image(self, image_path: str) -> Optional[str]:
+        """上传图片作为封面图（临时素材），返回media_id。media_id 过期前复用缓存结果。"""
+        return self.cached_upload(image_path, self._upload_thumb_image_uncached,
+                                  kind='temporary_thumb', ttl=TEMPORARY_MEDIA_TTL)
+
+    def _upload_thumb_image_uncached(self, image_path: str) -> Optional[str]:
         """上传图片作为封面图（临时素材），返回media_id。"""
         token = self._get_access_token()
         if not token:
@@ -92,60 +176,111 @@ class WeChatPublisher(BasePublisher):
 
         url = f"https://api.weixin.qq.com/cgi-bin/media/upload?access_token={token}&type=image"
         try:
-            with open(image_path, 'rb') as f:
-                files = {'media': (os.path.basename(image_path), f)}
-                response = self.session.post(url, files=files)
-                response.raise_for_status()
-                data = response.json()
-                if 'media_id' in data:
-                    self.log_success(f"封面图上传成功: {os.path.basename(image_path)}")
-                    return data['media_id']
-                else:
-                    self.log_error(f"上传封面图失败: {data.get('errmsg', '未知错误')}")
-                    return None
+            response = self.call_api('media/upload', lambda: post_file(self.session, url, 'media', image_path))
+            response.raise_for_status()
+            return self._media_result(response.json(), token, 'media_id', '封面图', image_path)
         except Exception as e:
             self.log_error(f"上传封面图时发生异常: {e}", exc_info=True)
             return None
 
     def publish(self, content_path: str, **kwargs) -> bool:
-        """处理和发布单个Markdown文档的完整流程。"""
+        """
+        处理和发布单个Markdown文档的完整流程。
+
+        文件发布过时（配置了 publish_state_file），与上次的发布记录比较文章各部分的哈希，只重新执行
+        受影响的步骤：正文、图片和样式都没变时沿用上次生成的正文，封面没变时沿用上次的封面，
+        草稿通过 draft/update 原地更新。
+        """
         self.log_info(f"开始处理文件: {os.path.basename(content_path)}")
+        # 由任务队列驱动时，已完成的步骤（已上传的图片、封面、已创建的草稿）直接复用上次的结果
+        checkpoint = current_checkpoint()
 
         try:
             # 1. 读取和解析Markdown
-            html_content, metadata = self.process_markdown(content_path)
+            source = self.load_document(content_path)
+            metadata = self.article_metadata(content_path, source)
             title = metadata.get('title', os.path.basename(content_path).split('.')[0])
             author = metadata.get('author', self.default_author)
             digest = metadata.get('digest', '')
+            if not checkpoint.done('parse'):
+                checkpoint.complete('parse')
 
-            # 2. 处理HTML中的图片
             base_dir = os.path.dirname(content_path)
-            html_content, local_images = self._process_html_images(html_content, base_dir)
-
-            # 3. 上传封面图
-            cover_image_path = metadata.get('cover')
-            thumb_media_id = None
-            if cover_image_path:
-                full_cover_path = os.path.join(base_dir, cover_image_path)
-                if os.path.exists(full_cover_path):
-                    thumb_media_id = self._upload_thumb_image(full_cover_path)
+            components = self._components(source, metadata, base_dir)
+            previous = self._previous_publish(content_path)
+            if previous is not None:
+                changed = self._changed_components(previous, components, source)
+                if not changed and self.update_drafts:
+                    if self._draft_exists(previous['media_id']):
+                        self.log_info(f"文章内容未变化，草稿 {previous['media_id']} 无需更新")
+                        return True
+                    self.log_warning(f"草稿 {previous['media_id']} 已不存在（可能已发表或被删除），将创建新草稿")
+                    previous = None
                 else:
-                    self.log_warning(f"指定的封面图片不存在: {full_cover_path}")
-            
-            if not thumb_media_id and local_images:
-                thumb_media_id = self._upload_thumb_image(local_images[0])
+                    self.log_info(f"文章已发布过，变化的部分: {', '.join(changed) or '无'}")
+
+            # 2. 正文只解析一次：图片上传替换、清理和样式内联都在同一棵文档树上完成
+            content_key = self._content_key(components, title)
+            if previous is not None and previous.get('content_key') == content_key:
+                self.log_info("正文、图片和样式未变化，沿用上次生成的正文")
+                final_html = previous['content']
+                local_images = source.local_images
+            else:
+                with self.stage('render'):
+                    html_content = source.html(tuple(self.markdown_extensions))
+                document, stylesheet = self._build_document(html_content, title)
+                stages = [self._image_stage(base_dir, checkpoint), SanitizeStage()]
+                if stylesheet:
+                    stages.append(StyleInlineStage(stylesheet))
+                final_html = HtmlPipeline(stages, timer=self.stage).run(document)
+                local_images = document.local_images
+
+            # 3. 上传封面图（临时素材会过期，超过有效期的记录重新上传）
+            thumb_uploaded_at = time.time()
+            if previous is not None and previous['components'].get('cover') == components['cover'] \
+                    and previous.get('thumb_media_id') \
+                    and time.time() - previous.get('thumb_uploaded_at', 0) < TEMPORARY_MEDIA_TTL:
+                thumb_media_id = previous['thumb_media_id']
+                thumb_uploaded_at = previous['thumb_uploaded_at']
+            else:
+                with self.stage('cover'):
+                    thumb_media_id = checkpoint.run('cover',
+                                                    lambda: self._upload_cover(metadata, base_dir, local_images),
+                                                    ttl=TEMPORARY_MEDIA_TTL)
 
             if not thumb_media_id:
                 self.log_warning("无法确定封面图，将不设置封面。")
                 # 这里可以根据配置选择是否继续
                 # return False
 
-            # 4. 样式化和创建草稿
-            final_html = self._wrap_html_with_style(html_content, title)
-            draft_id = self._create_draft(title, final_html, thumb_media_id, author, digest)
+            # 4. 创建草稿，发布过的文章更新原有的草稿
+            with self.stage('draft'):
+                draft_id = None
+                draft_index = 0
+                if previous is not None and self.update_drafts:
+                    article = self._draft_article(title, final_html, thumb_media_id, author, digest)
+                    draft_index = previous.get('index', 0)
+                    try:
+                        draft_id = checkpoint.run('draft', lambda: self._update_draft(previous['media_id'], draft_index,
+                                                                                      article))
+                    except DraftNotFound:
+                        self.log_warning(f"草稿 {previous['media_id']} 已不存在（可能已发表或被删除），将创建新草稿")
+                        previous = None
+                        draft_index = 0
+                if draft_id is None and (previous is None or not self.update_drafts):
+                    batch = self._draft_batch_key(metadata)
+                    if batch is None:
+                        draft_id = checkpoint.run('draft', lambda: self._create_draft(title, final_html, thumb_media_id,
+                                                                                      author, digest))
+                    else:
+                        article = self._draft_article(title, final_html, thumb_media_id, author, digest)
+                        draft = checkpoint.run('draft', lambda: self._draft_batcher.submit(batch, article))
+                        draft_id, draft_index = draft if draft else (None, 0)
 
             if draft_id:
                 self.log_success(f"成功创建草稿: '{title}' (ID: {draft_id})")
+                self._record_publish(content_path, source, components, title, final_html, draft_id, draft_index,
+                                     thumb_media_id, thumb_uploaded_at)
                 return True
             else:
                 self.log_error(f"创建草稿失败: '{title}'")
@@ -155,28 +290,202 @@ class WeChatPublisher(BasePublisher):
             self.log_error(f"处理文件时发生未知错误: {e}", exc_info=True)
             return False
 
+    async def publish_async(self, content_path: str, **kwargs) -> bool:
+        """
+        publish 的异步版本：图片上传和创建草稿通过事件循环共享的异步 HTTP 客户端完成，
+        Markdown 渲染和样式内联等 CPU 工作放到线程中执行。未安装异步 HTTP 后端时在线程池中运行 publish。
+        """
+        # 发布过的文件按差异更新草稿，由同步版本在线程池中处理
+        if not async_http_available() or self._previous_publish(content_path) is not None:
+            return await super().publish_async(content_path, **kwargs)
+
+        self.log_info(f"开始处理文件: {os.path.basename(content_path)}")
+
+        try:
+            source = await asyncio.to_thread(self.load_document, content_path)
+            metadata = self.article_metadata(content_path, source)
+            title = metadata.get('title', os.path.basename(content_path).split('.')[0])
+            author = metadata.get('author', self.default_author)
+            digest = metadata.get('digest', '')
+
+            base_dir = os.path.dirname(content_path)
+            with self.stage('render'):
+                html_content = await asyncio.to_thread(source.html, tuple(self.markdown_extensions))
+            document, stylesheet = await asyncio.to_thread(self._build_document, html_content, title)
+            image_stage = self._image_stage(base_dir)
+            local_images = image_stage.collect(document)
+            if local_images:
+                prepared = await asyncio.to_thread(self.prepare_images, document.local_images, 'content')
+                results = await self.upload_images_async(list(prepared.values()), self.upload_image_async)
+                image_stage.rewrite(local_images, {path: results.get(upload_path)
+                                                   for path, upload_path in prepared.items()})
+            stages = [SanitizeStage()]
+            if stylesheet:
+                stages.append(StyleInlineStage(stylesheet))
+            final_html = await asyncio.to_thread(HtmlPipeline(stages, timer=self.stage).run, document)
+
+            cover_path = self._cover_path(metadata, base_dir)
+            thumb_media_id = None
+            with self.stage('cover'):
+                if cover_path:
+                    thumb_media_id = await self._upload_thumb_image_async(
+                        await asyncio.to_thread(self.prepare_image, cover_path, 'cover'))
+                if not thumb_media_id and document.local_images:
+                    thumb_media_id = await self._upload_thumb_image_async(
+                        await asyncio.to_thread(self.prepare_image, document.local_images[0], 'cover'))
+            if not thumb_media_id:
+                self.log_warning("无法确定封面图，将不设置封面。")
+
+            batch = self._draft_batch_key(metadata)
+            draft_index = 0
+            with self.stage('draft'):
+                if batch is None:
+                    draft_id = await self._create_draft_async(title, final_html, thumb_media_id, author, digest)
+                else:
+                    article = self._draft_article(title, final_html, thumb_media_id, author, digest)
+                    draft = await asyncio.to_thread(self._draft_batcher.submit, batch, article)
+                    draft_id, draft_index = draft if draft else (None, 0)
+            if draft_id:
+                self.log_success(f"成功创建草稿: '{title}'")
+                if self.publish_state is not None:
+                    components = await asyncio.to_thread(self._components, source, metadata, base_dir)
+                    await asyncio.to_thread(self._record_publish, content_path, source, components, title,
+                                            final_html, draft_id, draft_index, thumb_media_id, time.time())
+                return True
+            self.log_error(f"创建草稿失败: '{title}'")
+            return False
+
+        except Exception as e:
+            self.log_error(f"处理文件时发生未知错误: {e}", exc_info=True)
+            return False
+
+    async def upload_image_async(self, image_path: str) -> Optional[str]:
+        """upload_image 的异步版本，与同步版本共享上传缓存。"""
+        return await self.cached_upload_async(image_path, self._upload_image_async, kind='material')
+
+    async def _upload_image_async(self, image_path: str) -> Optional[str]:
+        token = await asyncio.to_thread(self._get_access_token)
+        if not token:
+            return None
+
+        url = "https://api.weixin.qq.com/cgi-bin/material/add_material"
+        try:
+            response = await self.call_api_async('material/add_material', lambda: get_async_client().post_file(
+                url, 'media', image_path, params={'access_token': token, 'type': 'image'}))
+            response.raise_for_status()
+            return self._media_result(response.json(), token, 'url', '图片', image_path)
+        except FileNotFoundError:
+            self.log_error(f"图片文件未找到: {image_path}")
+            return None
+        except AsyncHttpError as e:
+            self.log_error(f"上传图片时发生网络错误: {e}")
+            return None
+
+    async def _upload_thumb_image_async(self, image_path: str) -> Optional[str]:
+        """_upload_thumb_image 的异步版本，与同步版本共享上传缓存。"""
+        return await self.cached_upload_async(image_path, self._upload_thumb_image_uncached_async,
+                                              kind='temporary_thumb', ttl=TEMPORARY_MEDIA_TTL)
+
+    async def _upload_thumb_image_uncached_async(self, image_path: str) -> Optional[str]:
+        token = await asyncio.to_thread(self._get_access_token)
+        if not token:
+            return None
+
+        url = "https://api.weixin.qq.com/cgi-bin/media/upload"
+        try:
+            response = await self.call_api_async('media/upload', lambda: get_async_client().post_file(
+                url, 'media', image_path, params={'access_token': token, 'type': 'image'}))
+            response.raise_for_status()
+            return self._media_result(response.json(), token, 'media_id', '封面图', image_path)
+        except Exception as e:
+            self.log_error(f"上传封面图时发生异常: {e}", exc_info=True)
+            return None
+
+    async def _create_draft_async(self, title: str, content: str, thumb_media_id: str, author: str,
+                                  digest: str) -> Optional[str]:
+        payload = self._draft_payload(title, content, thumb_media_id, author, digest)
+        return await self.create_once_async(lambda: self._create_draft_uncached_async(title, payload))
+
+    async def _create_draft_uncached_async(self, title: str, payload: bytes) -> Optional[str]:
+        token = await asyncio.to_thread(self._get_access_token)
+        if not token:
+            return None
+
+        url = "https://api.weixin.qq.com/cgi-bin/draft/add"
+        try:
+            response = await self.call_api_async('draft/add', lambda: get_async_client().post(
+                url, params={'access_token': token}, data=payload), idempotent=False)
+            response.raise_for_status()
+            return self._draft_result(response.json(), token, title)
+        except AsyncHttpError as e:
+            self.log_error(f"创建草稿时发生网络错误: {e}")
+            return None
+
+    def _cover_path(self, metadata: dict, base_dir: str) -> Optional[str]:
+        """返回元数据中指定的封面图路径，未指定或文件不存在时返回 None。"""
+        cover_image_path = metadata.get('cover')
+        if not cover_image_path:
+            return None
+        full_cover_path = os.path.join(base_dir, cover_image_path)
+        if os.path.exists(full_cover_path):
+            return full_cover_path
+        self.log_warning(f"指定的封面图片不存在: {full_cover_path}")
+        return None
+
+    def _image_stage(self, base_dir: str, checkpoint: Optional[JobCheckpoint] = None) -> ImageRewriteStage:
+        """
+        创建上传本地图片并替换链接的流水线阶段。
+
+        给出任务进度时，上次已上传成功的图片直接使用记录的地址，只上传其余的图片。
+        上传前按 'content' 规格缩放、压缩图片，进度和替换仍以原图路径为准。
+        """
+        def upload_many(image_paths: List[str]) -> Dict[str, Optional[str]]:
+            uploaded = dict((checkpoint.result('images') if checkpoint else None) or {})
+            missing = [path for path in image_paths if not uploaded.get(path)]
+            prepared = self.prepare_images(missing, 'content')
+            results = self.upload_images_concurrently(list(prepared.values()), self.upload_image)
+            uploaded.update({path: results.get(upload_path) for path, upload_path in prepared.items()})
+            if checkpoint is not None:
+                checkpoint.complete('images', uploaded)
+            return uploaded
+
+        fetch_remote = self._fetch_remote_images if self.platform_config.get('rehost_remote_images', True) else None
+        return ImageRewriteStage(base_dir, upload_many, log_info=self.log_info, log_warning=self.log_warning,
+                                 fetch_remote=fetch_remote)
+
+    def _fetch_remote_images(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """下载需要转存的网络图片：微信不显示外链图片，微信自己域名下的图片保持原样。"""
+        to_fetch = [url for url in urls if urllib.parse.urlparse(url).hostname not in WECHAT_IMAGE_HOSTS]
+        downloaded = self.fetch_remote_images(to_fetch)
+        for url in to_fetch:
+            if not downloaded.get(url):
+                self.log_warning(f"下载网络图片失败，HTML中的引用将保持原样: {url}")
+        return downloaded
+
+    def _upload_cover(self, metadata: dict, base_dir: str, local_images: List[str]) -> Optional[str]:
+        """上传元数据中指定的封面图，未指定或上传失败时使用正文首图，返回封面的 media_id。"""
+        cover_path = self._cover_path(metadata, base_dir)
+        thumb_media_id = self._upload_thumb_image(self.prepare_image(cover_path, 'cover')) if cover_path else None
+        if not thumb_media_id and local_images:
+            thumb_media_id = self._upload_thumb_image(self.prepare_image(local_images[0], 'cover'))
+        return thumb_media_id
+
     def _process_html_images(self, html: str, base_dir: str) -> Tuple[str, List[str]]:
         """处理HTML中的图片，上传本地图片并替换链接，返回处理后的HTML和本地图片列表。"""
-        soup = BeautifulSoup(html, 'html.parser')
-        local_image_paths = []
-        for img in soup.find_all('img'):
-            src = img.get('src')
-            if not src or src.startswith(('http://', 'https://', 'data:')):
-                continue
+        document = HtmlDocument.from_fragment(html)
+        self._image_stage(base_dir).apply(document)
+        return document.body_html(), document.local_images
 
-            image_path = os.path.join(base_dir, src)
-            if os.path.exists(image_path):
-                local_image_paths.append(image_path)
-                self.log_info(f"准备上传本地图片: {src}")
-                wechat_url = self.upload_image(image_path)
-                if wechat_url:
-                    img['src'] = wechat_url
-                else:
-                    self.log_warning(f"上传图片失败，HTML中的引用将保持原样: {src}")
-            else:
-                self.log_warning(f"本地图片未找到，跳过: {image_path}")
-        
-        return str(soup), local_image_paths
+    def _build_document(self, html_body: str, title: str) -> Tuple[HtmlDocument, Optional[CompiledStylesheet]]:
+        """把正文放入带样式表的完整文档中解析，返回文档和对应的预编译样式表（未找到样式表时为 None）。"""
+        css_path = os.path.join(os.path.dirname(__file__), 'style.css')
+        try:
+            # 样式表只在首次使用（或文件修改后）解析一次，之后复用编译结果
+            css_content, stylesheet = get_compiled_stylesheet(css_path, remove_classes=True)
+        except FileNotFoundError:
+            self.log_warning(f"style.css 未找到，将不应用内联样式。")
+            return HtmlDocument.from_body(html_body, title), None
+        return HtmlDocument.from_body(html_body, title, css_content, 'markdown-body'), stylesheet
 
     def _wrap_html_with_style(self, body_html: str, title: str) -> str:
         """将HTML内容包裹在带有基本样式的完整HTML结构中。"""
@@ -202,20 +511,17 @@ class WeChatPublisher(BasePublisher):
         
         # 使用premailer内联CSS
         try:
+            from premailer import Premailer
             inlined_html = Premailer(full_html).transform()
             return inlined_html
         except Exception as e:
             self.log_warning(f"CSS内联失败，将使用原始HTML: {e}")
             return full_html
 
-    def _create_draft(self, title: str, content: str, thumb_media_id: str, author: str, digest: str) -> bool:
-        """在微信公众号中创建一篇草稿。"""
-        token = self._get_access_token()
-        if not token:
-            return False
-
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
-        article = {
+    @staticmethod
+    def _draft_article(title: str, content: str, thumb_media_id: str, author: str, digest: str) -> dict:
+        """构造 draft/add 请求中的一篇图文。"""
+        return {
             'title': title,
             'author': author,
             'digest': digest,
@@ -225,34 +531,205 @@ class WeChatPublisher(BasePublisher):
             'need_open_comment': 1,
             'only_fans_can_comment': 0
         }
-        payload = {'articles': [article]}
+
+    @classmethod
+    def _draft_payload(cls, title: str, content: str, thumb_media_id: str, author: str, digest: str) -> bytes:
+        """构造 draft/add 接口的请求体。"""
+        return cls._articles_payload([cls._draft_article(title, content, thumb_media_id, author, digest)])
+
+    @staticmethod
+    def _articles_payload(articles: List[dict]) -> bytes:
+        payload = {'articles': articles}
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def _draft_result(self, data: dict, token: str, title: str) -> Optional[str]:
+        """解析 draft/add 接口的响应，返回草稿的 media_id，失败时记录错误并返回 None。"""
+        if 'media_id' in data:
+            self.log_success(f"草稿创建成功: '{title}' (Media ID: {data['media_id']})")
+            return data['media_id']
+        self._check_token_error(data, token)
+        self.log_error(f"创建草稿失败: {data.get('errmsg', '未知错误')}")
+        return None
+
+    def _create_draft(self, title: str, content: str, thumb_media_id: str, author: str,
+                      digest: str) -> Optional[str]:
+        """
+        在微信公众号中创建一篇草稿，返回草稿的 media_id。
+
+        草稿 ID 记入当前任务的进度：任务重试时不会重复创建。
+        """
+        payload = self._draft_payload(title, content, thumb_media_id, author, digest)
+        return self.create_once(lambda: self._create_draft_uncached(title, payload))
+
+    def _components(self, source: SourceDocument, metadata: dict, base_dir: str) -> Dict[str, str]:
+        """文章各部分的哈希：在中间表示的元数据、正文和图片之外加上封面和样式表"""
+        components = source.components()
+        cover = metadata.get('cover')
+        cover_path = os.path.join(base_dir, cover) if cover else None
+        if cover_path and os.path.isfile(cover_path):
+            cover_hash = get_file_checksum(cover_path, 'sha256')
+        else:
+            # 未指定封面或封面不存在时使用正文首图
+            cover_hash = next((image.sha256 for image in source.images if image.path), None)
+        components['cover'] = self.idempotency_key([cover, cover_hash])
+        components['style'] = self.idempotency_key(self._stylesheet_source())
+        return components
+
+    def _stylesheet_source(self) -> str:
+        css_path = os.path.join(os.path.dirname(__file__), 'style.css')
+        try:
+            return get_compiled_stylesheet(css_path, remove_classes=True)[0]
+        except FileNotFoundError:
+            return ''
+
+    def _content_key(self, components: Dict[str, str], title: str) -> str:
+        """生成的正文取决于正文源码、图片、样式表和标题"""
+        return self.idempotency_key([components['body'], components['images'], components['style'], title,
+                                     bool(self.platform_config.get('rehost_remote_images', True))])
+
+    @staticmethod
+    def _changed_components(previous: dict, components: Dict[str, str], source: SourceDocument) -> List[str]:
+        """与上次发布相比发生变化的部分，正文附带变化的块数"""
+        changed = []
+        for name, value in components.items():
+            if previous['components'].get(name) == value:
+                continue
+            if name == 'body':
+                old_blocks = set(previous.get('blocks') or [])
+                blocks = source.block_hashes
+                name = f"body ({sum(1 for block in blocks if block not in old_blocks)}/{len(blocks)} 个块)"
+            changed.append(name)
+        return changed
+
+    def _previous_publish(self, content_path: str) -> Optional[dict]:
+        """文件上次发布的记录，没有记录或未开启发布记录时返回 None"""
+        state = self.publish_state
+        if state is None:
+            return None
+        previous = state.get(self.platform_name, self.account_name, os.path.abspath(content_path))
+        if not previous or not previous.get('media_id'):
+            return None
+        return previous
+
+    def _record_publish(self, content_path: str, source: SourceDocument, components: Dict[str, str], title: str,
+                        final_html: str, draft_id: str, draft_index: int, thumb_media_id: Optional[str],
+                        thumb_uploaded_at: float) -> None:
+        """记录本次发布的草稿、各部分的哈希和生成的正文，供下次发布时比较"""
+        state = self.publish_state
+        if state is None:
+            return
+        state.put(self.platform_name, self.account_name, os.path.abspath(content_path), {
+            'media_id': draft_id,
+            'index': draft_index,
+            'components': components,
+            'blocks': source.block_hashes,
+            'content_key': self._content_key(components, title),
+            'content': final_html,
+            'thumb_media_id': thumb_media_id,
+            'thumb_uploaded_at': thumb_uploaded_at,
+        })
+
+    def _draft_exists(self, media_id: str) -> bool:
+        """草稿是否仍然存在（可能已在后台发表或被删除），无法确认时按存在处理。"""
+        token = self._get_access_token()
+        if not token:
+            return True
+
+        url = f"https://api.weixin.qq.com/cgi-bin/draft/get?access_token={token}"
+        payload = json.dumps({'media_id': media_id}).encode('utf-8')
         try:
-            response = self.session.post(url, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+            response = self.call_api('draft/get', lambda: self.session.post(url, data=payload))
             response.raise_for_status()
             data = response.json()
-            if 'media_id' in data:
-                self.log_success(f"草稿创建成功: '{title}' (Media ID: {data['media_id']})")
-                return True
-            else:
-                self.log_error(f"创建草稿失败: {data.get('errmsg', '未知错误')}")
-                return False
         except requests.RequestException as e:
-            self.log_error(f"创建草稿时发生网络错误: {e}")
+            self.log_warning(f"查询草稿 {media_id} 时发生网络错误，按草稿仍存在处理: {e}")
+            return True
+
+        if data.get('errcode', 0) in MISSING_DRAFT_ERRCODES:
             return False
-        digest = metadata.get('digest', [''])[0]
+        self._check_token_error(data, token)
+        return True
+
+    def _update_draft(self, media_id: str, index: int, article: dict) -> Optional[str]:
+        """
+        用 draft/update 原地更新草稿中的一篇图文，返回草稿的 media_id，失败时返回 None。
 
-        if not title:
-            soup = BeautifulSoup(html_body, 'html.parser')
-            h1 = soup.find('h1')
-            if h1: title = h1.text.strip()
-        if not title:
-            title = os.path.splitext(os.path.basename(file_path))[0]
-        return title, author, digest
+        Raises:
+            DraftNotFound: 草稿已不存在
+        """
+        token = self._get_access_token()
+        if not token:
+            return None
+
+        url = f"https://api.weixin.qq.com/cgi-bin/draft/update?access_token={token}"
+        payload = json.dumps({'media_id': media_id, 'index': index, 'articles': article},
+                             ensure_ascii=False).encode('utf-8')
+        try:
+            # 更新是幂等的，网络错误和服务端错误都可以重试
+            response = self.call_api('draft/update', lambda: self.session.post(url, data=payload))
+            response.raise_for_status()
+            data = response.json()
+        except requests.RequestException as e:
+            self.log_error(f"更新草稿时发生网络错误: {e}")
+            return None
+
+        if data.get('errcode', 0) == 0:
+            self.log_success(f"草稿更新成功: '{article['title']}' (Media ID: {media_id})")
+            return media_id
+        if data.get('errcode') in MISSING_DRAFT_ERRCODES:
+            raise DraftNotFound(media_id)
+        self._check_token_error(data, token)
+        self.log_error(f"更新草稿失败: {data.get('errmsg', '未知错误')}")
+        return None
+
+    def _draft_batch_key(self, metadata: dict) -> Optional[str]:
+        """
+        文章所属的草稿批次，未开启合并创建草稿时返回 None。
+
+        front matter 中 batch 相同的文章合并到同一个草稿，没有 batch 的文章合并到默认批次。
+        """
+        if self._draft_batcher is None:
+            return None
+        return str(metadata.get('batch') or '')
+
+    def _create_draft_batch(self, articles: List[dict]) -> List[Optional[Tuple[str, int]]]:
+        """
+        把一个批次的文章创建为一个多图文草稿，每篇文章的结果为 (草稿的 media_id, 文章在草稿中的序号)，
+        创建失败时为 None。
+
+        批次由多个任务共享，不记入某一个任务的进度；每篇文章的结果由各自任务的 draft 步骤记录，
+        重试时不会重复创建。
+        """
+        titles = [article['title'] for article in articles]
+        label = titles[0] if len(titles) == 1 else f"{titles[0]} 等 {len(titles)} 篇"
+        payload = self._articles_payload(articles)
+        media_id = self._create_draft_uncached(label, payload)
+        if not media_id:
+            return [None] * len(articles)
+        if len(titles) > 1:
+            for index, title in enumerate(titles):
+                self.log_info(f"'{title}' 是草稿 {media_id} 的第 {index + 1} 篇图文")
+        return [(media_id, index) for index in range(len(articles))]
+
+    def _create_draft_uncached(self, title: str, payload: bytes) -> Optional[str]:
+        token = self._get_access_token()
+        if not token:
+            return None
+
+        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
+        try:
+            response = self.call_api('draft/add', lambda: self.session.post(url, data=payload), idempotent=False)
+            response.raise_for_status()
+            return self._draft_result(response.json(), token, title)
+        except requests.RequestException as e:
+            self.log_error(f"创建草稿时发生网络错误: {e}")
+            return None
 
     # FIX:
     # FIX:
     # FIX:
     def _upload_and_replace_images(self, html_body, base_path):
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_body, 'html.parser')
         images = soup.find_all('img')
         local_image_paths = []
@@ -330,39 +807,19 @@ class WeChatPublisher(BasePublisher):
     # END FIX:
 
     def _wrap_html_with_style(self, html_body, title):
-        css_path = os.path.join(os.path.dirname(__file__), 'style.css')
-        try:
-            with open(css_path, 'r', encoding='utf-8') as f: css_content = f.read()
-            full_html = f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title><style>{css_content}</style></head><body><article class="markdown-body">{html_body}</article></body></html>'
-            premailer_instance = Premailer(full_html, remove_classes=True)
-            return premailer_instance.transform()
-        except FileNotFoundError:
-            self.log_warning(f"style.css 未找到，将不应用内联样式。")
-            return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title></head><body><article>{html_body}</article></body></html>'
+        document, stylesheet = self._build_document(html_body, title)
+        return HtmlPipeline([StyleInlineStage(stylesheet)] if stylesheet else []).run(document)
 
     def _get_local_image_path(self, src, base_path):
         self.log_info(f"[_get_local_image_path] 正在处理图片 src: {src}")
         if src.startswith(('http://', 'https')):
-            try:
-                # FIX: 添加 verify=False 解决SSL证书问题，并增强日志
-                response = self.session.get(src, stream=True, timeout=10, verify=False)
-                response.raise_for_status()
-                self.log_info(f"[_get_local_image_path] 成功下载图片: {src}")
-                
-                import tempfile
-                from urllib.parse import urlparse
-                ext = os.path.splitext(urlparse(src).path)[1] or '.jpg'
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=ext)
-                temp_file.close()
-                with open(temp_file.name, 'wb') as f:
-                    for chunk in response.iter_content(8192): f.write(chunk)
-                
-                self.log_info(f"[_get_local_image_path] 临时文件已创建: {temp_file.name}")
-                return temp_file.name, True
-            except requests.exceptions.RequestException as e:
-                self.log_error(f"[_get_local_image_path] 下载网络图片失败: {src}, 错误: {e}", exc_info=True)
+            # 下载到共享的下载缓存（校验证书、按 ETag 复用、超出大小上限时淘汰），不再留下临时文件
+            local_path = self.download_cache.fetch(src)
+            if local_path is None:
+                self.log_error(f"[_get_local_image_path] 下载网络图片失败: {src}")
                 return None, False
-            # END FIX:
+            self.log_info(f"[_get_local_image_path] 成功获取图片: {src} -> {local_path}")
+            return local_path, False
         else:
             abs_path = os.path.abspath(os.path.join(base_path, *src.split('/')))
             if os.path.exists(abs_path):
@@ -372,52 +829,41 @@ class WeChatPublisher(BasePublisher):
                 return None, False
 
     def get_access_token(self):
-        url = f"https://api.weixin.qq.com/cgi-bin/token?grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}"
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if "access_token" in data:
-                self.access_token = data['access_token']
-                self.token_expires_at = time.time() + data.get('expires_in', 7200) - 600
-                self.log_info(f"成功获取 access_token")
-                return True
-            else:
-                self.log_error(f"获取access_token失败: {data.get('errmsg', '未知错误')}")
-                return False
-        except requests.exceptions.RequestException as e:
-            self.log_error(f"请求access_token时出错: {e}")
-            return False
+        """确保持有可用的 access_token，与 _get_access_token 共用同一个令牌管理器。"""
+        return self._get_access_token() is not None
 
     def ensure_token_valid(self):
-        if not self.access_token or time.time() >= self.token_expires_at:
-            if not self.get_access_token():
-                raise Exception("无法获取或刷新 access_token")
+        """返回可用的 access_token，获取失败时抛出异常。"""
+        token = self._get_access_token()
+        if not token:
+            raise Exception("无法获取或刷新 access_token")
+        return token
 
     def _upload_media(self, image_path, url, return_key, media_type=None):
-        self.ensure_token_valid()
-        params = {'access_token': self.access_token}
+        token = self.ensure_token_valid()
+        params = {'access_token': token}
         if media_type:
             params['type'] = media_type
 
         try:
-            with open(image_path, 'rb') as f:
-                files = {'media': (os.path.basename(image_path), f)}
-                response = self.session.post(url, files=files, params=params, timeout=30)
-                self.log_info(f"[_upload_media] API 响应状态码: {response.status_code} for {image_path}")
-                data = response.json()
-                self.log_info(f"[_upload_media] API 响应内容: {data}")
-                response.raise_for_status()
-                
-                if 'errcode' in data and data['errcode'] != 0:
-                    self.log_error(f"微信API错误: {data}")
-                    return None
-                if return_key in data:
-                    self.log_info(f"[_upload_media] 成功从响应中提取到 '{return_key}'.")
-                    return data[return_key]
-                else:
-                    self.log_error(f"API响应中缺少键 '{return_key}': {data}")
-                    return None
+            endpoint = urllib.parse.urlparse(url).path.replace('/cgi-bin/', '', 1)
+            response = self.call_api(endpoint, lambda: post_file(self.session, url, 'media', image_path,
+                                                                 params=params, timeout=30))
+            self.log_info(f"[_upload_media] API 响应状态码: {response.status_code} for {image_path}")
+            data = response.json()
+            self.log_info(f"[_upload_media] API 响应内容: {data}")
+            response.raise_for_status()
+            
+            if 'errcode' in data and data['errcode'] != 0:
+                self._check_token_error(data, token)
+                self.log_error(f"微信API错误: {data}")
+                return None
+            if return_key in data:
+                self.log_info(f"[_upload_media] 成功从响应中提取到 '{return_key}'.")
+                return data[return_key]
+            else:
+                self.log_error(f"API响应中缺少键 '{return_key}': {data}")
+                return None
         except FileNotFoundError:
             self.log_error(f"上传媒体失败：文件未找到: {image_path}")
             return None
@@ -428,44 +874,35 @@ class WeChatPublisher(BasePublisher):
             self.log_error(f"上传媒体文件时发生网络错误: {e}")
             return None
 
-    def _compress_image_if_needed(self, image_path, max_size_kb):
-        try:
-            if os.path.getsize(image_path) <= max_size_kb * 1024: return image_path, False
-            import tempfile
-            img = Image.open(image_path).convert('RGB')
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            img.save(temp_file.name, 'jpeg', quality=85, optimize=True)
-            self.log_info(f"图片 {os.path.basename(image_path)} 已压缩至 {os.path.getsize(temp_file.name) / 1024:.2f}KB")
-            return temp_file.name, True
-        except Exception as e:
-            self.log_error(f"压缩图片时出错: {e}")
-            return image_path, False
-
     def upload_inline_image(self, image_path):
         url = "https://api.weixin.qq.com/cgi-bin/media/uploadimg"
-        return self._upload_media(image_path, url, return_key='url')
+        return self.cached_upload(self.prepare_image(image_path, 'inline'),
+                                  lambda path: self._upload_media(path, url, return_key='url'), kind='inline')
 
     def upload_temporary_thumb(self, image_path):
-        compressed_path, is_temp = self._compress_image_if_needed(image_path, max_size_kb=2048)
-        try:
-            url = "https://api.weixin.qq.com/cgi-bin/material/add_material"
-            return self._upload_media(compressed_path, url, return_key='media_id', media_type='thumb')
-        finally:
-            if is_temp and os.path.exists(compressed_path):
-                try: os.unlink(compressed_path)
-                except OSError as e: self.log_error(f"清理压缩临时文件失败: {e}")
+        # 以原图内容为缓存键，命中时连压缩步骤一起跳过
+        return self.cached_upload(image_path, self._upload_thumb_material, kind='thumb')
+
+    def _upload_thumb_material(self, image_path):
+        # 压缩结果保存在图片缓存目录中，不再需要清理临时文件
+        upload_path = self.prepare_image(image_path, 'thumb')
+        url = "https://api.weixin.qq.com/cgi-bin/material/add_material"
+        return self._upload_media(upload_path, url, return_key='media_id', media_type='thumb')
 
     def create_draft(self, title, content, thumb_media_id, author, digest):
-        self.ensure_token_valid()
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={self.access_token}"
+        token = self.ensure_token_valid()
+        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
         article = {
             'title': title[:64], 'author': author[:8], 'digest': digest[:120], 'content': content,
             'content_source_url': '', 'thumb_media_id': thumb_media_id,
             'need_open_comment': 1, 'only_fans_can_comment': 0
         }
         data = {'articles': [article]}
-        try:
-            response = self.session.post(url, data=json.dumps(data, ensure_ascii=False).encode('utf-8'), timeout=30)
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+        def send_draft():
+            response = self.call_api('draft/add', lambda: self.session.post(url, data=payload, timeout=30),
+                                     idempotent=False)
             response.raise_for_status()
             result = response.json()
             if 'media_id' in result:
@@ -473,6 +910,9 @@ class WeChatPublisher(BasePublisher):
                 return result['media_id']
             else:
                 raise Exception(f"创建草稿失败: {result}")
+
+        try:
+            return self.create_once(send_draft)
         except Exception as e:
             self.log_error(f"创建草稿时发生严重错误: {e}", exc_info=True)
             return None
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.async_http as async_http
+from publishers.base import BasePublisher
+from publishers.wechat_publisher import WeChatPublisher
+
+
+class BlockingPublisher(BasePublisher):
+    platform_name = 'blocking'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def publish(self, file_path: str, **kwargs) -> bool:
+        self.threads.append(threading.current_thread())
+        return kwargs.get('result', True)
+
+
+def test_sync_publisher_runs_in_executor():
+    """Publishers without a native async implementation are driven through a thread pool."""
+    publisher = BlockingPublisher('one', {}, {})
+
+    async def main():
+        return await asyncio.gather(publisher.publish_async('a.md'), publisher.publish_async('b.md', result=False))
+
+    assert asyncio.run(main()) == [True, False]
+    assert threading.main_thread() not in publisher.threads
+
+
+def test_wechat_publish_async_uses_shared_client(tmp_path):
+    """Many articles publish concurrently on one event loop through the async client."""
+    httpx = pytest.importorskip('httpx')
+    (tmp_path / 'image.png').write_bytes(b'png')
+    articles = []
+    for i in range(10):
+        path = tmp_path / f'article{i}.md'
+        path.write_text(f"---\ntitle: T{i}\n---\n\n# H\n\n![img](image.png)\n", encoding='utf-8')
+        articles.append(path)
+
+    requests_seen = []
+    drafts = []
+
+    def handler(request):
+        requests_seen.append(request.url.path)
+        assert request.url.params['access_token'] == 'token'
+        if request.url.path == '/cgi-bin/material/add_material':
+            assert b'filename="image.png"' in request.content
+            return httpx.Response(200, json={'url': 'http://mmbiz/image.png'})
+        if request.url.path == '/cgi-bin/media/upload':
+            return httpx.Response(200, json={'media_id': 'thumb'})
+        drafts.append(json.loads(request.content)['articles'][0])
+        return httpx.Response(200, json={'media_id': 'draft'})
+
+    publishers = [WeChatPublisher(name, {'app_id': 'id', 'app_secret': 'secret'}, {}) for name in ('a', 'b')]
+    for publisher in publishers:
+        publisher._get_access_token = lambda: 'token'
+
+    async def main():
+        client = async_http.AsyncHttpClient(backend='httpx')
+        await client._client.aclose()
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async_http._clients[asyncio.get_running_loop()] = client
+        try:
+            return await asyncio.gather(*(publishers[i % 2].publish_async(str(path))
+                                          for i, path in enumerate(articles)))
+        finally:
+            await async_http.close_async_client()
+
+    assert asyncio.run(main()) == [True] * 10
+    assert sorted(draft['title'] for draft in drafts) == sorted(f'T{i}' for i in range(10))
+    assert all('http://mmbiz/image.png' in draft['content'] and draft['thumb_media_id'] == 'thumb'
+               for draft in drafts)
+    assert requests_seen.count('/cgi-bin/draft/add') == 10
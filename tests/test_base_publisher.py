@@ -0,0 +1,76 @@
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import publishers.document as document
+from publishers.base import BasePublisher, clear_render_cache, get_markdown_converter
+
+
+class DummyPublisher(BasePublisher):
+    platform_name = 'dummy'
+
+    def publish(self, file_path: str, **kwargs) -> bool:
+        return True
+
+
+@pytest.fixture(autouse=True)
+def empty_render_cache():
+    clear_render_cache()
+    yield
+    clear_render_cache()
+
+
+@pytest.fixture
+def article(tmp_path):
+    path = tmp_path / 'article.md'
+    path.write_text("---\ntitle: Hello\ntags: [a, b]\n---\n\n# Heading\n\n| a | b |\n|---|---|\n| 1 | 2 |\n",
+                    encoding='utf-8')
+    return path
+
+
+def test_process_markdown_renders_once_per_content(article, tmp_path):
+    """Several accounts rendering the same file share one parse."""
+    first = DummyPublisher('one', {}, {})
+    second = DummyPublisher('two', {}, {})
+
+    with patch.object(document.frontmatter, 'loads', wraps=document.frontmatter.loads) as loads:
+        html_one, meta_one = first.process_markdown(str(article))
+        html_two, meta_two = second.process_markdown(str(article))
+
+    assert loads.call_count == 1
+    assert html_one == html_two
+    assert '<table>' in html_one
+    assert meta_one == meta_two == {'title': 'Hello', 'tags': ['a', 'b']}
+
+    # callers may mutate the returned metadata without touching the cache
+    meta_one['title'] = 'changed'
+    assert first.process_markdown(str(article))[1]['title'] == 'Hello'
+
+
+def test_process_markdown_cache_misses_on_edit(article):
+    """Changing the content produces a fresh render."""
+    publisher = DummyPublisher('one', {}, {})
+    html_before, _ = publisher.process_markdown(str(article))
+    article.write_text('# Other\n', encoding='utf-8')
+    html_after, metadata = publisher.process_markdown(str(article))
+
+    assert html_before != html_after
+    assert metadata['title'] == 'article'
+
+
+def test_markdown_converter_is_reused_per_thread():
+    """Each thread keeps one converter per extension set."""
+    extensions = BasePublisher.markdown_extensions
+    assert get_markdown_converter(extensions) is get_markdown_converter(extensions)
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_markdown_converter(extensions)))
+    thread.start()
+    thread.join()
+    assert other[0] is not get_markdown_converter(extensions)
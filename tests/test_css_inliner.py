@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+import pytest
+from markdown import Markdown
+from premailer import Premailer
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers import css_inliner
+from publishers.css_inliner import CompiledStylesheet, get_compiled_stylesheet
+
+ROOT = Path(__file__).parent.parent
+STYLESHEETS = [ROOT / 'publishers' / 'style.css', ROOT / 'style.css']
+
+EXTRA_CSS = """
+.note { color: red !important; }
+#lead { font-size: 18px; text-align: center; }
+p.note.big { background-color: #abc; width: 20px; }
+li:first-child { margin-top: 0; }
+a:visited { color: purple; }
+@media (max-width: 600px) { p { margin: 0; } }
+"""
+
+BODIES = [
+    Markdown(extensions=['extra', 'sane_lists', 'tables', 'fenced_code']).convert(
+        (ROOT / 'tests' / 'fixtures' / 'test_article.md').read_text(encoding='utf-8').split('---', 2)[2]
+    ),
+    '<h1 id="lead">Title</h1><p class="note big" style="color: blue">x</p>'
+    '<blockquote><p>quoted <code>inline</code></p></blockquote>'
+    '<pre><code class="language-python">print(1)</code></pre>'
+    '<ul><li>one</li><li class="note">two</li></ul>'
+    '<table><thead><tr><th>a</th></tr></thead><tbody><tr><td>1</td></tr></tbody></table>'
+    '<img src="a.png" style="float: left"><!-- comment --><a href="#x">link</a>',
+]
+
+
+def _document(css, body):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>t</title><style>{css}</style></head>'
+            f'<body><article class="markdown-body">{body}</article></body></html>')
+
+
+@pytest.mark.parametrize('css_path', STYLESHEETS, ids=lambda p: p.parent.name + '/' + p.name)
+@pytest.mark.parametrize('extra', ['', EXTRA_CSS], ids=['plain', 'extra-rules'])
+@pytest.mark.parametrize('body', BODIES, ids=['fixture', 'selectors'])
+def test_inline_matches_premailer_byte_for_byte(css_path, extra, body):
+    """The compiled fast path produces exactly what Premailer produces."""
+    css = css_path.read_text(encoding='utf-8') + extra
+    html = _document(css, body)
+    compiled = CompiledStylesheet(css, remove_classes=True)
+
+    assert compiled.inline(html) == Premailer(html, remove_classes=True).transform()
+
+
+def test_unexpected_stylesheet_falls_back_to_premailer():
+    """HTML carrying a different stylesheet is still inlined correctly."""
+    compiled = CompiledStylesheet('p { color: red; }')
+    html = _document('p { color: blue; }', '<p>x</p>')
+
+    assert compiled.inline(html) == Premailer(html).transform()
+    assert 'color:blue' in compiled.inline(html)
+
+
+@pytest.mark.parametrize('patch', [('_PREMAILER_INTERNALS', False),
+                                   ('_PREMAILER_METHODS', ('_removed_in_new_version',))],
+                         ids=['missing-import', 'missing-method'])
+def test_missing_premailer_internals_fall_back(monkeypatch, patch):
+    """Without the Premailer internals the fast path is disabled and Premailer does the whole job."""
+    monkeypatch.setattr(css_inliner, *patch)
+    css = 'p { color: red; }'
+    html = _document(css, '<p>x</p>')
+    compiled = CompiledStylesheet(css)
+
+    assert compiled.inline(html) == Premailer(html).transform()
+    tree, _ = css_inliner.parse_document(html)
+    assert compiled.apply(tree) is False
+
+
+def test_get_compiled_stylesheet_reuses_until_file_changes(tmp_path):
+    """The stylesheet is compiled once and recompiled after an edit."""
+    css_path = tmp_path / 'style.css'
+    css_path.write_text('p { color: red; }', encoding='utf-8')
+
+    first = get_compiled_stylesheet(str(css_path))[1]
+    assert get_compiled_stylesheet(str(css_path))[1] is first
+
+    css_path.write_text('p { color: green; margin: 0; }', encoding='utf-8')
+    css_text, second = get_compiled_stylesheet(str(css_path))
+    assert second is not first
+    assert 'green' in css_text
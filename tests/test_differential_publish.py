@@ -0,0 +1,141 @@
+import json
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import DocumentHandler
+from publishers.wechat_publisher import WeChatPublisher
+from utils.config import Config
+
+ARTICLE = '---\ntitle: {title}\ndigest: {digest}\ncover: cover.png\n---\n\n# 标题\n\n{body}\n\n![图](photo.png)\n'
+
+
+@pytest.fixture
+def publisher(tmp_path):
+    publisher = WeChatPublisher('acc', {'app_id': 'id', 'app_secret': 'secret'}, {
+        'publish_state_file': str(tmp_path / 'state.db'),
+        'upload_cache_file': str(tmp_path / 'uploads.db'),
+        'image_cache_dir': str(tmp_path / 'images'),
+        'image_workers': 0,
+    })
+    publisher._get_access_token = lambda: 'token'
+    publisher.sent = []
+    publisher.missing_drafts = set()
+
+    def post(url, data):
+        endpoint = url.split('/cgi-bin/')[1].split('?')[0]
+        body = json.loads(data)
+        publisher.sent.append((endpoint, body))
+        response = MagicMock(status_code=200)
+        if endpoint == 'draft/add':
+            response.json.return_value = {'media_id': f'draft-{len(publisher.sent)}'}
+        elif body['media_id'] in publisher.missing_drafts:
+            response.json.return_value = {'errcode': 40007, 'errmsg': 'invalid media_id'}
+        else:
+            response.json.return_value = {'errcode': 0, 'errmsg': 'ok'}
+        return response
+
+    publisher.session.post = MagicMock(side_effect=post)
+    return publisher
+
+
+@pytest.fixture
+def article(tmp_path):
+    Image.new('RGB', (32, 32), 'red').save(tmp_path / 'photo.png')
+    Image.new('RGB', (32, 32), 'blue').save(tmp_path / 'cover.png')
+    path = tmp_path / 'article.md'
+    path.write_text(ARTICLE.format(title='第一版', digest='摘要', body='正文'), encoding='utf-8')
+    return path
+
+
+def _publish(publisher, path):
+    with patch.object(publisher, '_upload_image', return_value='http://mmbiz.qpic.cn/photo.png') as upload, \
+            patch.object(publisher, '_upload_thumb_image_uncached', return_value='thumb') as upload_thumb, \
+            patch.object(publisher, '_build_document', wraps=publisher._build_document) as build:
+        assert publisher.publish(str(path))
+    return upload.call_count, upload_thumb.call_count, build.call_count
+
+
+def test_metadata_edit_updates_draft_without_rebuilding(publisher, article):
+    """Changing only the digest reuses the body, images and cover and updates the draft in place."""
+    assert _publish(publisher, article) == (1, 1, 1)
+    assert [endpoint for endpoint, _ in publisher.sent] == ['draft/add']
+    content = publisher.sent[0][1]['articles'][0]['content']
+
+    article.write_text(ARTICLE.format(title='第一版', digest='新的摘要', body='正文'), encoding='utf-8')
+    assert _publish(publisher, article) == (0, 0, 0)
+    endpoint, body = publisher.sent[-1]
+    assert endpoint == 'draft/update'
+    assert body['media_id'] == 'draft-1' and body['index'] == 0
+    assert body['articles']['digest'] == '新的摘要' and body['articles']['content'] == content
+
+    # 内容完全没有变化时只确认草稿仍然存在
+    assert _publish(publisher, article) == (0, 0, 0)
+    assert [endpoint for endpoint, _ in publisher.sent] == ['draft/add', 'draft/update', 'draft/get']
+
+
+def test_body_edit_rebuilds_content_but_keeps_cover(publisher, article):
+    _publish(publisher, article)
+    article.write_text(ARTICLE.format(title='第一版', digest='摘要', body='修改后的正文'), encoding='utf-8')
+
+    # 图片内容没变，上传缓存命中，不再上传
+    assert _publish(publisher, article) == (0, 0, 1)
+    endpoint, body = publisher.sent[-1]
+    assert endpoint == 'draft/update' and '修改后的正文' in body['articles']['content']
+    assert body['articles']['thumb_media_id'] == 'thumb'
+
+
+def test_missing_draft_is_recreated(publisher, article):
+    """When the stored draft was published or deleted, a new draft is created and remembered."""
+    _publish(publisher, article)
+    publisher.missing_drafts.add('draft-1')
+    article.write_text(ARTICLE.format(title='第二版', digest='摘要', body='正文'), encoding='utf-8')
+
+    _publish(publisher, article)
+    assert [endpoint for endpoint, _ in publisher.sent] == ['draft/add', 'draft/update', 'draft/add']
+
+    article.write_text(ARTICLE.format(title='第三版', digest='摘要', body='正文'), encoding='utf-8')
+    _publish(publisher, article)
+    assert publisher.sent[-1][0] == 'draft/update' and publisher.sent[-1][1]['media_id'] == 'draft-3'
+
+
+def test_unchanged_article_recreates_deleted_draft(publisher, article):
+    """Re-dropping identical content checks the stored draft and recreates it if it is gone."""
+    _publish(publisher, article)
+    publisher.missing_drafts.add('draft-1')
+
+    _publish(publisher, article)
+    assert [endpoint for endpoint, _ in publisher.sent] == ['draft/add', 'draft/get', 'draft/add']
+    assert publisher._previous_publish(str(article))['media_id'] == 'draft-3'
+
+
+def test_reused_filename_after_move_creates_new_draft(publisher, tmp_path):
+    """Once a published file is moved away, a new file with the same name is a new article."""
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(f"common:\n  watch_dir: '{tmp_path / 'documents'}'\n"
+                           f"  published_dir: '{tmp_path / 'published'}'\n"
+                           f"publish:\n  quiescence: 0\n", encoding='utf-8')
+    handler = DocumentHandler(Config(config_path=str(config_path), env_path=str(tmp_path / '.env')),
+                              {'acc': publisher})
+    account_dir = tmp_path / 'documents' / 'acc'
+    account_dir.mkdir(parents=True)
+    Image.new('RGB', (32, 32), 'red').save(account_dir / 'photo.png')
+    Image.new('RGB', (32, 32), 'blue').save(account_dir / 'cover.png')
+    path = account_dir / 'article.md'
+
+    for title in ('第一篇', '第二篇'):
+        path.write_text(ARTICLE.format(title=title, digest='摘要', body='正文'), encoding='utf-8')
+        with patch.object(publisher, '_upload_image', return_value='http://mmbiz.qpic.cn/photo.png'), \
+                patch.object(publisher, '_upload_thumb_image_uncached', return_value='thumb'):
+            handler._process_file(str(path))
+        assert not path.exists()
+    handler.shutdown(wait=True)
+
+    assert [endpoint for endpoint, _ in publisher.sent] == ['draft/add', 'draft/add']
+    assert publisher._previous_publish(str(path.resolve())) is None
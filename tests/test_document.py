@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import publishers.document as document
+from publishers.csdn_publisher import CSDNPublisher
+from publishers.document import clear_document_cache, load_document, render_markdown
+
+ARTICLE = """---
+title: 示例
+tags: [a, b]
+---
+
+# 标题 ![logo](logo.png)
+
+正文 ![图一](img/one.png "说明") 和 `![不是图片](code.png)`，
+以及网络图片 ![远程](https://example.com/x.png)。
+
+```markdown
+![代码块里的图片](one.png)
+```
+
+- 列表 ![缺失](missing.png)
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_document_cache():
+    clear_document_cache()
+    yield
+    clear_document_cache()
+
+
+@pytest.fixture
+def article(tmp_path):
+    (tmp_path / 'img').mkdir()
+    (tmp_path / 'img' / 'one.png').write_bytes(b'one')
+    (tmp_path / 'logo.png').write_bytes(b'logo')
+    path = tmp_path / 'article.md'
+    path.write_text(ARTICLE, encoding='utf-8')
+    return path
+
+
+def test_document_records_blocks_metadata_and_images(article, tmp_path):
+    """Images inside code are ignored; local images carry their path and content hash."""
+    doc = load_document(article)
+
+    assert doc.metadata == {'title': '示例', 'tags': ['a', 'b']}
+    assert [block.kind for block in doc.blocks if block.kind != 'blank'] == ['heading', 'paragraph', 'code', 'list']
+    assert [image.src for image in doc.images] == ['logo.png', 'img/one.png', 'https://example.com/x.png',
+                                                   'missing.png']
+    assert doc.local_images == [str(tmp_path / 'logo.png'), str(tmp_path / 'img' / 'one.png')]
+    assert doc.images[1].sha256 == '7692c3ad3540bb803c020b3aee66cd8887123234ea0c6e7143c0add73ff431ed'
+    assert doc.images[2].remote and doc.images[3].path is None
+    assert doc.body == ARTICLE.split('---\n', 2)[2].strip()
+
+
+def test_markdown_renderer_replaces_only_uploaded_images(article, tmp_path):
+    doc = load_document(article)
+    markdown = render_markdown(doc, {str(tmp_path / 'img' / 'one.png'): 'https://cdn/one.png'})
+
+    assert '![图一](https://cdn/one.png "说明")' in markdown
+    assert '![logo](logo.png)' in markdown
+    assert '`![不是图片](code.png)`' in markdown
+    assert '![代码块里的图片](one.png)' in markdown
+    assert render_markdown(doc) == doc.body
+
+
+def test_document_is_parsed_once_and_reparsed_when_an_image_changes(article, tmp_path):
+    """Publishers share one parse and one HTML render per extension set."""
+    with patch.object(document.frontmatter, 'loads', wraps=document.frontmatter.loads) as loads:
+        doc = load_document(article)
+        assert load_document(str(article)) is doc
+        assert loads.call_count == 1
+
+        html = doc.html(('extra',))
+        with patch.object(document, 'get_markdown_converter') as converter:
+            assert doc.html(('extra',)) == html
+            converter.assert_not_called()
+        assert '<h1>' in html and 'img/one.png' in html
+
+        # 图片内容变化后重新解析，图片哈希与文件一致
+        image = tmp_path / 'img' / 'one.png'
+        image.write_bytes(b'changed')
+        os.utime(image, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        assert load_document(article) is not doc
+        assert loads.call_count == 2
+
+
+def test_csdn_publishes_rendered_markdown(article, tmp_path):
+    """CSDN uploads the local images and sends Markdown with their new addresses."""
+    publisher = CSDNPublisher('csdn', {'username': 'u', 'password': 'p'}, {})
+    publisher._logged_in = True
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'code': 200, 'data': {'id': 42}}
+    with patch.object(publisher, 'upload_image', side_effect=lambda path: f'https://cdn/{Path(path).name}'), \
+            patch.object(publisher, '_get_csrf_token', return_value='csrf'), \
+            patch.object(publisher.session, 'post', return_value=response) as post:
+        assert publisher.publish(str(article))
+
+    article_data = post.call_args.kwargs['json']
+    assert article_data['title'] == '示例' and article_data['tags'] == ['a', 'b']
+    assert '![logo](https://cdn/logo.png)' in article_data['markdowncontent']
+    assert '![图一](https://cdn/one.png "说明")' in article_data['markdowncontent']
+    assert '![缺失](missing.png)' in article_data['markdowncontent']
@@ -0,0 +1,168 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import DocumentHandler
+from utils.config import Config
+from utils.scan_index import ScanIndex
+
+
+def _write_article(watch_dir, account, name, body='# Title\n\nbody\n'):
+    account_dir = watch_dir / account
+    account_dir.mkdir(parents=True, exist_ok=True)
+    path = account_dir / name
+    path.write_text(body, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Config pointing the watch and published dirs into tmp_path."""
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        f"common:\n"
+        f"  watch_dir: '{tmp_path / 'documents'}'\n"
+        f"  published_dir: '{tmp_path / 'published'}'\n"
+        f"publish:\n"
+        f"  move_on_success: all\n"
+        f"  max_workers: 4\n"
+        f"  quiescence: 0\n",
+        encoding='utf-8'
+    )
+    return Config(config_path=str(config_path), env_path=str(tmp_path / '.env'))
+
+
+class SlowPublisher:
+    """Publisher stub that records how many publishes overlap."""
+
+    def __init__(self, max_concurrency=1, delay=0.1):
+        self.max_concurrency = max_concurrency
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.published = []
+        self._lock = threading.Lock()
+
+    def publish(self, file_path, **kwargs):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+            self.published.append(file_path)
+        return True
+
+
+def test_handler_skips_unchanged_file_after_restart(tmp_path, config):
+    """A restarted handler with the same index does not publish again."""
+    article = _write_article(tmp_path / 'documents', 'test_account', 'article.md')
+    publisher = MagicMock()
+    publisher.max_concurrency = 1
+    publisher.publish.return_value = True
+    db_path = tmp_path / 'index.db'
+
+    with patch('main.move_file_to_published', return_value=None):
+        DocumentHandler(config, {'test_account': publisher}, ScanIndex(db_path))._process_file(str(article))
+        DocumentHandler(config, {'test_account': publisher}, ScanIndex(db_path))._process_file(str(article))
+
+    publisher.publish.assert_called_once_with(str(article.resolve()))
+
+
+def test_submit_runs_accounts_concurrently_within_limits(tmp_path, config):
+    """Files run in parallel across accounts while each account stays within its limit."""
+    serial = SlowPublisher(max_concurrency=1)
+    parallel = SlowPublisher(max_concurrency=2)
+    watch_dir = tmp_path / 'documents'
+    paths = [_write_article(watch_dir, 'serial', f'{i}.md') for i in range(3)]
+    paths += [_write_article(watch_dir, 'parallel', f'{i}.md') for i in range(4)]
+
+    handler = DocumentHandler(config, {'serial': serial, 'parallel': parallel})
+    start = time.monotonic()
+    for path in paths:
+        handler.submit(str(path))
+    handler.shutdown(wait=True)
+    elapsed = time.monotonic() - start
+
+    assert len(serial.published) == 3 and len(parallel.published) == 4
+    assert serial.peak == 1
+    assert parallel.peak == 2
+    # 3 serial publishes bound the wall time, not the 7 publishes in sequence
+    assert elapsed < 7 * serial.delay
+
+
+def test_submit_deduplicates_and_reruns_changed_file(tmp_path, config):
+    """A file changed while it is being published is processed once more afterwards."""
+    article = _write_article(tmp_path / 'documents', 'test_account', 'article.md')
+    publisher = SlowPublisher(delay=0.2)
+    handler = DocumentHandler(config, {'test_account': publisher})
+
+    with patch('main.move_file_to_published', return_value=None):
+        assert handler.submit(str(article)) is not None
+        time.sleep(0.05)
+        article.write_text('# Title\n\nedited\n', encoding='utf-8')
+        assert handler.submit(str(article)) is None
+        handler.shutdown(wait=True)
+
+    assert publisher.published == [str(article.resolve())] * 2
+
+
+@pytest.mark.parametrize('targets', ['[first, second]', "'first, second'"], ids=['list', 'comma-separated'])
+def test_targets_front_matter_fans_out_to_accounts(tmp_path, config, targets):
+    """A file listing several targets is published to every account concurrently and moved once."""
+    watch_dir = tmp_path / 'documents'
+    watch_dir.mkdir()
+    article = watch_dir / 'article.md'
+    article.write_text(f'---\ntargets: {targets}\n---\n\nbody\n', encoding='utf-8')
+    first, second, unused = SlowPublisher(delay=0.2), SlowPublisher(delay=0.2), SlowPublisher()
+    handler = DocumentHandler(config, {'first': first, 'second': second, 'unused': unused})
+
+    start = time.monotonic()
+    with patch('main.move_file_to_published', return_value='moved') as move:
+        handler._process_file(str(article))
+    handler.shutdown(wait=True)
+
+    assert first.published == second.published == [str(article.resolve())]
+    assert unused.published == []
+    assert time.monotonic() - start < 0.4
+    move.assert_called_once()
+
+
+def test_routing_table_retries_only_failed_targets(tmp_path):
+    """Under move_on_success: all a partial failure keeps the file; the retry skips accounts already done."""
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        f"common:\n"
+        f"  watch_dir: '{tmp_path / 'documents'}'\n"
+        f"  published_dir: '{tmp_path / 'published'}'\n"
+        f"publish:\n"
+        f"  move_on_success: all\n"
+        f"  quiescence: 0\n"
+        f"routing:\n"
+        f"  weekly: [ok, flaky]\n",
+        encoding='utf-8'
+    )
+    config = Config(config_path=str(config_path), env_path=str(tmp_path / '.env'))
+    article = _write_article(tmp_path / 'documents', 'weekly', 'issue.md')
+    ok = MagicMock(max_concurrency=1)
+    ok.publish.return_value = True
+    flaky = MagicMock(max_concurrency=1)
+    flaky.publish.side_effect = [False, True]
+    handler = DocumentHandler(config, {'ok': ok, 'flaky': flaky})
+
+    with patch('main.move_file_to_published', return_value='moved') as move:
+        handler._process_file(str(article))
+        assert move.call_count == 0
+        handler._process_file(str(article))
+        move.assert_called_once()
+
+    assert ok.publish.call_count == 1
+    assert flaky.publish.call_count == 2
+    assert not handler.job_queue.has_job(str(article.resolve()))
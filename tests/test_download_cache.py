@@ -0,0 +1,146 @@
+import http.server
+import os
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.download_cache import DownloadCache
+
+IMAGES = {f'/{name}.png': os.urandom(size) for name, size in (('a', 4000), ('b', 3000), ('c', 2000))}
+
+
+@pytest.fixture
+def server():
+    """提供带 ETag 的图片；/big 超过大小上限，/slow 并发请求时检查是否重复下载"""
+    requests_seen = []
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = IMAGES.get(self.path)
+            etag = f'"{self.path}"'
+            with lock:
+                requests_seen.append((self.path, self.headers.get('If-None-Match')))
+            if self.path == '/big':
+                body = b'x' * 10000
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}', requests_seen
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_downloads_are_cached_and_revalidated_with_etag(tmp_path, server):
+    """The second fetch sends If-None-Match and reuses the cached file on 304."""
+    base_url, seen = server
+    cache = DownloadCache(tmp_path / 'cache', revalidate_after=0)
+
+    first = cache.fetch(f'{base_url}/a.png')
+    assert Path(first).read_bytes() == IMAGES['/a.png']
+    assert cache.fetch(f'{base_url}/a.png') == first
+    assert seen == [('/a.png', None), ('/a.png', '"/a.png"')]
+
+    # 在验证间隔内直接使用缓存，不发送请求
+    cache.revalidate_after = 3600
+    assert cache.fetch(f'{base_url}/a.png') == first
+    assert len(seen) == 2
+
+    # 服务器不可达时使用缓存的副本
+    cache.revalidate_after = 0
+    with patch.object(cache.session, 'get', side_effect=OSError('unreachable')):
+        assert cache.fetch(f'{base_url}/a.png') == first
+    cache.close()
+
+
+def test_fetch_many_deduplicates_and_evicts_least_recently_used(tmp_path, server):
+    """Concurrent fetches download each URL once; the cache stays under its size bound."""
+    base_url, seen = server
+    cache = DownloadCache(tmp_path / 'cache', max_bytes=7000)
+
+    urls = [f'{base_url}/a.png', f'{base_url}/b.png', f'{base_url}/a.png']
+    paths = cache.fetch_many(urls)
+    assert sorted(path for path, _ in seen) == ['/a.png', '/b.png']
+    assert all(Path(path).exists() for path in paths.values())
+
+    # 使用 a 之后再下载 c：总大小超过上限，淘汰最久未使用的 b
+    cache.fetch(f'{base_url}/a.png')
+    cache.fetch(f'{base_url}/c.png')
+    assert not Path(paths[f'{base_url}/b.png']).exists()
+    assert Path(paths[f'{base_url}/a.png']).exists()
+    assert cache.total_bytes() == 6000
+    cache.close()
+
+
+def test_fetch_many_keeps_files_of_the_current_batch(tmp_path, server):
+    """A batch larger than the cache bound keeps every file it returned until the batch is done."""
+    base_url, _ = server
+    cache = DownloadCache(tmp_path / 'cache', max_bytes=5000, workers=1)
+
+    urls = [f'{base_url}/a.png', f'{base_url}/b.png', f'{base_url}/c.png']
+    paths = cache.fetch_many(urls)
+    assert all(Path(paths[url]).exists() for url in urls)
+    assert cache.total_bytes() == 9000
+
+    # 调用方持有的文件同样不淘汰
+    with cache.pinned([f'{base_url}/a.png']):
+        assert cache.evict() == 2
+    assert Path(paths[f'{base_url}/a.png']).exists()
+    assert cache.total_bytes() == 4000
+    cache.close()
+
+
+def test_failed_downloads_leave_no_files(tmp_path, server):
+    """Errors and oversized responses return None without leaving partial files behind."""
+    base_url, _ = server
+    cache = DownloadCache(tmp_path / 'cache', max_file_bytes=5000)
+
+    assert cache.fetch(f'{base_url}/missing.png') is None
+    assert cache.fetch(f'{base_url}/big') is None
+    assert [p for p in (tmp_path / 'cache').rglob('*') if p.is_file() and p.name != 'index.db'
+            and not p.name.startswith('index.db-')] == []
+    cache.close()
+
+
+def test_wechat_rehosts_remote_images(tmp_path, server):
+    """Remote images are downloaded and uploaded; WeChat-hosted images are left alone."""
+    base_url, _ = server
+    publisher = WeChatPublisher('acc', {'app_id': 'id', 'app_secret': 'secret'},
+                                {'download_cache_dir': str(tmp_path / 'downloads'), 'image_workers': 0})
+    html = (f'<img src="{base_url}/a.png"/><img src="https://mmbiz.qpic.cn/x.png"/>'
+            f'<img src="{base_url}/missing.png"/>')
+
+    with patch.object(publisher, 'upload_image', return_value='http://mmbiz.qpic.cn/uploaded.png') as upload:
+        new_html, local_images = publisher._process_html_images(html, str(tmp_path))
+
+    assert upload.call_count == 1
+    assert Path(local_images[0]).read_bytes() == IMAGES['/a.png']
+    assert 'http://mmbiz.qpic.cn/uploaded.png' in new_html
+    assert 'https://mmbiz.qpic.cn/x.png' in new_html
+    assert f'{base_url}/missing.png' in new_html
@@ -0,0 +1,103 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.batcher import Batcher
+
+
+def _publisher(tmp_path, draft_batch):
+    publisher = WeChatPublisher('acc', {'app_id': 'id', 'app_secret': 'secret', 'draft_batch': draft_batch},
+                                {'upload_cache_file': str(tmp_path / 'uploads.db')})
+    publisher._get_access_token = lambda: 'token'
+    sent = []
+
+    def post(url, data):
+        articles = json.loads(data)['articles']
+        sent.append([article['title'] for article in articles])
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'media_id': f'draft-{len(sent)}'}
+        return response
+
+    publisher.session.post = MagicMock(side_effect=post)
+    return publisher, sent
+
+
+def _write(tmp_path, name, batch=None):
+    front_matter = f'title: {name}\n' + (f'batch: {batch}\n' if batch else '')
+    path = tmp_path / f'{name}.md'
+    path.write_text(f'---\n{front_matter}---\n\n正文 {name}\n', encoding='utf-8')
+    return str(path)
+
+
+def test_batcher_flushes_when_full_or_window_expires():
+    """A full group is sent immediately; a partial group is sent when the window expires."""
+    calls = []
+    batcher = Batcher(lambda items: calls.append(list(items)) or [item * 10 for item in items],
+                      max_size=3, window=0.3)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        start = time.monotonic()
+        results = list(executor.map(lambda item: batcher.submit('k', item), [1, 2, 3]))
+        assert time.monotonic() - start < 0.3
+    assert results == [10, 20, 30]
+
+    start = time.monotonic()
+    assert batcher.submit('k', 4) == 40
+    assert time.monotonic() - start >= 0.3
+    assert sorted(map(sorted, calls)) == [[1, 2, 3], [4]]
+
+
+def test_batcher_propagates_flush_errors_to_every_submitter():
+    batcher = Batcher(MagicMock(side_effect=RuntimeError('boom')), max_size=2, window=1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(batcher.submit, 'k', item) for item in (1, 2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+
+
+def test_articles_published_together_share_one_draft(tmp_path):
+    """Concurrent publishes are sent as one draft/add call; each file gets the draft's media_id."""
+    publisher, sent = _publisher(tmp_path, {'max_articles': 3, 'window': 5})
+    assert publisher.max_concurrency == 3
+    paths = [_write(tmp_path, name) for name in ('a', 'b', 'c')]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert list(executor.map(publisher.publish, paths)) == [True, True, True]
+
+    assert len(sent) == 1 and sorted(sent[0]) == ['a', 'b', 'c']
+
+
+def test_batch_front_matter_groups_articles(tmp_path):
+    """Articles are only merged with others that share their batch key."""
+    publisher, sent = _publisher(tmp_path, {'max_articles': 2, 'window': 0.5})
+    paths = [_write(tmp_path, 'x1', 'x'), _write(tmp_path, 'y1', 'y'), _write(tmp_path, 'x2', 'x')]
+    results = {}
+    threads = [threading.Thread(target=lambda p=path: results.update({p: publisher.publish(p)})) for path in paths]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results.values()) and len(results) == 3
+    assert sorted(map(sorted, sent)) == [['x1', 'x2'], ['y1']]
+
+
+def test_batching_is_off_by_default(tmp_path):
+    publisher, sent = _publisher(tmp_path, None)
+    paths = [_write(tmp_path, name) for name in ('p', 'q')]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert all(executor.map(publisher.publish, paths))
+    assert sorted(sent) == [['p'], ['q']]
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import publishers.css_inliner as css_inliner
+from publishers.css_inliner import CompiledStylesheet
+from publishers.html_pipeline import (HtmlDocument, HtmlPipeline, ImageRewriteStage, SanitizeStage,
+                                      StyleInlineStage)
+
+CSS = 'p { color: red; } img { width: 100%; }'
+BODY = ('<p onclick="steal()">hi <img src="a.png"> <img src="https://cdn/b.png"></p>'
+        '<script>alert(1)</script>tail<a href="javascript:void(0)">x</a>')
+
+
+def test_pipeline_parses_and_serializes_once(tmp_path):
+    """All stages share one tree; the document is parsed and serialized exactly once."""
+    (tmp_path / 'a.png').write_bytes(b'png')
+    upload_many = MagicMock(side_effect=lambda paths: {p: 'https://remote/a.png' for p in paths})
+    stylesheet = CompiledStylesheet(CSS, remove_classes=True)
+
+    with patch.object(css_inliner.etree, 'fromstring', wraps=css_inliner.etree.fromstring) as parse, \
+            patch.object(css_inliner.etree, 'tostring', wraps=css_inliner.etree.tostring) as serialize:
+        document = HtmlDocument.from_body(BODY, 'T', CSS, 'markdown-body')
+        html = HtmlPipeline([ImageRewriteStage(str(tmp_path), upload_many), SanitizeStage(),
+                             StyleInlineStage(stylesheet)]).run(document)
+
+    assert parse.call_count == 1
+    assert serialize.call_count == 1
+    upload_many.assert_called_once_with([str(tmp_path / 'a.png')])
+    assert document.local_images == [str(tmp_path / 'a.png')]
+    assert 'src="https://remote/a.png"' in html
+    assert 'src="https://cdn/b.png"' in html
+    assert '<script' not in html and 'onclick' not in html and 'javascript:' not in html
+    assert 'tail' in html
+    assert 'style="color:red"' in html
+
+
+def test_style_stage_matches_standalone_inliner():
+    """Inlining inside the pipeline gives the same bytes as CompiledStylesheet.inline."""
+    stylesheet = CompiledStylesheet(CSS, remove_classes=True)
+    document = HtmlDocument.from_body('<p class="x">hi</p>', 'T', CSS, 'markdown-body')
+    expected = stylesheet.inline(document.serialize())
+
+    assert HtmlPipeline([StyleInlineStage(stylesheet)]).run(document) == expected
+
+
+def test_style_stage_falls_back_for_foreign_stylesheet():
+    """A document carrying a different stylesheet is still inlined via Premailer."""
+    document = HtmlDocument.from_body('<p>hi</p>', 'T', 'p { color: blue; }')
+    html = HtmlPipeline([StyleInlineStage(CompiledStylesheet(CSS))]).run(document)
+
+    assert 'color:blue' in html
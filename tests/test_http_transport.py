@@ -0,0 +1,109 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import requests
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.http_transport import HttpTransport, get_http_transport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        delay = float(self.path.rsplit('/', 1)[-1] or 0)
+        time.sleep(delay)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'sid=1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_default_and_per_host_timeouts(server):
+    """Requests without a timeout get the host's (connect, read) timeout; explicit timeouts win."""
+    transport = HttpTransport({'read_timeout': 5, 'hosts': {'127.0.0.1': {'read_timeout': 0.2}}})
+    assert transport.settings_for('api.weixin.qq.com').timeout == (10.0, 5.0)
+    assert transport.settings_for('127.0.0.1').timeout == (10.0, 0.2)
+
+    session = transport.session()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.get(f'{server}/1')
+    assert session.get(f'{server}/0.5', timeout=5).text == 'ok'
+
+
+def test_requests_queue_for_pooled_connections(server):
+    """At most pool_maxsize requests run at once per host; the rest wait and are counted."""
+    transport = HttpTransport({'pool_maxsize': 2})
+    session = transport.session()
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda _: session.get(f'{server}/0.2').status_code, range(6)))
+    assert results == [200] * 6
+
+    stats = transport.stats()['127.0.0.1']
+    assert stats['requests'] == 6 and stats['peak_in_flight'] == 2 and stats['in_flight'] == 0
+    assert stats['pool_waits'] >= 3 and stats['pool_wait_seconds'] > 0
+
+
+def test_streamed_response_holds_slot_until_closed(server):
+    """A streamed response keeps its connection checked out, so the next request waits until it is closed."""
+    transport = HttpTransport({'pool_maxsize': 1})
+    session = transport.session()
+    streamed = session.get(f'{server}/0', stream=True)
+    assert transport.stats()['127.0.0.1']['in_flight'] == 1
+
+    waiting = threading.Thread(target=lambda: session.get(f'{server}/0'))
+    waiting.start()
+    waiting.join(0.3)
+    assert waiting.is_alive()
+
+    streamed.close()
+    waiting.join(5)
+    assert not waiting.is_alive()
+    stats = transport.stats()['127.0.0.1']
+    assert stats['in_flight'] == 0 and stats['pool_waits'] == 1 and stats['peak_in_flight'] == 1
+
+
+def test_sessions_share_connections_but_not_cookies(server):
+    transport = HttpTransport()
+    first, second = transport.session(), transport.session()
+    first.get(f'{server}/0')
+    assert first.cookies.get('sid') == '1' and not second.cookies
+
+    assert first.get_adapter(server) is second.get_adapter(server)
+    # 关闭一个会话不影响其他会话使用共享的连接池
+    first.close()
+    assert second.get(f'{server}/0').status_code == 200
+
+
+def test_publishers_use_shared_transport():
+    config = {'http': {'pool_maxsize': 4}}
+    first = WeChatPublisher('a', {'app_id': 'id', 'app_secret': 'secret'}, config)
+    second = WeChatPublisher('b', {'app_id': 'id', 'app_secret': 'secret'}, config)
+    assert first.http is second.http is get_http_transport({'pool_maxsize': 4})
+    assert first.session is not second.session
+    assert first.session.get_adapter('https://api.weixin.qq.com/') is \
+        second.session.get_adapter('https://api.weixin.qq.com/')
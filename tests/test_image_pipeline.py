@@ -0,0 +1,86 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import utils.image_pipeline as image_pipeline
+from publishers.wechat_publisher import WeChatPublisher
+from utils.image_pipeline import ImagePipeline, ImageProfile
+
+
+def _noisy_image(path: Path, size=(2400, 1600), mode='RGB', image_format='PNG') -> str:
+    """生成难以压缩的图片，确保转码前后的大小有明显差别"""
+    Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode))).save(path, image_format)
+    return str(path)
+
+
+def test_oversized_image_is_resized_and_cached_per_profile(tmp_path):
+    """An oversized image is transcoded once per profile, then served from the cache."""
+    source = _noisy_image(tmp_path / 'big.png', mode='RGBA')
+    pipeline = ImagePipeline(tmp_path / 'cache', workers=0)
+    profile = ImageProfile('cover', max_dimension=800, format='JPEG', quality=80, max_bytes=200 * 1024)
+
+    prepared = pipeline.prepare([source], profile)[source]
+    assert prepared != source and prepared.endswith('.jpg')
+    with Image.open(prepared) as img:
+        assert img.format == 'JPEG' and max(img.size) <= 800 and img.mode == 'RGB'
+    assert os.path.getsize(prepared) <= 200 * 1024
+
+    with patch.object(image_pipeline, 'transcode', wraps=image_pipeline.transcode) as transcode:
+        assert pipeline.prepare([source], profile)[source] == prepared
+        assert transcode.call_count == 0
+        # 参数不同的规格各自转码
+        assert pipeline.prepare([source], ImageProfile('content', max_dimension=1200))[source] != prepared
+        assert transcode.call_count == 1
+
+
+def test_small_unreadable_and_animated_images_are_passed_through(tmp_path):
+    """Images that already fit, cannot be decoded or are animated upload as-is."""
+    small = str(tmp_path / 'small.jpg')
+    Image.new('RGB', (64, 64), 'red').save(small, 'JPEG')
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not an image')
+    animated = str(tmp_path / 'anim.gif')
+    frames = [Image.new('P', (3000, 3000), color) for color in (1, 2)]
+    frames[0].save(animated, save_all=True, append_images=frames[1:])
+
+    pipeline = ImagePipeline(tmp_path / 'cache', workers=0)
+    paths = [small, str(broken), animated]
+    assert pipeline.prepare(paths, ImageProfile('content')) == {path: path for path in paths}
+
+
+def test_images_are_transcoded_in_worker_processes(tmp_path):
+    """Several images needing work are transcoded in the process pool."""
+    sources = [_noisy_image(tmp_path / f'{name}.png', size=(1200, 900)) for name in 'abc']
+    pipeline = ImagePipeline(tmp_path / 'cache', workers=2)
+    try:
+        prepared = pipeline.prepare(sources, ImageProfile('content', max_dimension=600, format='JPEG'))
+    finally:
+        pipeline.close()
+
+    for source in sources:
+        with Image.open(prepared[source]) as img:
+            assert img.size == (600, 450)
+
+
+def test_wechat_uploads_prepared_images_but_keeps_original_paths(tmp_path):
+    """The publisher uploads the derived file while the HTML rewrite is keyed by the source path."""
+    source = _noisy_image(tmp_path / 'photo.png', size=(2600, 1200))
+    publisher = WeChatPublisher('acc', {'app_id': 'id', 'app_secret': 'secret'},
+                                {'image_cache_dir': str(tmp_path / 'cache'), 'image_workers': 0})
+
+    with patch.object(publisher, 'upload_image', side_effect=lambda path: f'http://cdn/{os.path.basename(path)}') \
+            as upload:
+        html, local_images = publisher._process_html_images('<img src="photo.png"/>', str(tmp_path))
+
+    uploaded_path = upload.call_args[0][0]
+    assert uploaded_path != source and uploaded_path.startswith(str(tmp_path / 'cache'))
+    with Image.open(uploaded_path) as img:
+        assert max(img.size) == 1920
+    assert local_images == [source]
+    assert f'http://cdn/{os.path.basename(uploaded_path)}' in html
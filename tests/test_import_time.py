@@ -0,0 +1,46 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# 导入 main 的耗时上限（毫秒，-X importtime 统计的累计时间，不含解释器启动），
+# 较慢的机器上可用环境变量放宽
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', 250))
+# 只在处理文件时才需要的依赖，启动时不应导入
+HEAVY_MODULES = ('PIL', 'bs4', 'markdown', 'frontmatter', 'premailer', 'cssutils', 'lxml',
+                 'requests', 'pexels_api', 'watchdog')
+
+
+def _import(module: str):
+    """在新的解释器中导入模块，返回 (累计导入耗时毫秒, 已导入的重依赖)"""
+    script = (
+        "import json, sys; sys.path.insert(0, sys.argv[1]);"
+        f"import {module};"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    )
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script, str(ROOT)],
+                            capture_output=True, text=True, check=True, cwd=ROOT)
+    match = re.search(rf'^import time:\s*\d+ \|\s*(\d+) \| {re.escape(module)}$', result.stderr, re.MULTILINE)
+    return int(match.group(1)) / 1000, result.stdout.strip().splitlines()[-1]
+
+
+def test_main_cold_start_within_budget():
+    """Importing main loads none of the heavy dependencies and stays within the time budget."""
+    # 取多次中的最小值，减少机器负载带来的抖动
+    runs = [_import('main') for _ in range(3)]
+    assert runs[0][1] == '[]'
+    elapsed = min(ms for ms, _ in runs)
+    assert elapsed < IMPORT_BUDGET_MS, f"导入 main 耗时 {elapsed:.0f}ms，超出预算 {IMPORT_BUDGET_MS:.0f}ms"
+
+
+def test_publisher_modules_defer_optional_dependencies():
+    """Image and HTML-parsing libraries load only when a file needs them."""
+    _, loaded = _import('publishers.wechat_publisher')
+    assert 'PIL' not in loaded and 'bs4' not in loaded and 'markdown' not in loaded
+
+    _, loaded = _import('wechat_publisher')
+    for module in ('PIL', 'bs4', 'markdown', 'premailer', 'pexels_api', 'watchdog'):
+        assert module not in loaded
@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import DocumentHandler
+from publishers.wechat_publisher import WeChatPublisher
+from utils.config import Config
+from utils.job_queue import JobQueue, activate
+from utils.scan_index import ScanIndex
+
+
+@pytest.fixture
+def config(tmp_path):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        f"common:\n"
+        f"  watch_dir: '{tmp_path / 'documents'}'\n"
+        f"  published_dir: '{tmp_path / 'published'}'\n"
+        f"publish:\n"
+        f"  quiescence: 0\n",
+        encoding='utf-8'
+    )
+    return Config(config_path=str(config_path), env_path=str(tmp_path / '.env'))
+
+
+@pytest.fixture
+def article(tmp_path):
+    account_dir = tmp_path / 'documents' / 'test_account'
+    account_dir.mkdir(parents=True)
+    path = account_dir / 'article.md'
+    path.write_text('---\ntitle: T\n---\n\n# H\n\n![img](image.png)\n', encoding='utf-8')
+    (account_dir / 'image.png').write_bytes(b'png')
+    return path
+
+
+def test_steps_survive_reopen_and_reset_on_change(tmp_path):
+    """Completed steps are read back by a new instance; new content starts over."""
+    db_path = tmp_path / 'jobs.db'
+    queue = JobQueue(db_path)
+    queue.start('/a.md', 'acct', 'hash1').complete('cover', 'thumb')
+    queue.close()
+
+    queue = JobQueue(db_path)
+    checkpoint = queue.start('/a.md', 'acct', 'hash1')
+    assert checkpoint.attempts == 2
+    assert checkpoint.result('cover') == 'thumb'
+    assert checkpoint.run('cover', MagicMock()) == 'thumb'
+
+    assert queue.start('/a.md', 'acct', 'hash2').steps == {}
+
+
+def test_failed_jobs_are_retried_with_backoff_then_given_up(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db', retry={'max_attempts': 2, 'base_delay': 10, 'max_delay': 10})
+    queue.start('/a.md', 'acct', 'hash')
+    next_run_at = queue.fail('/a.md', 'acct', 'publish')
+    assert next_run_at is not None
+    assert queue.due(now=next_run_at - 11) == []
+    assert queue.due(now=next_run_at) == ['/a.md']
+
+    queue.start('/a.md', 'acct', 'hash')
+    assert queue.fail('/a.md', 'acct', 'publish') is None
+    assert queue.due(now=float('inf')) == []
+    assert queue.has_job('/a.md')
+
+
+def test_interrupted_job_resumes_at_move(tmp_path, config, article):
+    """A job whose draft was created before a crash is not published again after restart."""
+    db_path = tmp_path / 'jobs.db'
+    file_key = str(article.resolve())
+    crashed = JobQueue(db_path)
+    crashed.start(file_key, 'test_account', ScanIndex().fingerprint(file_key).content_hash).complete('draft', 'd1')
+    crashed.close()
+
+    queue = JobQueue(db_path)
+    assert queue.recover() == 1
+    publisher = MagicMock(max_concurrency=1)
+    handler = DocumentHandler(config, {'test_account': publisher}, ScanIndex(), queue)
+    assert handler.submit_due_jobs() == 1
+    handler.shutdown(wait=True)
+
+    publisher.publish.assert_not_called()
+    assert (tmp_path / 'published' / 'test_account' / 'article.md').exists()
+    assert len(queue) == 0
+
+
+def test_wechat_publish_resumes_after_failed_draft(tmp_path, article):
+    """Images and cover uploaded before a failed draft are reused on the retry."""
+    publisher = WeChatPublisher('test_account', {'app_id': 'id', 'app_secret': 'secret'}, {})
+    queue = JobQueue(tmp_path / 'jobs.db')
+
+    with patch.object(publisher, 'upload_image', return_value='http://mmbiz/image.png') as upload_image, \
+            patch.object(publisher, '_upload_thumb_image', return_value='thumb') as upload_thumb, \
+            patch.object(publisher, '_create_draft', side_effect=[None, 'draft1']) as create_draft:
+        for expected in (False, True):
+            with activate(queue.start(str(article), 'test_account', 'hash')) as checkpoint:
+                assert publisher.publish(str(article)) is expected
+
+    assert upload_image.call_count == 1
+    assert upload_thumb.call_count == 1
+    assert create_draft.call_count == 2
+    assert 'http://mmbiz/image.png' in create_draft.call_args[0][1]
+    assert checkpoint.result('draft') == 'draft1'
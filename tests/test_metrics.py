@@ -0,0 +1,111 @@
+import socket
+import sys
+import urllib.request
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.csdn_publisher import CSDNPublisher
+from utils.metrics import API_RETRIES, CACHE_HITS, STAGE_SECONDS, UPLOAD_BYTES, MetricsExporter, MetricsRegistry
+from utils.retry import RetryPolicy
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f"{line_prefix} not found in:\n{text}")
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe(STAGE_SECONDS, 0.05, stage='upload', platform='wechat', account='a')
+    registry.observe(STAGE_SECONDS, 0.5, stage='upload', platform='wechat', account='a')
+    registry.observe(STAGE_SECONDS, 5, stage='upload', platform='wechat', account='a')
+    registry.inc(UPLOAD_BYTES, 2048, kind='image', platform='wechat', account='带"引号')
+
+    text = registry.render()
+    labels = 'account="a",platform="wechat",stage="upload"'
+    assert '# TYPE publisher_stage_seconds histogram' in text
+    assert _sample(text, f'publisher_stage_seconds_bucket{{{labels},le="0.1"}}') == 1
+    assert _sample(text, f'publisher_stage_seconds_bucket{{{labels},le="1"}}') == 2
+    assert _sample(text, f'publisher_stage_seconds_bucket{{{labels},le="+Inf"}}') == 3
+    assert _sample(text, f'publisher_stage_seconds_sum{{{labels}}}') == pytest.approx(5.55)
+    assert _sample(text, f'publisher_stage_seconds_count{{{labels}}}') == 3
+    assert 'publisher_upload_bytes_total{account="带\\"引号",kind="image",platform="wechat"} 2048' in text
+
+
+def test_worker_increments_merge_into_coordinator():
+    coordinator, worker = MetricsRegistry(), MetricsRegistry()
+    coordinator.inc(CACHE_HITS, cache='upload')
+    worker.inc(CACHE_HITS, cache='upload')
+    with worker.stage('draft', 'csdn', 'a'):
+        pass
+
+    coordinator.merge(worker.drain())
+    assert worker.snapshot() == {'counters': {}, 'histograms': {}}
+    text = coordinator.render()
+    assert _sample(text, 'publisher_cache_hits_total{cache="upload"}') == 2
+    assert _sample(text, 'publisher_stage_seconds_count{account="a",platform="csdn",stage="draft"}') == 1
+
+
+def test_exporter_serves_endpoint_and_writes_file(tmp_path):
+    registry = MetricsRegistry()
+    registry.inc(API_RETRIES, endpoint='draft/add')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    exporter = MetricsExporter(registry, file=str(tmp_path / 'publisher.prom'), port=port, interval=60)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            body = response.read().decode('utf-8')
+        assert 'publisher_api_retries_total{endpoint="draft/add"} 1' in body
+        registry.inc(API_RETRIES, endpoint='draft/add')
+    finally:
+        exporter.close()
+    # 关闭时写入最终的指标
+    assert 'publisher_api_retries_total{endpoint="draft/add"} 2' in (tmp_path / 'publisher.prom').read_text()
+
+
+def test_publisher_records_stages_uploads_and_retries(tmp_path):
+    """A publish records per-stage durations, uploaded bytes, cache hits and retries for its account."""
+    (tmp_path / 'one.png').write_bytes(b'x' * 100)
+    article = tmp_path / 'article.md'
+    article.write_text('---\ntitle: 示例\n---\n\n正文 ![图](one.png)\n', encoding='utf-8')
+
+    publisher = CSDNPublisher('csdn', {'username': 'u', 'password': 'p'}, {})
+    publisher.metrics = registry = MetricsRegistry()
+    publisher.retry_policy = RetryPolicy(max_attempts=2, base_delay=0, max_delay=0)
+    publisher._logged_in = True
+
+    sent = []
+
+    def post(*args, **kwargs):
+        sent.append(kwargs)
+        response = MagicMock(status_code=503 if len(sent) == 1 else 200, headers={})
+        response.json.return_value = {'code': 200, 'data': {'id': 42}}
+        return response
+
+    upload = MagicMock(return_value='https://cdn/one.png')
+    with patch.object(publisher, '_upload_image', upload), \
+            patch.object(publisher, '_get_csrf_token', return_value='csrf'), \
+            patch.object(publisher.session, 'post', side_effect=post), \
+            registry.trace() as trace:
+        assert publisher.publish(str(article))
+        assert publisher.publish(str(article))
+
+    assert upload.call_count == 1
+    text = registry.render()
+    for stage in ('parse', 'upload', 'draft'):
+        assert _sample(text, f'publisher_stage_seconds_count{{account="csdn",platform="csdn",stage="{stage}"}}') == 2
+    assert _sample(text, 'publisher_upload_bytes_total{account="csdn",kind="image",platform="csdn"}') == 100
+    assert _sample(text, 'publisher_cache_hits_total{account="csdn",cache="upload",kind="image",platform="csdn"}') == 1
+    # 每次单独调用 publish 都是新的任务，不会沿用上一次创建的文章
+    assert _sample(text, 'publisher_cache_misses_total{account="csdn",cache="idempotency",kind="draft",'
+                         'platform="csdn"}') == 2
+    assert _sample(text, 'publisher_api_retries_total{account="csdn",endpoint="article/publish",platform="csdn"}') == 1
+    assert [name for name, _ in trace.spans][:3] == ['parse', 'upload', 'draft']
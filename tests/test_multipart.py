@@ -0,0 +1,73 @@
+import hashlib
+import http.server
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.multipart import MultipartEncoder, post_file
+
+
+@pytest.fixture
+def payload(tmp_path):
+    path = tmp_path / 'photo 1.jpg'
+    path.write_bytes(os.urandom(300 * 1024 + 7))
+    return path
+
+
+@pytest.mark.parametrize('content_type', [None, 'image/jpeg'])
+def test_encoding_matches_requests_files(payload, content_type):
+    """The streamed body is byte-identical to what requests builds for files=."""
+    file_tuple = (payload.name, payload.read_bytes()) + ((content_type,) if content_type else ())
+    expected = requests.Request('POST', 'http://x', files={'media': file_tuple}, data={'type': 'image'}).prepare()
+    boundary = expected.headers['Content-Type'].split('boundary=')[1]
+
+    encoder = MultipartEncoder({'type': 'image', 'media': (payload.name, str(payload), content_type)},
+                               boundary=boundary, chunk_size=4096)
+
+    assert len(encoder) == len(expected.body)
+    chunks = list(encoder)
+    assert b''.join(chunks) == expected.body
+    assert max(len(chunk) for chunk in chunks) <= 4096
+
+
+def test_post_file_streams_with_content_length(payload):
+    """A real request arrives with the right length and content, read chunk by chunk."""
+    received = {}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            received['content_type'] = self.headers['Content-Type']
+            received['chunked'] = 'Transfer-Encoding' in self.headers
+            response = json.dumps({'sha256': hashlib.sha256(body).hexdigest()}).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    try:
+        with requests.Session() as session:
+            response = post_file(session, f'http://127.0.0.1:{server.server_port}/upload', 'media',
+                                 str(payload), headers={'Referer': 'x'}, timeout=10)
+    finally:
+        thread.join()
+        server.server_close()
+
+    boundary = received['content_type'].split('boundary=')[1]
+    expected = MultipartEncoder({'media': (payload.name, str(payload), None)}, boundary=boundary).read()
+    assert response.json()['sha256'] == hashlib.sha256(expected).hexdigest()
+    assert not received['chunked']
@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.csdn_publisher import CSDNPublisher
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_publishers_are_imported_and_built_on_first_use(tmp_path):
+    """Registering accounts imports no publisher module; using one imports only its platform."""
+    script = (
+        "import json, sys; sys.path.insert(0, sys.argv[1]);"
+        "from main import initialize_publishers;"
+        "publishers = initialize_publishers({'common': {'upload_cache_file': ':memory:'}, 'accounts': {"
+        "  'wx': {'platform': 'wechat', 'app_id': 'id', 'app_secret': 'secret'},"
+        "  'cs': {'platform': 'csdn', 'username': 'u', 'password': 'p'}}});"
+        "before = sorted(m for m in sys.modules if m.endswith('_publisher'));"
+        "publisher = publishers['cs'];"
+        "after = sorted(m for m in sys.modules if m.endswith('_publisher'));"
+        "print(json.dumps([sorted(publishers), before, after, publisher._logged_in, publishers['cs'] is publisher]))"
+    )
+    result = subprocess.run([sys.executable, '-c', script, str(ROOT)], capture_output=True, text=True,
+                            check=True, cwd=tmp_path)
+    accounts, before, after, logged_in, same = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert accounts == ['cs', 'wx']
+    assert before == []
+    assert after == ['publishers.csdn_publisher']
+    assert logged_in is False
+    assert same is True
+
+
+def test_csdn_logs_in_once_on_first_publish(tmp_path):
+    """CSDN logs in lazily, once, and reads defaults from its account config."""
+    article = tmp_path / 'a.md'
+    article.write_text('---\ntitle: T\n---\n\nbody\n', encoding='utf-8')
+    publisher = CSDNPublisher('cs', {'username': 'u', 'password': 'p', 'tags': 'a,b'}, {})
+    response = MagicMock(status_code=200, headers={})
+    response.json.return_value = {'code': 200, 'data': {'id': 1}}
+    publisher.session.post = MagicMock(return_value=response)
+
+    with patch.object(publisher, '_login', return_value=True) as login, \
+            patch.object(publisher, '_get_csrf_token', return_value='csrf'):
+        assert login.call_count == 0
+        assert publisher.publish(str(article))
+        article.write_text('---\ntitle: T2\n---\n\nbody\n', encoding='utf-8')
+        assert publisher.publish(str(article))
+
+    assert login.call_count == 1
+    assert publisher.session.post.call_args.kwargs['json']['tags'] == ['a', 'b']
@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.rate_limiter import AdaptiveConcurrency, RateLimiter, TokenBucket
+
+
+def test_token_bucket_paces_after_burst():
+    """Requests beyond the burst wait for tokens to refill at the configured rate."""
+    bucket = TokenBucket(rate=10, burst=2)
+    delays = [bucket.reserve() for _ in range(4)]
+    assert delays[:2] == [0.0, 0.0]
+    assert 0.05 < delays[2] <= 0.1
+    assert 0.15 < delays[3] <= 0.2
+
+
+def test_concurrency_halves_on_throttle_and_recovers():
+    """Throttled responses halve the limit; successes grow it back by one per window."""
+    concurrency = AdaptiveConcurrency(max_concurrency=8)
+    concurrency.record(True)
+    assert concurrency.limit == 4
+    # 冷却期内的限流响应属于同一波请求，不再继续减半
+    concurrency.record(True)
+    assert concurrency.limit == 4
+
+    for _ in range(4):
+        concurrency.record(False)
+    assert int(concurrency.limit) == 4
+    concurrency.record(False)
+    assert int(concurrency.limit) == 5
+
+
+def test_limiter_bounds_in_flight_requests():
+    """No more than the current limit of requests run at once."""
+    limiter = RateLimiter(max_concurrency=2)
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def call():
+        with limiter:
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+
+def test_wechat_throttle_errcode_lowers_limit():
+    """WeChat reports rate limiting with errcode 45009 on an HTTP 200 response."""
+    publisher = WeChatPublisher('test_account', {
+        'app_id': 'id', 'app_secret': 'secret',
+        'rate_limits': {'draft/add': {'max_concurrency': 4}},
+    }, {})
+    publisher._get_access_token = lambda: 'token'
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'errcode': 45009, 'errmsg': 'reach max api daily quota limit'}
+    publisher.session.post = MagicMock(return_value=response)
+
+    assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') is None
+    assert publisher.rate_limiter('draft/add').concurrency.limit == 2
+    assert publisher.rate_limiter('media/upload').concurrency.limit == 16
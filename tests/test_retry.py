@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import publishers.base as base
+from publishers.wechat_publisher import WeChatPublisher
+from utils.job_queue import JobCheckpoint, activate
+from utils.retry import RetryPolicy, request_not_sent
+from utils.upload_cache import UploadCache
+
+
+def make_response(status_code=200, data=None):
+    response = MagicMock(status_code=status_code, headers={})
+    response.json.return_value = data if data is not None else {}
+    return response
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    monkeypatch.setattr(base.time, 'sleep', lambda seconds: None)
+    publisher = WeChatPublisher('retry_account', {'app_id': 'id', 'app_secret': 'secret'}, {})
+    publisher._get_access_token = lambda: 'token'
+    # 每个测试使用独立的内存缓存，避免幂等记录在测试之间共享
+    publisher.upload_cache = UploadCache()
+    return publisher
+
+
+def test_backoff_is_jittered_and_capped():
+    """Delays are drawn from [0, base * 2^(n-1)], never above max_delay, and honour Retry-After."""
+    policy = RetryPolicy(base_delay=1, max_delay=4)
+    for attempt, ceiling in ((1, 1), (2, 2), (3, 4), (6, 4)):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= ceiling
+        assert len(set(delays)) > 1
+    assert policy.backoff(1, retry_after=3) >= 3
+    assert policy.backoff(1, retry_after=60) <= 4
+
+
+def test_connection_errors_before_sending_are_detected():
+    refused = requests.ConnectionError(MagicMock(reason=NewConnectionError(None, 'refused')))
+    assert request_not_sent(refused)
+    assert request_not_sent(requests.exceptions.ConnectTimeout())
+    assert not request_not_sent(requests.exceptions.ReadTimeout())
+    assert not request_not_sent(requests.ConnectionError('Connection reset by peer'))
+
+
+def test_upload_retries_transient_errors(publisher, tmp_path):
+    """Idempotent uploads retry timeouts and system-busy responses until they succeed."""
+    image = tmp_path / 'a.png'
+    image.write_bytes(b'png')
+    publisher.session.post = MagicMock(side_effect=[
+        requests.exceptions.ReadTimeout(),
+        make_response(200, {'errcode': -1, 'errmsg': 'system error'}),
+        make_response(200, {'url': 'http://mmbiz/a.png'}),
+    ])
+
+    assert publisher._upload_image(str(image)) == 'http://mmbiz/a.png'
+    assert publisher.session.post.call_count == 3
+
+
+def test_fatal_errors_are_not_retried(publisher, tmp_path):
+    image = tmp_path / 'a.png'
+    image.write_bytes(b'png')
+    publisher.session.post = MagicMock(return_value=make_response(200, {'errcode': 40005, 'errmsg': 'bad type'}))
+
+    assert publisher._upload_image(str(image)) is None
+    assert publisher.session.post.call_count == 1
+
+
+def test_draft_is_not_resent_after_ambiguous_failure(publisher):
+    """A read timeout may mean the draft was created, so the non-idempotent call is not retried."""
+    publisher.session.post = MagicMock(side_effect=requests.exceptions.ReadTimeout())
+
+    assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') is None
+    assert publisher.session.post.call_count == 1
+
+
+def test_draft_retries_when_platform_rejects(publisher):
+    publisher.session.post = MagicMock(side_effect=[
+        make_response(503),
+        make_response(200, {'media_id': 'draft1'}),
+    ])
+
+    assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') == 'draft1'
+    assert publisher.session.post.call_count == 2
+
+
+def test_draft_is_created_once_per_job(publisher):
+    """A retried job returns the draft it already created; a later job (an intentional republish) creates a new one."""
+    publisher.session.post = MagicMock(side_effect=[make_response(200, {'media_id': 'draft1'}),
+                                                    make_response(200, {'media_id': 'draft2'})])
+
+    with activate(JobCheckpoint()):
+        assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') == 'draft1'
+        assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') == 'draft1'
+    with activate(JobCheckpoint()):
+        assert publisher._create_draft('T', '<p>x</p>', 'thumb', '', '') == 'draft2'
+    assert publisher.session.post.call_count == 2
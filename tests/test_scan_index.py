@@ -0,0 +1,64 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.scan_index import ScanIndex
+
+
+@pytest.fixture
+def article(tmp_path):
+    """A markdown file inside an account folder of a watch directory."""
+    account_dir = tmp_path / 'documents' / 'test_account'
+    account_dir.mkdir(parents=True)
+    path = account_dir / 'article.md'
+    path.write_text('# Title\n\nbody\n', encoding='utf-8')
+    return path
+
+
+def test_index_survives_reopen(tmp_path, article):
+    """Recorded results are read back from disk by a new instance."""
+    db_path = tmp_path / 'index.db'
+    index = ScanIndex(db_path)
+    index.record(str(article), index.fingerprint(str(article)), {'test_account': True})
+    index.close()
+
+    reopened = ScanIndex(db_path)
+    entry = reopened.get(str(article))
+    assert entry is not None
+    assert entry.results == {'test_account': True}
+    assert reopened.is_unchanged(str(article), reopened.fingerprint(str(article)))
+
+
+def test_touch_without_content_change_is_unchanged(tmp_path, article):
+    """A new mtime with identical content does not count as a change."""
+    index = ScanIndex(tmp_path / 'index.db')
+    index.record(str(article), index.fingerprint(str(article)), {'test_account': True})
+
+    os.utime(article, (1, 1))
+    assert index.is_unchanged(str(article), index.fingerprint(str(article)))
+    assert index.get(str(article)).mtime == 1
+
+    article.write_text('# Title\n\nedited\n', encoding='utf-8')
+    assert not index.is_unchanged(str(article), index.fingerprint(str(article)))
+
+
+def test_failed_results_are_not_unchanged(tmp_path, article):
+    """Files whose last publish failed are picked up again."""
+    index = ScanIndex(tmp_path / 'index.db')
+    index.record(str(article), index.fingerprint(str(article)), {'test_account': False})
+
+    assert not index.is_unchanged(str(article), index.fingerprint(str(article)))
+
+
+def test_prune_removes_missing_paths(tmp_path, article):
+    """Entries for files that are gone are dropped."""
+    index = ScanIndex(tmp_path / 'index.db')
+    index.record(str(article), index.fingerprint(str(article)), {'test_account': False})
+
+    assert index.prune([]) == 1
+    assert index.get(str(article)) is None
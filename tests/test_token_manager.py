@@ -0,0 +1,96 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.token_manager import TokenManager
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_concurrent_get_fetches_once():
+    """Many threads asking at once share a single refresh."""
+    def slow_fetch():
+        time.sleep(0.05)
+        return 'token', 7200
+
+    fetch = MagicMock(side_effect=slow_fetch)
+    manager = TokenManager('wechat:app', fetch)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.close()
+
+    assert results == ['token'] * 8
+    assert fetch.call_count == 1
+
+
+def test_token_is_shared_through_cache_file(tmp_path):
+    """Another process reads the cached token instead of fetching its own."""
+    cache_file = tmp_path / 'tokens.json'
+    manager = TokenManager('wechat:app', MagicMock(return_value=('shared', 7200)), cache_file=cache_file)
+    assert manager.get() == 'shared'
+    manager.close()
+
+    script = ("import sys; sys.path.insert(0, sys.argv[1]);"
+              "from utils.token_manager import TokenManager;"
+              "m = TokenManager('wechat:app', lambda: ('other', 7200), cache_file=sys.argv[2]);"
+              "print(m.get()); m.close()")
+    result = subprocess.run([sys.executable, '-c', script, str(ROOT), str(cache_file)],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'shared'
+
+
+def test_background_refresh_before_expiry():
+    """Tokens entering the refresh window are replaced without blocking get()."""
+    tokens = iter(f't{i}' for i in range(1000))
+    fetch = MagicMock(side_effect=lambda: (next(tokens), 100))
+    manager = TokenManager('wechat:app', fetch, refresh_margin=99.9)
+
+    assert manager.get() == 't0'
+    deadline = time.time() + 5
+    while fetch.call_count < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    manager.close()
+
+    assert fetch.call_count >= 2
+    assert manager.get() != 't0'
+
+
+def test_invalidate_keeps_newer_token(tmp_path):
+    """Invalidating a stale token does not discard one another caller already refreshed."""
+    fetch = MagicMock(side_effect=[('old', 7200), ('new', 7200)])
+    manager = TokenManager('wechat:app', fetch, cache_file=tmp_path / 'tokens.json')
+    assert manager.get() == 'old'
+
+    manager.invalidate('old')
+    assert manager.get() == 'new'
+    manager.invalidate('old')
+    assert manager.get() == 'new'
+    manager.close()
+    assert fetch.call_count == 2
+
+
+def test_wechat_token_paths_share_one_manager(tmp_path):
+    """Legacy and new WeChat token helpers return the same token, fetched once."""
+    publisher = WeChatPublisher('test_account', {'app_id': 'id', 'app_secret': 'secret'},
+                                {'token_cache_file': str(tmp_path / 'tokens.json')})
+    response = MagicMock()
+    response.json.return_value = {'access_token': 'abc', 'expires_in': 7200}
+    publisher.session.get = MagicMock(return_value=response)
+
+    assert publisher._get_access_token() == 'abc'
+    assert publisher.ensure_token_valid() == 'abc'
+    assert publisher.get_access_token() is True
+    assert publisher.access_token == 'abc'
+    publisher.token_manager.close()
+    assert publisher.session.get.call_count == 1
@@ -0,0 +1,55 @@
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from publishers.wechat_publisher import WeChatPublisher
+from utils.upload_cache import UploadCache, get_upload_cache
+
+
+def test_put_get_is_scoped_by_platform_account_and_kind(tmp_path):
+    """The same content hash is cached independently per platform, account and kind."""
+    cache = UploadCache(tmp_path / 'cache.db')
+    cache.put('wechat', 'a', 'hash', 'http://remote/1.png')
+
+    assert cache.get('wechat', 'a', 'hash') == 'http://remote/1.png'
+    assert cache.get('wechat', 'b', 'hash') is None
+    assert cache.get('csdn', 'a', 'hash') is None
+    assert cache.get('wechat', 'a', 'hash', kind='thumb') is None
+
+
+def test_expired_entries_are_ignored_and_evicted(tmp_path):
+    """Entries past their TTL miss and are removed on the next open."""
+    db_path = tmp_path / 'cache.db'
+    cache = UploadCache(db_path)
+    cache.put('wechat', 'a', 'hash', 'media-id', kind='temporary_thumb', ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get('wechat', 'a', 'hash', kind='temporary_thumb') is None
+    cache.close()
+    assert UploadCache(db_path).evict_expired() == 0
+
+
+def test_get_upload_cache_shares_instances(tmp_path):
+    """Publishers pointing at the same file share a single cache object."""
+    db_path = tmp_path / 'cache.db'
+    assert get_upload_cache(db_path) is get_upload_cache(str(db_path))
+
+
+def test_republish_only_uploads_changed_images(tmp_path):
+    """An unchanged image is served from the cache; edited content is uploaded again."""
+    publisher = WeChatPublisher('test_account', {'app_id': 'id', 'app_secret': 'secret'},
+                                {'upload_cache_file': str(tmp_path / 'cache.db')})
+    image = tmp_path / 'image.png'
+    image.write_bytes(b'v1')
+    uploader = MagicMock(side_effect=['http://remote/v1.png', 'http://remote/v2.png'])
+    publisher._upload_image = uploader
+
+    assert publisher.upload_image(str(image)) == 'http://remote/v1.png'
+    assert publisher.upload_image(str(image)) == 'http://remote/v1.png'
+    image.write_bytes(b'v2')
+    assert publisher.upload_image(str(image)) == 'http://remote/v2.png'
+    assert uploader.call_count == 2
@@ -0,0 +1,99 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.watcher import (EVENT_CREATED, EVENT_DELETED, EVENT_MODIFIED, FileEvent,
+                           InotifyWatcher, PollingWatcher, create_watcher, scan_directory)
+
+requires_inotify = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is Linux only")
+
+
+def test_scan_directory_filters_file_types(tmp_path):
+    """Only files with a configured extension are reported."""
+    (tmp_path / 'account').mkdir()
+    (tmp_path / 'account' / 'a.md').write_text('a', encoding='utf-8')
+    (tmp_path / 'account' / 'b.MARKDOWN').write_text('b', encoding='utf-8')
+    (tmp_path / 'account' / 'c.txt').write_text('c', encoding='utf-8')
+
+    states = scan_directory(tmp_path, ['md', '.markdown'])
+
+    assert sorted(Path(p).name for p in states) == ['a.md', 'b.MARKDOWN']
+
+
+def test_polling_watcher_reports_create_modify_delete(tmp_path):
+    """The polling backend diffs successive scans into events."""
+    article = tmp_path / 'article.md'
+    with PollingWatcher(tmp_path, debounce=0, poll_interval=0.01) as watcher:
+        article.write_text('v1', encoding='utf-8')
+        assert watcher.wait(timeout=1) == [FileEvent(EVENT_CREATED, str(article))]
+
+        os.utime(article, (1, 1))
+        assert watcher.wait(timeout=1) == [FileEvent(EVENT_MODIFIED, str(article))]
+
+        article.unlink()
+        assert watcher.wait(timeout=1) == [FileEvent(EVENT_DELETED, str(article))]
+
+
+@requires_inotify
+def test_inotify_watcher_debounces_writes(tmp_path):
+    """Several writes inside the debounce window collapse into one create event."""
+    account_dir = tmp_path / 'account'
+    account_dir.mkdir()
+    article = account_dir / 'article.md'
+    with InotifyWatcher(tmp_path, debounce=0.1) as watcher:
+        with open(article, 'w', encoding='utf-8') as f:
+            for i in range(5):
+                f.write(f'line {i}\n')
+                f.flush()
+        (account_dir / 'notes.txt').write_text('ignored', encoding='utf-8')
+
+        assert watcher.wait(timeout=2) == [FileEvent(EVENT_CREATED, str(article))]
+        assert watcher.wait(timeout=0.3) == []
+
+
+@requires_inotify
+def test_inotify_watcher_picks_up_new_subdirectories(tmp_path):
+    """Files in directories created after start-up are still reported."""
+    with InotifyWatcher(tmp_path, debounce=0.05) as watcher:
+        new_dir = tmp_path / 'new_account'
+        new_dir.mkdir()
+        # give the watcher a chance to register the new directory first
+        assert watcher.wait(timeout=0.2) == []
+        article = new_dir / 'article.md'
+        article.write_text('hello', encoding='utf-8')
+
+        assert watcher.wait(timeout=2) == [FileEvent(EVENT_CREATED, str(article))]
+
+
+def test_create_watcher_falls_back_to_polling(tmp_path):
+    """An explicit polling backend is always available."""
+    with create_watcher(tmp_path, backend='polling') as watcher:
+        assert watcher.backend_name == 'polling'
+
+    with pytest.raises(ValueError):
+        create_watcher(tmp_path, backend='kqueue')
+
+
+@requires_inotify
+def test_inotify_watcher_rewatches_directories_after_overflow(tmp_path):
+    """After dropped events, new directories get a watch and removed ones are forgotten."""
+    old_dir = tmp_path / 'old_account'
+    old_dir.mkdir()
+    with InotifyWatcher(tmp_path, debounce=0.05) as watcher:
+        new_dir = tmp_path / 'new_account'
+        new_dir.mkdir()
+        (new_dir / 'first.md').write_text('hello', encoding='utf-8')
+        old_dir.rmdir()
+        # 模拟事件队列溢出：丢弃内核中排队的事件，再按收到 IN_Q_OVERFLOW 处理
+        os.read(watcher._fd, 65536)
+        assert FileEvent(EVENT_MODIFIED, str(new_dir / 'first.md')) in watcher._resync()
+        assert str(new_dir) in watcher._dir_to_wd and str(old_dir) not in watcher._dir_to_wd
+
+        article = new_dir / 'second.md'
+        article.write_text('hello', encoding='utf-8')
+        assert watcher.wait(timeout=2) == [FileEvent(EVENT_CREATED, str(article))]
@@ -1,3 +1,7 @@
+import os
+import threading
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock
 from pathlib import Path
@@ -20,7 +24,7 @@ def mock_config():
 @pytest.fixture
 def publisher(mock_config):
     """Fixture for WeChatPublisher instance."""
-    return WeChatPublisher(config=mock_config, account_name='test_account')
+    return WeChatPublisher('test_account', mock_config, {})
 
 
 def test_publish_success(publisher, tmp_path):
@@ -64,8 +68,8 @@ author: '测试作者'
                 args, kwargs = mock_create_draft.call_args
                 title, content, thumb_media_id, author, digest = args
                 
-                assert title == "'测试文章'"
-                assert author == "'测试作者'"
+                assert title == '测试文章'
+                assert author == '测试作者'
                 assert thumb_media_id == 'mock_thumb_media_id'
                 assert 'http://mock.url/image.png' in content
 
@@ -78,3 +82,34 @@ def test_get_access_token_failure(publisher):
         
         token = publisher._get_access_token()
         assert token is None
+
+def test_process_html_images_uploads_concurrently_in_order(mock_config, tmp_path):
+    """Images upload in parallel, each src is rewritten and document order is kept."""
+    publisher = WeChatPublisher('test_account', dict(mock_config, image_upload_concurrency=3), {})
+    names = ['a.png', 'b.png', 'c.png']
+    for name in names:
+        (tmp_path / name).touch()
+    html = ''.join(f'<img src="{name}"/>' for name in names) + '<img src="a.png"/>'
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_upload(image_path):
+        with lock:
+            active.append(image_path)
+            peak.append(len(active))
+        # the first image finishes last so completion order differs from document order
+        time.sleep(0.2 if image_path.endswith('a.png') else 0.05)
+        with lock:
+            active.remove(image_path)
+        return f"http://mock.url/{os.path.basename(image_path)}"
+
+    with patch.object(publisher, 'upload_image', side_effect=fake_upload) as mock_upload_image:
+        new_html, local_images = publisher._process_html_images(html, str(tmp_path))
+
+    assert mock_upload_image.call_count == 3
+    assert max(peak) == 3
+    assert local_images == [os.path.join(str(tmp_path), name) for name in names + ['a.png']]
+    assert new_html.count('http://mock.url/a.png') == 2
+    assert 'http://mock.url/c.png' in new_html
@@ -0,0 +1,85 @@
+import logging
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to path to allow module imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import DocumentHandler
+from utils.config import Config
+from utils.job_queue import JobQueue, current_checkpoint
+from utils.worker_pool import WorkerPool
+
+
+class PidPublisher:
+    """Records the process it ran in as the result of the parse step."""
+
+    max_concurrency = 2
+
+    def __init__(self, account):
+        self.account = account
+
+    def publish(self, file_path, **kwargs):
+        logging.getLogger('worker_test').info(f"published {os.path.basename(file_path)} in {os.getpid()}")
+        current_checkpoint().complete('parse', os.getpid())
+        return True
+
+
+def make_publishers(config):
+    return {name: PidPublisher(name) for name in config.get('accounts', {})}
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text(
+        f"common:\n"
+        f"  watch_dir: '{tmp_path / 'documents'}'\n"
+        f"  published_dir: '{tmp_path / 'published'}'\n"
+        f"accounts:\n"
+        f"  test_account: {{platform: pid}}\n"
+        f"publish:\n"
+        f"  quiescence: 0\n",
+        encoding='utf-8'
+    )
+    return path
+
+
+def test_files_publish_in_worker_processes(tmp_path, config_path, caplog):
+    """Publishing runs in worker processes; steps and logs come back to the coordinator."""
+    account_dir = tmp_path / 'documents' / 'test_account'
+    account_dir.mkdir(parents=True)
+    paths = []
+    for i in range(4):
+        path = account_dir / f'{i}.md'
+        path.write_text(f'# {i}\n', encoding='utf-8')
+        paths.append(path)
+
+    config = Config(config_path=str(config_path), env_path=str(tmp_path / '.env'))
+    job_queue = JobQueue(tmp_path / 'jobs.db')
+    pool = WorkerPool(2, str(config_path), str(tmp_path / '.env'), make_publishers,
+                      job_queue_path=str(tmp_path / 'jobs.db'), log_level=logging.INFO)
+    handler = DocumentHandler(config, make_publishers(config.get_config()), job_queue=job_queue, worker_pool=pool)
+
+    steps = []
+    original_finish = handler._finish_job
+
+    def record_steps(checkpoint, *args):
+        steps.append(checkpoint.result('parse'))
+        original_finish(checkpoint, *args)
+
+    with caplog.at_level(logging.INFO), patch.object(handler, '_finish_job', side_effect=record_steps):
+        for path in paths:
+            handler.submit(str(path))
+        handler.shutdown(wait=True)
+        pool.shutdown()
+
+    assert len(list((tmp_path / 'published' / 'test_account').iterdir())) == 4
+    assert len(steps) == 4 and os.getpid() not in steps
+    assert sum('published' in record.getMessage() and record.name == 'worker_test'
+               for record in caplog.records) == 4
+    assert len(job_queue) == 0
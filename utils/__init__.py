@@ -2,4 +2,4 @@
 工具函数模块
 """
 
-__all__ = ['config', 'logger', 'file_utils']
+__all__ = ['config', 'logger', 'file_utils', 'watcher', 'scan_index', 'upload_cache', 'multipart', 'token_manager', 'async_http', 'rate_limiter', 'retry', 'job_queue', 'worker_pool', 'timing', 'image_pipeline', 'download_cache', 'batcher', 'publish_state', 'http_transport', 'metrics']
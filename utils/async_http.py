@@ -0,0 +1,202 @@
+"""
+异步 HTTP 客户端
+
+为异步发布接口提供带连接池的 HTTP 客户端，后端按 httpx、aiohttp 的顺序选用已安装的一个；
+两者都未安装时 `async_http_available()` 返回 False，发布器回退到在线程池中运行同步实现。
+
+同一个事件循环内的所有发布器共享一个客户端（一个连接池），
+文件上传复用 `utils.multipart.MultipartEncoder` 按块流式发送。
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional
+
+from utils.multipart import MultipartEncoder
+
+BACKENDS = ('httpx', 'aiohttp')
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_TIMEOUT = 30.0
+
+
+class AsyncHttpError(Exception):
+    """网络错误或 HTTP 错误状态码，两种后端的异常统一转换为此类型"""
+
+
+class AsyncConnectError(AsyncHttpError):
+    """建立连接失败，请求尚未发出"""
+
+
+class AsyncResponse:
+    """已读取完整响应体的 HTTP 响应"""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise AsyncHttpError(f"HTTP {self.status_code}")
+
+
+def available_backend() -> Optional[str]:
+    """返回可用的后端名称，都未安装时返回 None"""
+    for name in BACKENDS:
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return None
+
+
+def async_http_available() -> bool:
+    """是否安装了任一异步 HTTP 后端"""
+    return available_backend() is not None
+
+
+class AsyncHttpClient:
+    """基于 httpx 或 aiohttp 的异步 HTTP 客户端，必须在所属的事件循环中使用。"""
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = DEFAULT_TIMEOUT,
+                 backend: Optional[str] = None, connect_timeout: Optional[float] = None, http2: bool = False):
+        """
+        Args:
+            max_connections: 连接池的最大连接数
+            timeout: 单个请求的超时时间（秒）
+            backend: 'httpx' 或 'aiohttp'，None 表示自动选择
+            connect_timeout: 建立连接的超时时间（秒），None 表示与 timeout 相同
+            http2: 是否启用 HTTP/2，只有 httpx 后端且安装了 h2 时生效
+
+        Raises:
+            ImportError: 没有安装可用的后端
+        """
+        self.backend = backend or available_backend()
+        if self.backend == 'httpx':
+            import httpx
+            self._httpx = httpx
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(timeout, connect=connect_timeout if connect_timeout is not None else timeout),
+                http2=http2 and importlib.util.find_spec('h2') is not None,
+            )
+        elif self.backend == 'aiohttp':
+            import aiohttp
+            self._aiohttp = aiohttp
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max_connections),
+                timeout=aiohttp.ClientTimeout(total=timeout, connect=connect_timeout),
+            )
+        else:
+            raise ImportError("异步发布需要安装 httpx 或 aiohttp")
+
+    async def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                      headers: Optional[Dict[str, str]] = None, data: Any = None) -> AsyncResponse:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            data: 请求体，bytes 或按块产生 bytes 的异步迭代器
+
+        Raises:
+            AsyncHttpError: 网络错误
+        """
+        try:
+            if self.backend == 'httpx':
+                response = await self._client.request(method, url, params=params, headers=headers, content=data)
+                return AsyncResponse(response.status_code, response.content)
+            async with self._client.request(method, url, params=params, headers=headers, data=data) as response:
+                return AsyncResponse(response.status, await response.read())
+        except AsyncHttpError:
+            raise
+        except asyncio.TimeoutError as e:
+            raise AsyncHttpError(f"请求超时: {url}") from e
+        except Exception as e:
+            connect_errors = ((self._httpx.ConnectError, self._httpx.ConnectTimeout) if self.backend == 'httpx'
+                              else (self._aiohttp.ClientConnectorError,))
+            if isinstance(e, connect_errors):
+                raise AsyncConnectError(str(e) or type(e).__name__) from e
+            error_type = self._httpx.HTTPError if self.backend == 'httpx' else self._aiohttp.ClientError
+            if isinstance(e, error_type):
+                raise AsyncHttpError(str(e) or type(e).__name__) from e
+            raise
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('POST', url, **kwargs)
+
+    async def post_file(self, url: str, field_name: str, file_path: str, content_type: Optional[str] = None,
+                        fields: Optional[Dict[str, str]] = None, params: Optional[Dict[str, Any]] = None,
+                        headers: Optional[Dict[str, str]] = None) -> AsyncResponse:
+        """
+        以流式 multipart 请求上传单个文件，参数含义同 `utils.multipart.post_file`
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            AsyncHttpError: 网络错误
+        """
+        encoder_fields = dict(fields or {})
+        encoder_fields[field_name] = (os.path.basename(file_path), file_path, content_type)
+        encoder = MultipartEncoder(encoder_fields)
+        request_headers = dict(headers or {})
+        request_headers['Content-Type'] = encoder.content_type
+        request_headers['Content-Length'] = str(len(encoder))
+        return await self.post(url, params=params, headers=request_headers, data=_iter_encoder(encoder))
+
+    async def aclose(self) -> None:
+        if self.backend == 'httpx':
+            await self._client.aclose()
+        else:
+            await self._client.close()
+
+    async def __aenter__(self) -> 'AsyncHttpClient':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+
+async def _iter_encoder(encoder: MultipartEncoder) -> AsyncIterator[bytes]:
+    """把同步的 multipart 编码器包装为异步迭代器（本地文件的分块读取足够快，直接在事件循环中进行）"""
+    for chunk in encoder:
+        yield chunk
+
+
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncHttpClient]' = weakref.WeakKeyDictionary()
+_client_options: Dict[str, Any] = {}
+
+
+def configure_async_client(**options: Any) -> None:
+    """
+    设置之后新建的共享客户端使用的参数（`AsyncHttpClient` 的关键字参数），
+    由 `utils.http_transport` 按 http 配置调用，已创建的客户端不受影响
+    """
+    _client_options.clear()
+    _client_options.update(options)
+
+
+def get_async_client() -> AsyncHttpClient:
+    """
+    获取当前事件循环共享的客户端，首次调用时创建
+
+    Raises:
+        ImportError: 没有安装可用的后端
+        RuntimeError: 不在事件循环中调用
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncHttpClient(**_client_options)
+    return client
+
+
+async def close_async_client() -> None:
+    """关闭当前事件循环共享的客户端，应在事件循环结束前调用"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
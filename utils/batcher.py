@@ -0,0 +1,92 @@
+"""
+请求合并
+
+把多个线程在短时间内提交的同类请求合并为一次调用，例如把同时放入目录的几篇文章
+合并为一个多图文草稿：只需一次令牌检查和一次 HTTP 请求。
+
+每个提交者阻塞到自己所在的批次完成，得到与自己对应的结果，之后各自独立处理
+（移动文件、记录任务进度）。同一分组中第一个提交者负责等待：批次满了立即发送，
+否则在等待窗口结束时发送已收集的部分。
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class _Batch(Generic[T]):
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.items: List[T] = []
+        self.futures: List[Future] = []
+
+
+class Batcher(Generic[T, R]):
+    """按分组合并提交的请求，可在多个线程间共享"""
+
+    def __init__(self, flush: Callable[[List[T]], List[R]], max_size: int, window: float):
+        """
+        Args:
+            flush: 处理一个批次的函数，接收按提交顺序排列的请求，返回等长的结果列表；
+                抛出的异常传给该批次的所有提交者
+            max_size: 每个批次最多包含的请求数
+            window: 批次中第一个请求提交后最多等待多少秒
+        """
+        self.flush = flush
+        self.max_size = max(1, int(max_size))
+        self.window = float(window)
+        self._batches: Dict[Any, _Batch[T]] = {}
+        self._cond = threading.Condition()
+
+    def submit(self, key: Any, item: T) -> R:
+        """
+        提交请求并等待所在批次完成
+
+        Args:
+            key: 分组键，只有分组相同的请求才会合并
+            item: 请求
+
+        Returns:
+            该请求对应的结果
+        """
+        future: Future = Future()
+        ready: Optional[_Batch[T]] = None
+        with self._cond:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch(time.monotonic() + self.window)
+            batch.items.append(item)
+            batch.futures.append(future)
+
+            if len(batch.items) >= self.max_size:
+                ready = self._batches.pop(key)
+                self._cond.notify_all()
+            elif leader:
+                # 第一个提交者等到批次已满（由其他提交者发送）或等待窗口结束
+                while self._batches.get(key) is batch:
+                    remaining = batch.deadline - time.monotonic()
+                    if remaining <= 0:
+                        ready = self._batches.pop(key)
+                        break
+                    self._cond.wait(remaining)
+
+        if ready is not None:
+            self._run(ready)
+        return future.result()
+
+    def _run(self, batch: _Batch[T]) -> None:
+        try:
+            results = self.flush(list(batch.items))
+            if len(results) != len(batch.items):
+                raise ValueError(f"批次包含 {len(batch.items)} 个请求，却返回了 {len(results)} 个结果")
+        except BaseException as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
@@ -1,6 +1,6 @@
 import os
 import yaml
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 class Config:
@@ -147,3 +147,15 @@ class Config:
             return True
         except KeyError:
             return False
+
+
+def as_list(value: Any) -> List[str]:
+    """
+    把配置或 front matter 中的列表值（账户、标签、分类等）统一为字符串列表
+
+    既可以是 YAML 列表，也可以是逗号分隔的字符串；空值和空白项会被忽略。
+    """
+    if not value:
+        return []
+    items = value if isinstance(value, (list, tuple, set)) else str(value).split(',')
+    return [str(item).strip() for item in items if item is not None and str(item).strip()]
@@ -0,0 +1,330 @@
+"""
+远程图片下载缓存
+
+文章中引用的网络图片需要先下载到本地，再上传到平台（微信等平台不显示外链图片）。
+下载结果按 URL 保存在缓存目录中，多篇文章引用同一张图片、或同一篇文章重新发布时不再重复下载：
+
+- 在 `revalidate_after` 秒内再次使用直接返回缓存的文件；之后带 If-None-Match /
+  If-Modified-Since 发送条件请求，服务器返回 304 时继续使用缓存；
+- 网络错误时如果有缓存的副本则使用旧副本；
+- 缓存总大小超过上限时按最近使用时间淘汰（LRU）；
+- 下载先写入缓存目录中的 .part 临时文件，完成后原子替换，失败时立即删除，
+  上次运行中断留下的临时文件在下次打开缓存时清理。
+
+多张图片通过 `fetch_many` 并发下载，同一 URL 同时只下载一次；同一批次中已经返回给调用方的文件
+在整个批次完成前不会被其他下载触发的淘汰删除，调用方还可以用 `pinned` 把它们保留到使用完毕。
+"""
+
+import contextlib
+import hashlib
+import logging
+import mimetypes
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+
+from utils.metrics import CACHE_HITS, CACHE_MISSES, get_metrics
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.db'
+PART_SUFFIX = '.part'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 单个文件的大小上限，防止误引用的大文件占满磁盘
+DEFAULT_MAX_FILE_BYTES = 50 * 1024 * 1024
+# 距上次下载或验证不超过该时间（秒）时直接使用缓存，不发送条件请求
+DEFAULT_REVALIDATE_AFTER = 3600.0
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 20.0
+CHUNK_SIZE = 64 * 1024
+
+
+class DownloadTooLarge(Exception):
+    """下载的文件超过单个文件的大小上限"""
+
+
+class DownloadCache:
+    """按 URL 缓存下载的文件，可在多个线程间共享"""
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                 revalidate_after: float = DEFAULT_REVALIDATE_AFTER, workers: int = DEFAULT_WORKERS,
+                 timeout: float = DEFAULT_TIMEOUT, session: Optional[requests.Session] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，下载的文件和索引数据库都保存在其中
+            max_bytes: 缓存总大小上限（字节），超过后淘汰最久未使用的文件
+            max_file_bytes: 单个文件的大小上限（字节）
+            revalidate_after: 缓存的文件在多少秒内无需向服务器验证
+            workers: fetch_many 的并发下载数
+            timeout: 单次请求的超时（秒）
+            session: 发送请求使用的会话，默认新建（校验 HTTPS 证书）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.max_file_bytes = int(max_file_bytes)
+        self.revalidate_after = float(revalidate_after)
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        # 不能淘汰的 URL -> 持有者数量
+        self._pins: Dict[str, int] = {}
+        self._conn = sqlite3.connect(str(self.cache_dir / INDEX_FILE), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS downloads ('
+            ' url TEXT PRIMARY KEY,'
+            ' file TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' validated_at REAL NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS downloads_lru ON downloads (last_used)')
+        self._conn.commit()
+        self._remove_partial_files()
+
+    def fetch(self, url: str) -> Optional[str]:
+        """
+        获取 URL 对应的本地文件，必要时下载
+
+        Returns:
+            缓存中的文件路径，下载失败且没有缓存的副本时返回 None
+        """
+        with self._url_lock(url):
+            now = time.time()
+            entry = self._entry(url)
+            cached = self.cache_dir / entry[0] if entry else None
+            if cached is not None and not cached.exists():
+                self._delete(url)
+                entry = cached = None
+
+            if entry and now - entry[4] < self.revalidate_after:
+                self._touch(url, now)
+                get_metrics().inc(CACHE_HITS, cache='download')
+                return str(cached)
+
+            headers = {}
+            if entry and entry[2]:
+                headers['If-None-Match'] = entry[2]
+            if entry and entry[3]:
+                headers['If-Modified-Since'] = entry[3]
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304 and entry:
+                        self._touch(url, now, validated=True)
+                        get_metrics().inc(CACHE_HITS, cache='download')
+                        return str(cached)
+                    response.raise_for_status()
+                    file_name = self._file_name(url, response.headers.get('Content-Type'))
+                    size = self._download(response, self.cache_dir / file_name)
+                    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+            except (requests.RequestException, OSError, DownloadTooLarge) as e:
+                if entry:
+                    logger.warning(f"下载 {url} 失败，使用缓存的副本: {e}")
+                    self._touch(url, now)
+                    return str(cached)
+                logger.warning(f"下载 {url} 失败: {e}")
+                return None
+
+            if entry and entry[0] != file_name:
+                # 内容类型变化导致扩展名不同，删除旧文件
+                self._unlink(self.cache_dir / entry[0])
+            with self._lock:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO downloads (url, file, size, etag, last_modified, validated_at, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (url, file_name, size, etag, last_modified, now, now)
+                )
+                self._conn.commit()
+            get_metrics().inc(CACHE_MISSES, cache='download')
+            logger.info(f"已下载 {url} ({size / 1024:.1f}KB)")
+        self.evict(keep=url)
+        return str(self.cache_dir / file_name)
+
+    def fetch_many(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """
+        并发获取多个 URL，同一 URL 只获取一次
+
+        Returns:
+            URL -> 本地文件路径（失败为 None）
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return {}
+        if len(unique_urls) == 1:
+            return {unique_urls[0]: self.fetch(unique_urls[0])}
+        workers = min(self.workers, len(unique_urls))
+        # 批次中先完成的文件已经交给调用方，不能被后完成的下载触发的淘汰删除
+        with self.pinned(unique_urls), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download') as executor:
+            return dict(zip(unique_urls, executor.map(self.fetch, unique_urls)))
+
+    @contextlib.contextmanager
+    def pinned(self, urls: Iterable[str]) -> Iterator[None]:
+        """在 with 块内不淘汰这些 URL 的文件（调用方仍在使用），缓存总大小可以暂时超过上限"""
+        urls = list(dict.fromkeys(urls))
+        with self._lock:
+            for url in urls:
+                self._pins[url] = self._pins.get(url, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for url in urls:
+                    if self._pins[url] > 1:
+                        self._pins[url] -= 1
+                    else:
+                        del self._pins[url]
+
+    def total_bytes(self) -> int:
+        """缓存中文件的总大小"""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM downloads').fetchone()[0]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        缓存总大小超过上限时，按最近使用时间从旧到新删除文件
+
+        Args:
+            keep: 不淘汰的 URL（刚刚下载、调用方即将使用的文件）；`pinned` 中的 URL 同样不淘汰
+
+        Returns:
+            删除的文件数
+        """
+        with self._lock:
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM downloads').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = self._conn.execute('SELECT url, file, size FROM downloads ORDER BY last_used').fetchall()
+            removed = []
+            for url, file_name, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if url == keep or url in self._pins:
+                    continue
+                removed.append((url, file_name))
+                total -= size
+            self._conn.executemany('DELETE FROM downloads WHERE url = ?', [(url,) for url, _ in removed])
+            self._conn.commit()
+        for _, file_name in removed:
+            self._unlink(self.cache_dir / file_name)
+        if removed:
+            logger.info(f"下载缓存超过 {self.max_bytes / 1024 / 1024:.0f}MB，已淘汰 {len(removed)} 个最久未使用的文件")
+        return len(removed)
+
+    def close(self) -> None:
+        """关闭索引数据库和会话"""
+        with self._lock:
+            self._conn.close()
+        self.session.close()
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    def _entry(self, url: str) -> Optional[Tuple[str, int, Optional[str], Optional[str], float]]:
+        """(文件名, 大小, ETag, Last-Modified, 上次验证时间)"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT file, size, etag, last_modified, validated_at FROM downloads WHERE url = ?', (url,)
+            ).fetchone()
+
+    def _touch(self, url: str, now: float, validated: bool = False) -> None:
+        with self._lock:
+            if validated:
+                self._conn.execute('UPDATE downloads SET last_used = ?, validated_at = ? WHERE url = ?',
+                                   (now, now, url))
+            else:
+                self._conn.execute('UPDATE downloads SET last_used = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+
+    def _delete(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM downloads WHERE url = ?', (url,))
+            self._conn.commit()
+
+    @staticmethod
+    def _file_name(url: str, content_type: Optional[str]) -> str:
+        """按 URL 的哈希命名，扩展名取自 URL 路径，没有时按 Content-Type 推断"""
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        if not extension or len(extension) > 5:
+            mime_type = (content_type or '').split(';')[0].strip()
+            extension = (mimetypes.guess_extension(mime_type) if mime_type else None) or ''
+        return f'{digest[:2]}/{digest}{extension}'
+
+    def _download(self, response: requests.Response, target: Path) -> int:
+        """把响应体写入 target，返回文件大小；失败时不留下任何文件"""
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_file_bytes:
+            raise DownloadTooLarge(f"文件大小 {int(length)} 超过上限 {self.max_file_bytes}")
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=str(target.parent), suffix=PART_SUFFIX)
+        try:
+            size = 0
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_file_bytes:
+                        raise DownloadTooLarge(f"文件大小超过上限 {self.max_file_bytes}")
+                    f.write(chunk)
+            os.replace(part_path, target)
+            return size
+        finally:
+            self._unlink(Path(part_path))
+
+    def _remove_partial_files(self) -> None:
+        """删除上次运行中断时留下的临时文件"""
+        for part in self.cache_dir.glob(f'*/*{PART_SUFFIX}'):
+            self._unlink(part)
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除缓存文件 {path} 失败: {e}")
+
+
+_shared_caches: Dict[str, DownloadCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_download_cache(cache_dir: Union[str, Path, None] = None,
+                       max_bytes: Optional[int] = None,
+                       session_factory: Optional[Callable[[], requests.Session]] = None) -> DownloadCache:
+    """
+    获取指定目录的共享下载缓存，同一目录在进程内只打开一次
+
+    Args:
+        cache_dir: 缓存目录，None 表示系统临时目录下的 publisher_download_cache
+        max_bytes: 缓存总大小上限（字节），None 表示默认值；只在第一次打开时生效
+        session_factory: 创建下载会话的函数，None 表示新建普通会话；只在第一次打开时调用
+    """
+    path = Path(cache_dir) if cache_dir else Path(tempfile.gettempdir()) / 'publisher_download_cache'
+    key = str(path.resolve())
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = DownloadCache(path, max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES,
+                                                        session=session_factory() if session_factory else None)
+        return cache
@@ -1,6 +1,7 @@
 import os
 import shutil
 import hashlib
+import time
 from pathlib import Path
 from typing import List, Optional, Union, Tuple, Dict, Any
 import mimetypes
@@ -44,6 +45,46 @@ def get_file_checksum(file_path: Union[str, Path], algorithm: str = 'md5',
     return hash_func.hexdigest()
 
 
+def wait_for_quiescence(file_path: Union[str, Path], settle: float = 0.5,
+                        timeout: float = 30.0, interval: float = 0.1) -> bool:
+    """
+    等待文件写入完成：文件大小和修改时间在 settle 秒内保持不变
+
+    Args:
+        file_path: 文件路径
+        settle: 认为写入已完成所需的静默时间（秒）
+        timeout: 最长等待时间（秒），超时后视为已完成
+        interval: 检查间隔（秒）
+
+    Returns:
+        文件已稳定返回 True，等待期间文件被删除则返回 False
+    """
+    deadline = time.monotonic() + timeout
+    last_signature = None
+    stable_since = time.monotonic()
+    while True:
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return False
+
+        # 最后一次修改已经足够久远，无需再观察
+        if time.time() - stat.st_mtime >= settle:
+            return True
+
+        now = time.monotonic()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature != last_signature:
+            last_signature = signature
+            stable_since = now
+        elif now - stable_since >= settle:
+            return True
+
+        if now >= deadline:
+            return True
+        time.sleep(interval)
+
+
 def find_files(directory: Union[str, Path], 
               extensions: Optional[List[str]] = None,
               recursive: bool = True) -> List[Path]:
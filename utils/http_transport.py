@@ -0,0 +1,293 @@
+"""
+共享的 HTTP 传输层
+
+所有发布器的同步请求都通过这里创建的会话发出：
+
+- 连接池按主机划分，大小可按主机配置；同一主机同时进行的请求数不超过连接池大小，
+  多出的请求排队等待空闲连接，而不是临时建立连接、用完即丢弃（连接池"抖动"）；
+  请求占用的名额保持到连接归还连接池（响应体读完或响应关闭）为止，流式下载同样计入；
+- 每个请求都有连接超时和读取超时（调用方显式传入 timeout 时以调用方为准），
+  对端无响应的连接不会让发布线程无限期挂起；
+- 连接保持（keep-alive）复用，并开启 TCP keepalive 探测已失效的空闲连接；
+- 记录每个主机的请求数和排队等待连接的次数、时间，用于判断连接池大小是否合适
+  （同时计入 `utils.metrics`，随其他指标一起导出）。
+
+会话（cookie、登录状态、请求头）属于各个发布器，连接池由所有会话共享。
+requests 不支持 HTTP/2，`http2` 选项作用于异步发布使用的 httpx 客户端（需要安装 h2）。
+"""
+
+import importlib.util
+import json
+import logging
+import socket
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+from utils import async_http
+from utils.metrics import HTTP_POOL_WAIT_SECONDS, HTTP_POOL_WAITS, HTTP_REQUESTS, get_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 16
+# 保留连接池的主机数
+DEFAULT_POOL_CONNECTIONS = 16
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+# 等待空闲连接超过该时间（秒）时记录日志
+SLOW_POOL_WAIT = 1.0
+
+
+@dataclass(frozen=True)
+class HostSettings:
+    """一个主机（或默认）的连接池和超时设置"""
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]], defaults: Optional['HostSettings'] = None) -> 'HostSettings':
+        """从配置创建，未给出的项使用 defaults（或内置默认值）"""
+        config = config or {}
+        defaults = defaults or cls()
+        return cls(
+            pool_maxsize=max(1, int(config.get('pool_maxsize', defaults.pool_maxsize))),
+            connect_timeout=float(config.get('connect_timeout', defaults.connect_timeout)),
+            read_timeout=float(config.get('read_timeout', defaults.read_timeout)),
+        )
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """传给 requests 的 (连接超时, 读取超时)"""
+        return self.connect_timeout, self.read_timeout
+
+
+class _HostSlots:
+    """限制一个主机同时进行的请求数，并统计排队等待的情况"""
+
+    def __init__(self, host: str, size: int):
+        self.host = host
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def acquire(self) -> None:
+        waited = 0.0
+        if not self._slots.acquire(blocking=False):
+            start = time.monotonic()
+            self._slots.acquire()
+            waited = time.monotonic() - start
+            if waited >= SLOW_POOL_WAIT:
+                logger.info(f"等待 {self.host} 的空闲连接 {waited:.1f} 秒，可以考虑增大 pool_maxsize")
+        with self._lock:
+            self.requests += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait = max(self.max_wait, waited)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        metrics = get_metrics()
+        metrics.inc(HTTP_REQUESTS, host=self.host)
+        if waited:
+            metrics.inc(HTTP_POOL_WAITS, host=self.host)
+            metrics.inc(HTTP_POOL_WAIT_SECONDS, waited, host=self.host)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'pool_waits': self.waits,
+                'pool_wait_seconds': self.wait_seconds,
+                'max_pool_wait': self.max_wait,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+            }
+
+
+class TransportAdapter(HTTPAdapter):
+    """按传输层设置建立连接池的适配器，发送前占用目标主机的连接名额"""
+
+    def __init__(self, transport: 'HttpTransport', settings: HostSettings):
+        self.transport = transport
+        self.settings = settings
+        # 只重试建立连接失败（请求尚未发出）的情况，其余错误交给发布器的重试策略处理
+        retries = Retry(total=transport.connect_retries, connect=transport.connect_retries,
+                        read=False, status=0, other=0, redirect=False, raise_on_redirect=False)
+        super().__init__(pool_connections=transport.pool_connections, pool_maxsize=settings.pool_maxsize,
+                         max_retries=retries)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.transport.tcp_keepalive:
+            pool_kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        slots = self.transport.host_slots(urlparse(request.url).hostname or '')
+        slots.acquire()
+        try:
+            response = super().send(request, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        self._hold_slot(response, slots)
+        return response
+
+    @staticmethod
+    def _hold_slot(response: requests.Response, slots: _HostSlots) -> None:
+        """
+        收到响应头时连接仍被占用（stream=True 时直到调用方读完或关闭响应），
+        名额在连接归还连接池时才释放，只释放一次；响应未关闭就被回收时同样释放。
+        """
+        raw = response.raw
+        release_conn = getattr(raw, 'release_conn', None)
+        if release_conn is None:
+            slots.release()
+            return
+
+        lock = threading.Lock()
+        released = False
+
+        def release_slot():
+            nonlocal released
+            with lock:
+                if released:
+                    return
+                released = True
+            slots.release()
+
+        def release_conn_and_slot():
+            try:
+                release_conn()
+            finally:
+                release_slot()
+
+        # urllib3 读完响应体、requests 关闭响应时都通过 release_conn 归还连接
+        raw.release_conn = release_conn_and_slot
+        weakref.finalize(response, release_slot)
+
+
+class TransportSession(requests.Session):
+    """使用共享连接池的会话，没有指定 timeout 的请求使用目标主机的默认超时"""
+
+    def __init__(self, transport: 'HttpTransport'):
+        super().__init__()
+        self.transport = transport
+        transport.mount(self)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.transport.settings_for(urlparse(url).hostname).timeout
+        return super().request(method, url, **kwargs)
+
+    def close(self) -> None:
+        """连接池由所有会话共享，关闭会话不关闭连接池"""
+
+
+class HttpTransport:
+    """所有发布器共享的 HTTP 传输层，可在多个线程间共享"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            config: 传输层配置，例如::
+
+                {'pool_maxsize': 16, 'connect_timeout': 10, 'read_timeout': 60,
+                 'hosts': {'api.weixin.qq.com': {'pool_maxsize': 32, 'read_timeout': 120}},
+                 'tcp_keepalive': True, 'connect_retries': 0, 'http2': False, 'async_max_connections': 100}
+        """
+        config = dict(config or {})
+        self.defaults = HostSettings.from_config(config)
+        self.hosts = {host: HostSettings.from_config(host_config, self.defaults)
+                      for host, host_config in (config.get('hosts') or {}).items()}
+        self.pool_connections = max(1, int(config.get('pool_connections', DEFAULT_POOL_CONNECTIONS)))
+        self.tcp_keepalive = bool(config.get('tcp_keepalive', True))
+        self.connect_retries = max(0, int(config.get('connect_retries', 0)))
+        self.http2 = bool(config.get('http2', False))
+        self._default_adapter = TransportAdapter(self, self.defaults)
+        self._host_adapters = {host: TransportAdapter(self, settings) for host, settings in self.hosts.items()}
+        self._slots: Dict[str, _HostSlots] = {}
+        self._lock = threading.Lock()
+        if self.http2 and importlib.util.find_spec('h2') is None:
+            logger.warning("启用 HTTP/2 需要安装 h2（pip install httpx[http2]），继续使用 HTTP/1.1")
+        async_http.configure_async_client(
+            max_connections=int(config.get('async_max_connections', async_http.DEFAULT_MAX_CONNECTIONS)),
+            timeout=self.defaults.read_timeout, connect_timeout=self.defaults.connect_timeout, http2=self.http2)
+
+    def settings_for(self, host: Optional[str]) -> HostSettings:
+        """主机的连接池和超时设置，未单独配置的主机使用默认设置"""
+        return self.hosts.get(host or '', self.defaults)
+
+    def session(self) -> TransportSession:
+        """创建使用共享连接池的新会话（cookie 和请求头属于会话，不与其他会话共享）"""
+        return TransportSession(self)
+
+    def mount(self, session: requests.Session) -> None:
+        """让会话使用共享的连接池"""
+        session.mount('https://', self._default_adapter)
+        session.mount('http://', self._default_adapter)
+        for host, adapter in self._host_adapters.items():
+            session.mount(f'https://{host}/', adapter)
+            session.mount(f'http://{host}/', adapter)
+
+    def host_slots(self, host: str) -> _HostSlots:
+        with self._lock:
+            slots = self._slots.get(host)
+            if slots is None:
+                slots = self._slots[host] = _HostSlots(host, self.settings_for(host).pool_maxsize)
+            return slots
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        每个主机的请求统计
+
+        Returns:
+            主机 -> {requests, pool_waits, pool_wait_seconds, max_pool_wait, in_flight, peak_in_flight}
+        """
+        with self._lock:
+            slots = list(self._slots.values())
+        return {item.host: item.snapshot() for item in slots}
+
+    def close(self) -> None:
+        """关闭所有连接池"""
+        self._default_adapter.close()
+        for adapter in self._host_adapters.values():
+            adapter.close()
+
+
+_shared_transports: Dict[str, HttpTransport] = {}
+_shared_lock = threading.Lock()
+
+
+def get_http_transport(config: Optional[Dict[str, Any]] = None) -> HttpTransport:
+    """
+    获取共享的传输层，配置相同时在进程内只创建一次
+
+    Args:
+        config: 传输层配置（config.yaml 中的 http 部分），None 表示全部使用默认值
+    """
+    key = json.dumps(config or {}, sort_keys=True, default=str)
+    with _shared_lock:
+        transport = _shared_transports.get(key)
+        if transport is None:
+            transport = _shared_transports[key] = HttpTransport(config)
+        return transport
@@ -0,0 +1,350 @@
+"""
+上传前的图片处理
+
+按平台的图片规格（最长边、输出格式、质量、大小上限）缩放并重新压缩图片，
+上传的数据量更小、发布更快，也不会因为原图超出平台限制而上传失败。
+
+- 解码和编码是 CPU 密集的工作，在进程池中并行进行，不受 GIL 限制；
+- 结果按 (原图内容哈希, 规格) 存入内容寻址的缓存目录，同一张图片对每种规格只转码一次，
+  再次发布、发往同平台的多个账户时直接使用缓存的文件；
+- 已经符合规格的小图、动图、无法识别的格式直接使用原图。
+
+Pillow 只在第一次遇到需要检查的图片时导入，进程池也在第一次需要转码时才创建。
+"""
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from utils.file_utils import get_file_checksum
+
+logger = logging.getLogger(__name__)
+
+# 转码算法变化时加一，使旧的缓存结果失效
+PIPELINE_VERSION = 1
+DEFAULT_MAX_DIMENSION = 1920
+DEFAULT_QUALITY = 85
+# 为满足大小上限逐步降低质量时的下限和步长，降到下限仍超出时缩小尺寸
+MIN_QUALITY = 50
+QUALITY_STEP = 10
+SHRINK_FACTOR = 0.75
+MAX_SHRINK_STEPS = 6
+# 已经符合规格且不超过该大小的图片直接使用原图，不再重新压缩
+DEFAULT_RECOMPRESS_ABOVE = 200 * 1024
+# 默认的转码进程数上限
+DEFAULT_MAX_WORKERS = 4
+# 支持输出的格式及对应的扩展名
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+# 缓存目录中的空标记文件：该规格下转码没有收益，直接使用原图
+KEEP_MARKER_SUFFIX = '.keep'
+
+
+@dataclass(frozen=True)
+class ImageProfile:
+    """平台对一类图片（正文图片、封面等）的规格要求"""
+
+    name: str
+    # 最长边（像素），None 表示不限
+    max_dimension: Optional[int] = DEFAULT_MAX_DIMENSION
+    # 输出格式 'JPEG' / 'PNG' / 'WEBP'，None 表示保持原格式（不支持的格式转为 JPEG）
+    format: Optional[str] = None
+    # JPEG / WEBP 的编码质量
+    quality: int = DEFAULT_QUALITY
+    # 文件大小上限（字节），None 表示不限
+    max_bytes: Optional[int] = None
+    # 原图已符合规格且不超过该大小时不重新压缩
+    recompress_above: int = DEFAULT_RECOMPRESS_ABOVE
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any]) -> 'ImageProfile':
+        """
+        从配置创建规格
+
+        Args:
+            config: 形如 {'max_dimension': 1920, 'format': 'jpeg', 'quality': 85, 'max_bytes': 2097152}，各项均可省略
+        """
+        image_format = config.get('format')
+        if image_format:
+            image_format = image_format.upper().replace('JPG', 'JPEG')
+            if image_format not in FORMAT_EXTENSIONS:
+                raise ValueError(f"图片规格 '{name}' 的格式 '{config['format']}' 不受支持")
+        return cls(
+            name=name,
+            max_dimension=config.get('max_dimension', DEFAULT_MAX_DIMENSION),
+            format=image_format or None,
+            quality=int(config.get('quality', DEFAULT_QUALITY)),
+            max_bytes=config.get('max_bytes'),
+            recompress_above=int(config.get('recompress_above', DEFAULT_RECOMPRESS_ABOVE)),
+        )
+
+    @property
+    def key(self) -> str:
+        """规格参数的摘要，作为缓存文件名的一部分；规格名不参与，参数相同的规格共享缓存"""
+        params = (PIPELINE_VERSION, self.max_dimension, self.format, self.quality, self.max_bytes,
+                  self.recompress_above)
+        return hashlib.sha256(repr(params).encode('utf-8')).hexdigest()[:16]
+
+    def output_format(self, source_format: Optional[str]) -> str:
+        """原图格式为 source_format 时的输出格式"""
+        if self.format:
+            return self.format
+        return source_format if source_format in FORMAT_EXTENSIONS else 'JPEG'
+
+    def fits(self, source_format: Optional[str], size: Tuple[int, int], file_size: int) -> bool:
+        """原图是否已经符合规格，可以不经转码直接上传"""
+        if self.format and source_format != self.format:
+            return False
+        if source_format not in FORMAT_EXTENSIONS:
+            return False
+        if self.max_dimension and max(size) > self.max_dimension:
+            return False
+        if self.max_bytes and file_size > self.max_bytes:
+            return False
+        return file_size <= self.recompress_above
+
+
+def probe(image_path: str) -> Optional[Tuple[Optional[str], Tuple[int, int], bool]]:
+    """
+    只读取文件头，返回 (格式, 尺寸, 是否为动图)；Pillow 无法识别时返回 None
+    """
+    from PIL import Image, UnidentifiedImageError
+    try:
+        with Image.open(image_path) as img:
+            return img.format, img.size, bool(getattr(img, 'is_animated', False))
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+
+def _prepare_mode(img: Any, output_format: str) -> Any:
+    """把图片转换为输出格式支持的色彩模式，JPEG 不支持透明，透明部分合成到白色背景上"""
+    from PIL import Image
+    if output_format == 'JPEG':
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            rgba = img.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return img if img.mode in ('RGB', 'L') else img.convert('RGB')
+    return img if img.mode in ('RGB', 'RGBA', 'L', 'LA', 'P') else img.convert('RGBA')
+
+
+def _encode(img: Any, output_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if output_format == 'JPEG':
+        img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    elif output_format == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        img.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def transcode(source: str, target: str, profile: ImageProfile) -> bool:
+    """
+    按规格转码图片并写入 target（在工作进程中执行）
+
+    Returns:
+        True 表示已写入 target；False 表示转码没有收益（结果不比原图小且原图已符合规格），应使用原图
+    """
+    from PIL import Image
+
+    source_size = os.path.getsize(source)
+    with Image.open(source) as img:
+        source_format, source_dimensions = img.format, img.size
+        output_format = profile.output_format(source_format)
+        if profile.max_dimension:
+            bound = (profile.max_dimension, profile.max_dimension)
+            # JPEG 在解码时直接按 1/2、1/4、1/8 缩小，不必把整张原图解码进内存
+            img.draft('RGB', bound)
+            img.thumbnail(bound)
+        image = _prepare_mode(img, output_format)
+        image.load()
+    source_fits = (source_format == output_format
+                   and (not profile.max_dimension or max(source_dimensions) <= profile.max_dimension))
+
+    lossy = output_format in ('JPEG', 'WEBP')
+    data = b''
+    for _ in range(MAX_SHRINK_STEPS + 1):
+        quality = profile.quality
+        while True:
+            data = _encode(image, output_format, quality)
+            if not profile.max_bytes or len(data) <= profile.max_bytes:
+                break
+            if not lossy or quality - QUALITY_STEP < MIN_QUALITY:
+                break
+            quality -= QUALITY_STEP
+        if not profile.max_bytes or len(data) <= profile.max_bytes:
+            break
+        width, height = image.size
+        image = image.resize((max(1, int(width * SHRINK_FACTOR)), max(1, int(height * SHRINK_FACTOR))),
+                             Image.LANCZOS)
+
+    if source_fits and len(data) >= source_size and (not profile.max_bytes or source_size <= profile.max_bytes):
+        return False
+
+    Path(target).parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再替换，并发转码同一张图片或中途退出都不会留下不完整的缓存文件
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return True
+
+
+class ImagePipeline:
+    """按规格处理图片并缓存结果，可在多个线程间共享"""
+
+    def __init__(self, cache_dir: Union[str, Path, None] = None, workers: Optional[int] = None,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None):
+        """
+        Args:
+            cache_dir: 转码结果的缓存目录，None 表示系统临时目录下的 publisher_image_cache
+            workers: 转码进程数，None 表示 CPU 核数（最多 DEFAULT_MAX_WORKERS），0 表示在调用线程中转码
+            mp_context: multiprocessing 上下文，默认以 spawn 方式启动（原因见 utils.worker_pool）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(tempfile.gettempdir()) / 'publisher_image_cache'
+        if workers is None:
+            workers = min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+        self.workers = max(0, int(workers))
+        self._context = mp_context or multiprocessing.get_context('spawn')
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def cache_path(self, content_hash: str, profile: ImageProfile, source_format: Optional[str]) -> Path:
+        """原图内容哈希为 content_hash 的图片按规格转码后的缓存路径"""
+        extension = FORMAT_EXTENSIONS[profile.output_format(source_format)]
+        return self.cache_dir / content_hash[:2] / f'{content_hash}-{profile.key}{extension}'
+
+    def prepare(self, image_paths: List[str], profile: ImageProfile) -> Dict[str, str]:
+        """
+        按规格处理一组图片，需要转码的图片在进程池中并行转码
+
+        Returns:
+            原图路径 -> 应当上传的文件路径（转码结果，或无需转码、转码失败时的原图）
+        """
+        prepared: Dict[str, str] = {}
+        pending: List[Tuple[str, Path]] = []
+        for image_path in dict.fromkeys(image_paths):
+            prepared[image_path] = image_path
+            target = self._lookup(image_path, profile)
+            if target is None:
+                continue
+            if target.exists():
+                prepared[image_path] = str(target)
+            elif not self._keep_marker(target).exists():
+                pending.append((image_path, target))
+
+        for (image_path, target), result in zip(pending, self._transcode_all(pending, profile)):
+            if isinstance(result, BaseException):
+                logger.warning(f"图片转码失败，将上传原图: {os.path.basename(image_path)}, {result}")
+            elif result:
+                prepared[image_path] = str(target)
+                logger.info(f"图片 {os.path.basename(image_path)} 已按规格 '{profile.name}' 处理: "
+                            f"{os.path.getsize(image_path) / 1024:.1f}KB -> {target.stat().st_size / 1024:.1f}KB")
+            else:
+                marker = self._keep_marker(target)
+                marker.parent.mkdir(parents=True, exist_ok=True)
+                marker.touch()
+        return prepared
+
+    def close(self) -> None:
+        """关闭转码进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _lookup(self, image_path: str, profile: ImageProfile) -> Optional[Path]:
+        """返回图片的缓存路径；无法读取、无法识别、动图或已符合规格时返回 None，表示直接使用原图"""
+        try:
+            content_hash = get_file_checksum(image_path, 'sha256')
+            file_size = os.path.getsize(image_path)
+        except OSError:
+            return None
+        info = probe(image_path)
+        if info is None:
+            return None
+        source_format, size, animated = info
+        if animated or profile.fits(source_format, size, file_size):
+            return None
+        return self.cache_path(content_hash, profile, source_format)
+
+    @staticmethod
+    def _keep_marker(target: Path) -> Path:
+        return target.with_name(target.name + KEEP_MARKER_SUFFIX)
+
+    def _transcode_all(self, pending: List[Tuple[str, Path]], profile: ImageProfile) -> List[Any]:
+        """转码所有待处理的图片，返回每张图片的结果或异常"""
+        if not pending:
+            return []
+        if self.workers == 0 or (len(pending) == 1 and self._executor is None):
+            # 单张图片不值得为它启动进程池
+            return [self._call(transcode, source, str(target), profile) for source, target in pending]
+
+        executor = self._get_executor()
+        futures = [executor.submit(transcode, source, str(target), profile) for source, target in pending]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as e:
+                self._reset_executor(executor)
+                results.append(e)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    @staticmethod
+    def _call(fn: Any, *args: Any) -> Any:
+        try:
+            return fn(*args)
+        except Exception as e:
+            return e
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        """转码进程意外退出后丢弃进程池，下次使用时重建"""
+        with self._lock:
+            if self._executor is executor:
+                logger.error("图片转码进程意外退出，正在重建进程池")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_shared_pipelines: Dict[Tuple[str, Optional[int]], ImagePipeline] = {}
+_shared_lock = threading.Lock()
+
+
+def get_image_pipeline(cache_dir: Union[str, Path, None] = None, workers: Optional[int] = None) -> ImagePipeline:
+    """
+    获取共享的图片处理流水线，同一缓存目录和进程数在进程内只创建一次（共享一个进程池）
+
+    Args:
+        cache_dir: 转码结果的缓存目录
+        workers: 转码进程数，见 ImagePipeline
+    """
+    key = (str(Path(cache_dir).resolve()) if cache_dir else '', workers)
+    with _shared_lock:
+        pipeline = _shared_pipelines.get(key)
+        if pipeline is None:
+            pipeline = _shared_pipelines[key] = ImagePipeline(cache_dir, workers)
+        return pipeline
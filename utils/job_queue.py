@@ -0,0 +1,269 @@
+"""
+持久化的发布任务队列
+
+以 (文件路径, 账户) 为键记录每个发布任务的状态和各步骤的进度：
+parse（解析）、images（正文图片）、cover（封面）、draft（创建草稿）、move（移动文件）。
+已完成的步骤连同结果（如上传后的地址、草稿 ID）写入 SQLite (WAL)，
+进程在发布中途退出后，重启时从失败的步骤继续，而不是从头开始。
+
+失败的任务按指数退避（带抖动）安排重试，不必等到文件内容变化；
+大量任务同时失败时，抖动使它们的重试时间分散开，积压的任务以平稳的速度消化。
+
+发布器通过 `current_checkpoint()` 取得当前任务的进度，发布流程的函数签名不变；
+不在任务中调用（如单独调用 publish）时得到一个只保存在内存中的进度对象。
+"""
+
+import contextlib
+import contextvars
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from utils.retry import RetryPolicy
+
+STEPS = ('parse', 'images', 'cover', 'draft', 'move')
+
+STATE_RUNNING = 'running'
+STATE_RETRY = 'retry'
+STATE_FAILED = 'failed'
+
+# 任务级重试的默认策略：首次重试在 1 分钟内，之后翻倍，最长间隔 1 小时，共尝试 5 次
+DEFAULT_JOB_RETRY = {'max_attempts': 5, 'base_delay': 60, 'max_delay': 3600}
+
+
+class JobCheckpoint:
+    """单个 (文件, 账户) 任务的步骤进度"""
+
+    def __init__(self, queue: Optional['JobQueue'] = None, path: str = '', account: str = '',
+                 steps: Optional[Dict[str, Dict[str, Any]]] = None, attempts: int = 1):
+        """
+        Args:
+            queue: 所属的任务队列，None 表示只保存在内存中
+            steps: 已完成的步骤 -> {'result': 结果, 'at': 完成时间}
+            attempts: 包括本次在内的尝试次数
+        """
+        self.queue = queue
+        self.path = path
+        self.account = account
+        self.steps = dict(steps or {})
+        self.attempts = attempts
+
+    def done(self, step: str) -> bool:
+        """步骤是否已经完成"""
+        return step in self.steps
+
+    def result(self, step: str, ttl: Optional[float] = None) -> Any:
+        """
+        已完成步骤的结果
+
+        Args:
+            ttl: 结果的有效期（秒），超过有效期视为未完成，用于平台侧会过期的结果
+        """
+        entry = self.steps.get(step)
+        if entry is None or (ttl is not None and time.time() - entry['at'] > ttl):
+            return None
+        return entry['result']
+
+    def complete(self, step: str, result: Any = None) -> None:
+        """记录步骤完成，结果需可以序列化为 JSON"""
+        self.steps[step] = {'result': result, 'at': time.time()}
+        if self.queue is not None:
+            self.queue.save_steps(self.path, self.account, self.steps)
+
+    def update(self, steps: Dict[str, Dict[str, Any]]) -> None:
+        """合并在其他进程中完成的步骤"""
+        if steps == self.steps:
+            return
+        self.steps.update(steps)
+        if self.queue is not None:
+            self.queue.save_steps(self.path, self.account, self.steps)
+
+    def run(self, step: str, fn: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        执行步骤：已完成（且未过期）时直接返回上次的结果，否则执行 fn。
+        fn 返回 None 表示步骤失败或没有结果，不做记录，下次会重新执行。
+        """
+        result = self.result(step, ttl)
+        if result is not None:
+            return result
+        result = fn()
+        if result is not None:
+            self.complete(step, result)
+        return result
+
+
+_current_checkpoint: 'contextvars.ContextVar[Optional[JobCheckpoint]]' = \
+    contextvars.ContextVar('publish_job_checkpoint', default=None)
+
+
+def current_checkpoint() -> JobCheckpoint:
+    """当前任务的进度；不在任务中时返回一个新的、只保存在内存中的进度对象"""
+    checkpoint = _current_checkpoint.get()
+    return checkpoint if checkpoint is not None else JobCheckpoint()
+
+
+@contextlib.contextmanager
+def activate(checkpoint: JobCheckpoint) -> Iterator[JobCheckpoint]:
+    """在 with 块内把 checkpoint 设为当前任务的进度"""
+    token = _current_checkpoint.set(checkpoint)
+    try:
+        yield checkpoint
+    finally:
+        _current_checkpoint.reset(token)
+
+
+class JobQueue:
+    """基于 SQLite 的发布任务队列，可在多个线程间共享。"""
+
+    def __init__(self, db_path: Union[str, Path] = ':memory:', retry: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            db_path: 队列数据库文件路径，':memory:' 表示仅保存在内存中
+            retry: 任务级重试策略，格式同 `RetryPolicy.from_config`，默认见 DEFAULT_JOB_RETRY
+        """
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.retry_policy = RetryPolicy.from_config({**DEFAULT_JOB_RETRY, **(retry or {})})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' path TEXT NOT NULL,'
+            ' account TEXT NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' state TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL,'
+            ' steps TEXT NOT NULL,'
+            ' error TEXT,'
+            ' next_run_at REAL,'
+            ' updated_at REAL NOT NULL,'
+            ' PRIMARY KEY (path, account))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, next_run_at)')
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+    def start(self, path: str, account: str, content_hash: str) -> JobCheckpoint:
+        """
+        开始（或继续）一个任务
+
+        同一文件内容的未完成任务保留已完成的步骤；内容变化后之前的进度作废，从头开始。
+
+        Returns:
+            任务的进度，发布过程中完成的步骤通过它写回队列
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content_hash, attempts, steps FROM jobs WHERE path = ? AND account = ?',
+                (path, account)
+            ).fetchone()
+            if row and row[0] == content_hash:
+                attempts, steps = row[1] + 1, json.loads(row[2])
+            else:
+                attempts, steps = 1, {}
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs '
+                '(path, account, content_hash, state, attempts, steps, error, next_run_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, ?)',
+                (path, account, content_hash, STATE_RUNNING, attempts, json.dumps(steps, ensure_ascii=False), now)
+            )
+            self._conn.commit()
+        return JobCheckpoint(self, path, account, steps, attempts)
+
+    def save_steps(self, path: str, account: str, steps: Dict[str, Dict[str, Any]]) -> None:
+        """写入任务已完成的步骤"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET steps = ?, updated_at = ? WHERE path = ? AND account = ?',
+                (json.dumps(steps, ensure_ascii=False), time.time(), path, account)
+            )
+            self._conn.commit()
+
+    def finish(self, path: str, account: str) -> None:
+        """任务全部完成，从队列中删除"""
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE path = ? AND account = ?', (path, account))
+            self._conn.commit()
+
+    def fail(self, path: str, account: str, error: str) -> Optional[float]:
+        """
+        记录任务失败并安排重试
+
+        Returns:
+            下次重试的时间戳；已达到最大尝试次数时返回 None，任务保留到文件内容变化为止
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT attempts FROM jobs WHERE path = ? AND account = ?', (path, account)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts = row[0]
+            if attempts >= self.retry_policy.max_attempts:
+                state, next_run_at = STATE_FAILED, None
+            else:
+                state, next_run_at = STATE_RETRY, now + self.retry_policy.backoff(attempts)
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, next_run_at = ?, updated_at = ? WHERE path = ? AND account = ?',
+                (state, error, next_run_at, now, path, account)
+            )
+            self._conn.commit()
+        return next_run_at
+
+    def recover(self) -> int:
+        """
+        启动时调用：上次运行中断时仍在执行的任务立即安排重试
+
+        Returns:
+            恢复的任务数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET state = ?, next_run_at = ?, updated_at = ? WHERE state = ?',
+                (STATE_RETRY, 0, time.time(), STATE_RUNNING)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """
+        到了重试时间的任务的文件路径（按到期先后排序，同一文件只出现一次）
+
+        Args:
+            limit: 最多返回的数量，None 表示不限
+        """
+        now = time.time() if now is None else now
+        query = ('SELECT path, MIN(next_run_at) AS run_at FROM jobs WHERE state = ? AND next_run_at <= ? '
+                 'GROUP BY path ORDER BY run_at')
+        params: list = [STATE_RETRY, now]
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            return [path for path, _ in self._conn.execute(query, params)]
+
+    def has_job(self, path: str) -> bool:
+        """文件是否有未完成（包括已放弃重试）的任务"""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM jobs WHERE path = ? LIMIT 1', (path,)).fetchone() is not None
+
+    def remove(self, path: str) -> None:
+        """删除文件的所有任务（文件被删除或移出监控目录时）"""
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE path = ?', (path,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
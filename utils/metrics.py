@@ -0,0 +1,340 @@
+"""
+发布指标和耗时跟踪
+
+发布各阶段（解析、渲染、下载网络图片、压缩、上传、封面、样式内联、创建草稿、移动文件）按
+平台和账户记录耗时直方图，另外统计上传字节数、缓存命中、接口重试和 HTTP 连接池排队等计数。
+
+指标以 Prometheus 文本格式导出：可以定期写入本地文件（例如交给 node_exporter 的 textfile
+收集器），也可以在本地端口上提供 /metrics 接口。多进程模式下工作进程在每次发布后把增量
+发回协调者合并，所有指标从协调者统一导出。
+
+单次发布的各阶段耗时还会记录到当前线程的跟踪中，发布结束后输出一行汇总。
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DEFAULT_INTERVAL = 15.0
+
+STAGE_SECONDS = 'publisher_stage_seconds'
+PUBLISH_SECONDS = 'publisher_publish_seconds'
+PUBLISHES = 'publisher_publishes_total'
+API_REQUEST_SECONDS = 'publisher_api_request_seconds'
+API_RETRIES = 'publisher_api_retries_total'
+UPLOAD_BYTES = 'publisher_upload_bytes_total'
+CACHE_HITS = 'publisher_cache_hits_total'
+CACHE_MISSES = 'publisher_cache_misses_total'
+HTTP_REQUESTS = 'publisher_http_requests_total'
+HTTP_POOL_WAITS = 'publisher_http_pool_waits_total'
+HTTP_POOL_WAIT_SECONDS = 'publisher_http_pool_wait_seconds_total'
+
+METRIC_HELP = {
+    STAGE_SECONDS: '发布各阶段的耗时（秒）',
+    PUBLISH_SECONDS: '单个文件发布到单个账户的总耗时（秒）',
+    PUBLISHES: '发布次数，按结果区分',
+    API_REQUEST_SECONDS: '平台接口单次请求的耗时（秒），重试的每次尝试分别记录',
+    API_RETRIES: '平台接口的重试次数',
+    UPLOAD_BYTES: '实际上传的文件字节数（不含命中缓存的文件）',
+    CACHE_HITS: '缓存命中次数',
+    CACHE_MISSES: '缓存未命中次数',
+    HTTP_REQUESTS: '按主机统计的 HTTP 请求数',
+    HTTP_POOL_WAITS: '需要排队等待空闲连接的 HTTP 请求数',
+    HTTP_POOL_WAIT_SECONDS: '排队等待空闲连接的总时间（秒）',
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Trace:
+    """一次发布中各阶段的耗时，按完成的顺序记录；阶段可以嵌套"""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        """从开始跟踪到现在的总耗时（秒）"""
+        return time.perf_counter() - self._start
+
+    def summary(self) -> str:
+        """形如 "parse 3ms, upload 120ms, draft 80ms, 合计 210ms" 的汇总，同名阶段合并"""
+        merged: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            merged[name] = merged.get(name, 0.0) + seconds
+        parts = [f"{name} {seconds * 1000:.0f}ms" for name, seconds in merged.items()]
+        parts.append(f"合计 {self.total * 1000:.0f}ms")
+        return ', '.join(parts)
+
+
+class MetricsRegistry:
+    """计数器和直方图的集合，可在多个线程间共享"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # 直方图：每个桶的计数（最后一个为 +Inf）、总和、次数
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._local = threading.local()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """计数器增加 value"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """在直方图中记录一次观测值"""
+        key = _label_key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [0.0] * (len(self.buckets) + 3)
+            data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """把 with 块的耗时记录到直方图中（抛出异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, platform: str = '', account: str = '') -> Iterator[None]:
+        """记录发布阶段的耗时，同时加入当前线程正在进行的跟踪"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(STAGE_SECONDS, elapsed, stage=stage, platform=platform, account=account)
+            trace = getattr(self._local, 'trace', None)
+            if trace is not None:
+                trace.spans.append((stage, elapsed))
+
+    @contextlib.contextmanager
+    def trace(self) -> Iterator[Trace]:
+        """
+        跟踪 with 块内当前线程中执行的发布阶段
+
+        只有在同一线程中进行的阶段会加入跟踪；并发上传等在线程池中进行的工作由调用它们的阶段整体计时。
+        """
+        previous = getattr(self._local, 'trace', None)
+        trace = self._local.trace = Trace()
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前所有指标的副本（可以 pickle，用于跨进程传递）"""
+        with self._lock:
+            return {
+                'counters': {name: dict(series) for name, series in self._counters.items()},
+                'histograms': {name: {key: list(data) for key, data in series.items()}
+                               for name, series in self._histograms.items()},
+            }
+
+    def drain(self) -> Dict[str, Any]:
+        """取出自上次取出以来的增量并清零，工作进程用它把指标发回协调者"""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+        return {'counters': counters, 'histograms': histograms}
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """把另一个注册表的快照或增量累加到本注册表"""
+        with self._lock:
+            for name, series in snapshot.get('counters', {}).items():
+                target = self._counters.setdefault(name, {})
+                for key, value in series.items():
+                    target[key] = target.get(key, 0.0) + value
+            for name, series in snapshot.get('histograms', {}).items():
+                target = self._histograms.setdefault(name, {})
+                for key, data in series.items():
+                    if len(data) != len(self.buckets) + 3:
+                        logger.warning(f"直方图 {name} 的桶与本进程不一致，忽略")
+                        continue
+                    existing = target.get(key)
+                    target[key] = list(data) if existing is None else [a + b for a, b in zip(existing, data)]
+
+    def reset(self) -> None:
+        """清空所有指标"""
+        self.drain()
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted(snapshot['counters']):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(snapshot['counters'][name].items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        for name in sorted(snapshot['histograms']):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, data in sorted(snapshot['histograms'][name].items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets + (float('inf'),), data):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(data[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {_format_value(data[-1])}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write(self, path: Union[str, Path]) -> None:
+        """以 Prometheus 文本格式写入文件，先写临时文件再替换，读取方不会看到写了一半的文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render(), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """进程内共享的指标注册表"""
+    return _registry
+
+
+def _handler_class(registry: MetricsRegistry):
+    """提供 /metrics 的请求处理类（http.server 只在启用接口时才导入）"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+class MetricsExporter:
+    """把注册表中的指标定期写入文件，和/或在本地端口上提供 /metrics"""
+
+    def __init__(self, registry: MetricsRegistry, file: Optional[str] = None, port: Optional[int] = None,
+                 host: str = '127.0.0.1', interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            registry: 导出的注册表
+            file: 指标文件路径，None 表示不写文件
+            port: /metrics 接口的端口，None 或 0 表示不提供接口
+            host: 接口监听的地址
+            interval: 写入文件的间隔（秒）
+
+        Raises:
+            OSError: 端口无法监听
+        """
+        self.registry = registry
+        self.file = file
+        self.interval = max(0.1, float(interval))
+        self._stop = threading.Event()
+        self._server: Optional['ThreadingHTTPServer'] = None
+        self._threads: List[threading.Thread] = []
+        if port:
+            from http.server import ThreadingHTTPServer
+            self._server = ThreadingHTTPServer((host, int(port)), _handler_class(registry))
+            self._server.daemon_threads = True
+            self._start(self._server.serve_forever, 'metrics-http')
+        if file:
+            self._start(self._write_periodically, 'metrics-file')
+
+    @property
+    def address(self) -> Optional[Tuple[str, int]]:
+        """/metrics 接口实际监听的 (地址, 端口)，未提供接口时为 None"""
+        return self._server.server_address[:2] if self._server else None
+
+    def _start(self, target, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_periodically(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self) -> None:
+        """立即写入指标文件"""
+        if not self.file:
+            return
+        try:
+            self.registry.write(self.file)
+        except OSError as e:
+            logger.warning(f"写入指标文件 {self.file} 失败: {e}")
+
+    def close(self) -> None:
+        """停止接口和定期写入，并最后写入一次指标文件"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self.write()
+
+
+def start_metrics_exporter(config: Optional[Dict[str, Any]],
+                           registry: Optional[MetricsRegistry] = None) -> Optional[MetricsExporter]:
+    """
+    按配置启动指标导出，file 和 port 都未配置时返回 None
+
+    Args:
+        config: config.yaml 中的 metrics 部分，例如 {'file': 'metrics.prom', 'port': 9108, 'interval': 15}
+    """
+    config = config or {}
+    file, port = config.get('file'), int(config.get('port') or 0)
+    if not file and not port:
+        return None
+    return MetricsExporter(registry or _registry, file=file, port=port,
+                           host=config.get('host', '127.0.0.1'),
+                           interval=float(config.get('interval', DEFAULT_INTERVAL)))
@@ -0,0 +1,140 @@
+"""
+流式 multipart/form-data 编码
+
+requests 的 `files=` 参数会先把整个请求体（包括文件内容）拼接成一个 bytes 对象再发送，
+上传几十 MB 的原图时每个工作线程都要额外占用一份完整文件大小的内存。
+这里的编码器预先算出请求体长度，发送时按块读取源文件，内存占用与文件大小无关。
+"""
+
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+CHUNK_SIZE = 64 * 1024
+
+# 字段值：普通文本，或 (文件名, 本地文件路径, Content-Type)；Content-Type 为 None 时不写该头
+FieldValue = Union[str, Tuple[str, str, Optional[str]]]
+
+
+def _quote(value: str) -> str:
+    """转义 Content-Disposition 中的参数值（与 urllib3 的 HTML5 规则一致）"""
+    return value.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+class MultipartEncoder:
+    """
+    按需生成 multipart/form-data 请求体的只读流。
+
+    可直接作为 `requests` 的 `data` 参数：实现了 `__len__`（用于 Content-Length）、
+    `__iter__` 和 `read`。文件在读到对应分段时才打开，读完立即关闭。
+    """
+
+    def __init__(self, fields: Dict[str, FieldValue], boundary: Optional[str] = None,
+                 chunk_size: int = CHUNK_SIZE):
+        """
+        Args:
+            fields: 字段名 -> 字段值，按插入顺序编码
+            boundary: 分隔符，默认随机生成
+            chunk_size: 读取文件的块大小（字节）
+        """
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        # 每个分段：(头部 bytes, 文本内容 bytes 或 文件路径)
+        self._parts: List[Tuple[bytes, Union[bytes, str]]] = []
+        for name, value in fields.items():
+            if isinstance(value, tuple):
+                filename, path, content_type = value
+                header = (f'--{self.boundary}\r\n'
+                          f'Content-Disposition: form-data; name="{_quote(name)}"; filename="{_quote(filename)}"\r\n')
+                if content_type:
+                    header += f'Content-Type: {content_type}\r\n'
+                self._parts.append(((header + '\r\n').encode('utf-8'), path))
+            else:
+                header = f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                self._parts.append((header.encode('utf-8'), str(value).encode('utf-8')))
+        self._footer = f'--{self.boundary}--\r\n'.encode('utf-8')
+        self._length = sum(len(header) + self._body_length(body) + 2 for header, body in self._parts) + len(self._footer)
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._buffer = b''
+
+    @staticmethod
+    def _body_length(body: Union[bytes, str]) -> int:
+        return len(body) if isinstance(body, bytes) else os.path.getsize(body)
+
+    @property
+    def content_type(self) -> str:
+        """请求的 Content-Type 头"""
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _generate(self) -> Iterator[bytes]:
+        for header, body in self._parts:
+            yield header
+            if isinstance(body, bytes):
+                yield body
+            else:
+                with open(body, 'rb') as f:
+                    while True:
+                        chunk = f.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        yield chunk
+            yield b'\r\n'
+        yield self._footer
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        读取请求体的下一段
+
+        Args:
+            size: 最多读取的字节数，负数表示读完剩余全部内容
+        """
+        if self._chunks is None:
+            self._chunks = self._generate()
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def post_file(session: requests.Session, url: str, field_name: str, file_path: str,
+              content_type: Optional[str] = None, fields: Optional[Dict[str, str]] = None,
+              **kwargs) -> requests.Response:
+    """
+    以流式 multipart 请求上传单个文件
+
+    Args:
+        session: 发送请求使用的会话
+        url: 上传地址
+        field_name: 文件字段名
+        file_path: 本地文件路径
+        content_type: 文件分段的 Content-Type，None 表示不写（与 requests 的 files= 行为一致）
+        fields: 随文件一起提交的普通表单字段
+        **kwargs: 其余参数原样传给 `session.post`
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    encoder_fields: Dict[str, FieldValue] = dict(fields or {})
+    encoder_fields[field_name] = (os.path.basename(file_path), file_path, content_type)
+    encoder = MultipartEncoder(encoder_fields)
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Content-Type'] = encoder.content_type
+    return session.post(url, data=encoder, headers=headers, **kwargs)
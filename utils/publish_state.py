@@ -0,0 +1,98 @@
+"""
+发布记录
+
+以 (平台, 账户, 源文件) 为键记录上次发布的结果：平台上的草稿 ID、文章各部分（元数据、正文、
+图片、封面等）的哈希以及生成的正文。文件再次发布时与记录比较，只重新执行受影响的步骤，
+并在平台支持时原地更新已有的草稿，而不是每次修改都创建一篇新草稿。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+class PublishState:
+    """发布记录，可在多个线程间共享。"""
+
+    def __init__(self, db_path: Union[str, Path] = ':memory:'):
+        """
+        Args:
+            db_path: 数据库文件路径，':memory:' 表示仅保存在内存中
+        """
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS published ('
+            ' platform TEXT NOT NULL,'
+            ' account TEXT NOT NULL,'
+            ' source TEXT NOT NULL,'
+            ' state TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' PRIMARY KEY (platform, account, source))'
+        )
+        self._conn.commit()
+
+    def get(self, platform: str, account: str, source: str) -> Optional[Dict[str, Any]]:
+        """
+        查询源文件上次发布的记录
+
+        Returns:
+            发布时保存的记录，没有记录时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT state FROM published WHERE platform = ? AND account = ? AND source = ?',
+                (platform, account, source)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, platform: str, account: str, source: str, state: Dict[str, Any]) -> None:
+        """写入源文件本次发布的记录，替换上次的记录"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO published (platform, account, source, state, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (platform, account, source, json.dumps(state, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def remove(self, platform: str, account: str, source: str) -> None:
+        """删除源文件的发布记录，下次发布时按新文章处理"""
+        with self._lock:
+            self._conn.execute('DELETE FROM published WHERE platform = ? AND account = ? AND source = ?',
+                               (platform, account, source))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_shared_states: Dict[str, PublishState] = {}
+_shared_lock = threading.Lock()
+
+
+def get_publish_state(db_path: Union[str, Path, None] = None) -> PublishState:
+    """
+    获取指定路径的共享发布记录，同一路径在进程内只打开一次
+
+    Args:
+        db_path: 数据库文件路径，None 表示进程内共享的内存数据库
+    """
+    if db_path is None or str(db_path) == ':memory:':
+        key = ':memory:'
+    else:
+        key = str(Path(db_path).resolve())
+    with _shared_lock:
+        state = _shared_states.get(key)
+        if state is None:
+            state = _shared_states[key] = PublishState(key)
+        return state
@@ -0,0 +1,169 @@
+"""
+接口限流与自适应并发控制
+
+每个 (平台, 账户, 接口) 一个 `RateLimiter`，由两部分组成：
+
+- 令牌桶：按配置的速率 (次/秒) 和突发容量放行请求；
+- AIMD 并发控制：同时进行的请求数上限在响应正常时缓慢加一（加性增），
+  遇到平台限流（HTTP 429、微信 45009 等）时减半（乘性减），
+  从而在不触发封禁的前提下逼近平台实际允许的最大吞吐。
+
+同步代码用 `with limiter:`，异步代码用 `async with limiter:`，请求结束后调用
+`record(throttled)` 反馈结果。
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MIN_CONCURRENCY = 1
+# 触发限流后并发上限乘以该系数
+DECREASE_FACTOR = 0.5
+# 两次减半之间的最短间隔（秒），避免同一波在途请求的限流响应把上限连续减到底
+DECREASE_COOLDOWN = 1.0
+# 异步等待并发名额时的轮询间隔（秒）
+ASYNC_POLL_INTERVAL = 0.01
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，默认等于 rate（至少为 1）
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        预定一个令牌
+
+        Returns:
+            需要等待的秒数，0 表示可以立即发送
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 允许令牌数为负，表示已经预定了未来的令牌，后来者按顺序排队
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """AIMD 方式调整上限的并发控制，可在线程和协程间共享"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency: int = DEFAULT_MIN_CONCURRENCY):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._last_decrease = float('-inf')
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def record(self, throttled: bool) -> None:
+        """根据一次请求的结果调整并发上限"""
+        with self._cond:
+            if throttled:
+                now = time.monotonic()
+                if now - self._last_decrease >= DECREASE_COOLDOWN:
+                    self.limit = max(float(self.min_concurrency), self.limit * DECREASE_FACTOR)
+                    self._last_decrease = now
+            else:
+                # 每个"窗口"（约 limit 个成功请求）上限加一
+                previous = int(self.limit)
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                if int(self.limit) > previous:
+                    self._cond.notify_all()
+
+
+class RateLimiter:
+    """单个接口的限流器：令牌桶 + 自适应并发"""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency: int = DEFAULT_MIN_CONCURRENCY):
+        """
+        Args:
+            rate: 每秒允许的请求数，None 表示不限速率（仍做自适应并发控制）
+            burst: 令牌桶容量
+            max_concurrency: 并发上限的最大值，也是初始值
+            min_concurrency: 限流后并发上限的最小值
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> 'RateLimiter':
+        """
+        从配置创建限流器
+
+        Args:
+            config: 形如 {'rate': 2, 'burst': 5, 'max_concurrency': 4, 'min_concurrency': 1}，各项均可省略
+        """
+        config = config or {}
+        return cls(
+            rate=config.get('rate'),
+            burst=config.get('burst'),
+            max_concurrency=config.get('max_concurrency', DEFAULT_MAX_CONCURRENCY),
+            min_concurrency=config.get('min_concurrency', DEFAULT_MIN_CONCURRENCY),
+        )
+
+    def record(self, throttled: bool) -> None:
+        """反馈一次请求是否被平台限流"""
+        self.concurrency.record(throttled)
+
+    def __enter__(self) -> 'RateLimiter':
+        self.concurrency.acquire()
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay > 0:
+                time.sleep(delay)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.concurrency.release()
+
+    async def __aenter__(self) -> 'RateLimiter':
+        while not self.concurrency.try_acquire():
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay > 0:
+                try:
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    # 等待期间被取消时归还并发名额
+                    self.concurrency.release()
+                    raise
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.concurrency.release()
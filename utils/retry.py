@@ -0,0 +1,96 @@
+"""
+接口请求的重试策略
+
+按指数退避计算重试间隔，并使用"全抖动"（在 0 到退避上限之间均匀随机），
+避免多个账户、多个线程在同一时刻失败后又同时重试，对平台形成新一轮的请求尖峰。
+
+哪些失败可以重试由发布器按平台判断（见 `BasePublisher.is_retryable_error` /
+`is_retryable_response`），本模块只提供与平台无关的部分：退避计算、
+Retry-After 解析，以及判断一个网络错误是否发生在请求发出之前。
+"""
+
+import random
+from collections.abc import Mapping
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+
+
+class RetryPolicy:
+    """重试次数与退避间隔"""
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Args:
+            max_attempts: 包括首次请求在内的最多尝试次数，1 表示不重试
+            base_delay: 第一次重试的退避上限（秒），之后每次翻倍
+            max_delay: 退避上限的最大值（秒），也限制 Retry-After 的等待时间
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> 'RetryPolicy':
+        """
+        从配置创建重试策略
+
+        Args:
+            config: 形如 {'max_attempts': 3, 'base_delay': 0.5, 'max_delay': 30}，各项均可省略
+        """
+        config = config or {}
+        return cls(
+            max_attempts=config.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+            base_delay=config.get('base_delay', DEFAULT_BASE_DELAY),
+            max_delay=config.get('max_delay', DEFAULT_MAX_DELAY),
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次尝试失败后的等待时间
+
+        Args:
+            attempt: 刚刚失败的是第几次尝试（从 1 开始）
+            retry_after: 平台通过 Retry-After 要求的最短等待时间（秒）
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def retry_after(response: Any) -> Optional[float]:
+    """读取响应的 Retry-After 头（仅支持秒数形式），没有或无法解析时返回 None"""
+    headers = getattr(response, 'headers', None)
+    if not isinstance(headers, Mapping):
+        return None
+    value = headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def request_not_sent(error: BaseException) -> bool:
+    """
+    网络错误是否发生在请求发出之前（连接建立失败、DNS 解析失败、连接超时）
+
+    这类错误可以安全地重试非幂等的请求；读超时、连接被重置等错误发生时
+    平台可能已经处理了请求，重试可能产生重复的内容。
+    """
+    # 在这里导入：任务队列等只用到 RetryPolicy 的模块不必在启动时加载 requests；
+    # 能走到这里说明已经发出过请求，这些模块早已导入
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+
+    from utils.async_http import AsyncConnectError
+
+    if isinstance(error, (requests.exceptions.ConnectTimeout, AsyncConnectError)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), ConnectTimeoutError)
+    return False
@@ -0,0 +1,133 @@
+"""
+持久化的增量扫描索引
+
+以文件路径为键，记录 (mtime, size, 内容哈希, 各账户发布结果)。
+重启后只需与索引做一次目录比对，内容未变且已成功发布的文件会被跳过。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from utils.file_utils import get_file_checksum
+
+
+@dataclass
+class IndexEntry:
+    """索引中单个文件的记录"""
+    mtime: float
+    size: int
+    content_hash: str
+    results: Dict[str, bool] = field(default_factory=dict)
+
+    @property
+    def succeeded(self) -> bool:
+        """所有账户都发布成功（或文件无需发布）"""
+        return all(self.results.values())
+
+
+class ScanIndex:
+    """基于 SQLite 的扫描索引，可在多个线程间共享。"""
+
+    def __init__(self, db_path: Union[str, Path] = ':memory:'):
+        """
+        Args:
+            db_path: 索引数据库文件路径，':memory:' 表示仅保存在内存中
+        """
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY,'
+            ' mtime REAL NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' results TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        # 启动时一次性载入全部记录，之后的比对只访问内存
+        self._entries: Dict[str, IndexEntry] = {
+            path: IndexEntry(mtime, size, content_hash, json.loads(results))
+            for path, mtime, size, content_hash, results in
+            self._conn.execute('SELECT path, mtime, size, content_hash, results FROM files')
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, path: str) -> Optional[IndexEntry]:
+        """获取文件的索引记录"""
+        return self._entries.get(path)
+
+    def fingerprint(self, path: str) -> IndexEntry:
+        """
+        计算文件当前的指纹；mtime 和 size 与索引一致时复用已记录的哈希
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+            return IndexEntry(stat.st_mtime, stat.st_size, entry.content_hash)
+        return IndexEntry(stat.st_mtime, stat.st_size, get_file_checksum(path, 'sha256'))
+
+    def is_unchanged(self, path: str, current: IndexEntry) -> bool:
+        """内容与上次处理时相同且所有账户都已发布成功，则无需再次处理"""
+        entry = self._entries.get(path)
+        if not entry or entry.content_hash != current.content_hash or not entry.succeeded:
+            return False
+        if entry.mtime != current.mtime or entry.size != current.size:
+            # 仅被 touch 过，刷新 stat 信息，下次比对无需重新计算哈希
+            self.record(path, current, entry.results)
+        return True
+
+    def record(self, path: str, current: IndexEntry, results: Dict[str, bool]) -> None:
+        """写入（或覆盖）文件的处理结果"""
+        entry = IndexEntry(current.mtime, current.size, current.content_hash, dict(results))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files (path, mtime, size, content_hash, results, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (path, entry.mtime, entry.size, entry.content_hash,
+                 json.dumps(entry.results, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+            self._entries[path] = entry
+
+    def remove(self, path: str) -> None:
+        """删除文件的索引记录"""
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self._conn.execute('DELETE FROM files WHERE path = ?', (path,))
+                self._conn.commit()
+
+    def prune(self, existing_paths: Iterable[str]) -> int:
+        """
+        删除已不存在于监控目录中的文件记录
+
+        Returns:
+            被删除的记录数
+        """
+        stale = self._entries.keys() - set(existing_paths)
+        with self._lock:
+            for path in stale:
+                del self._entries[path]
+            self._conn.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in stale])
+            self._conn.commit()
+        return len(stale)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,37 @@
+"""
+启动耗时统计
+
+按步骤记录耗时，启动完成后输出一行汇总，便于发现拖慢启动的步骤。
+"""
+
+import contextlib
+import time
+from typing import Iterator, List, Tuple
+
+
+class StepTimer:
+    """按顺序记录各步骤的耗时"""
+
+    def __init__(self):
+        self.steps: List[Tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """记录 with 块内代码的耗时（抛出异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        """从创建到现在的总耗时（秒）"""
+        return time.perf_counter() - self._start
+
+    def summary(self) -> str:
+        """形如 "加载配置 12ms, 初始化发布器 3ms, 合计 20ms" 的汇总"""
+        parts = [f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.steps]
+        parts.append(f"合计 {self.total * 1000:.0f}ms")
+        return ', '.join(parts)
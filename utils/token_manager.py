@@ -0,0 +1,245 @@
+"""
+访问令牌管理
+
+同一个应用（如同一个微信公众号）在多个线程、多个发布器实例乃至多个进程之间共享一份
+access_token：
+
+- 单飞刷新：同一时刻只有一个线程去请求新令牌，其余线程等待并复用结果；
+- 跨进程共享：令牌写入加了文件锁的磁盘缓存，其他进程直接读取而不是各自重新获取
+  （微信每次获取都会让旧令牌在 5 分钟后失效，各进程各自刷新会互相顶掉）；
+- 提前刷新：后台线程在令牌过期前主动刷新，发布流程中取令牌不必等待网络请求。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from utils.logger import get_logger
+
+logger = get_logger('token_manager')
+
+# 距离过期不足该秒数的令牌视为不可用
+EXPIRY_SAFETY_MARGIN = 60
+# 距离过期不足该秒数时后台线程开始刷新
+DEFAULT_REFRESH_MARGIN = 600
+# 后台刷新失败后的重试间隔（秒）
+REFRESH_RETRY_INTERVAL = 30
+
+# 获取令牌的函数：返回 (令牌, 有效期秒数)，失败返回 None
+TokenFetcher = Callable[[], Optional[Tuple[str, float]]]
+
+
+class FileLock:
+    """基于 fcntl.flock（Windows 上为 msvcrt.locking）的跨进程互斥锁"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # LK_LOCK 重试约 10 秒后仍拿不到锁会抛出 OSError，继续等待即可
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class TokenManager:
+    """单个应用的访问令牌，可在多个线程间共享。"""
+
+    def __init__(self, key: str, fetch: TokenFetcher, cache_file: Union[str, Path, None] = None,
+                 refresh_margin: float = DEFAULT_REFRESH_MARGIN):
+        """
+        Args:
+            key: 令牌在磁盘缓存中的键，如 'wechat:<app_id>'
+            fetch: 向服务器请求新令牌的函数
+            cache_file: 跨进程共享的缓存文件，None 表示只在当前实例内缓存
+            refresh_margin: 距离过期不足该秒数时后台线程开始刷新
+        """
+        self.key = key
+        self.fetch = fetch
+        self.cache_file = str(cache_file) if cache_file else None
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        if self.cache_file:
+            Path(self.cache_file).parent.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def token(self) -> Optional[str]:
+        """当前缓存的令牌（不触发刷新），没有或已不可用时为 None"""
+        return self._token if self._usable(self._token, self._expires_at) else None
+
+    @staticmethod
+    def _usable(token: Optional[str], expires_at: float) -> bool:
+        return bool(token) and time.time() < expires_at - EXPIRY_SAFETY_MARGIN
+
+    def _fresh(self, token: Optional[str], expires_at: float) -> bool:
+        return bool(token) and time.time() < expires_at - self.refresh_margin
+
+    def get(self) -> Optional[str]:
+        """
+        获取可用的令牌，只有在没有可用令牌时才会阻塞等待刷新
+
+        Returns:
+            令牌，获取失败返回 None
+        """
+        token = self.token
+        if token:
+            return token
+        token = self._refresh(self._usable)
+        if token:
+            self._start_refresher()
+        return token
+
+    def refresh(self) -> Optional[str]:
+        """令牌即将过期时刷新（优先采用其他进程已刷新的结果），否则直接返回当前令牌"""
+        return self._refresh(self._fresh)
+
+    def invalidate(self, token: str) -> None:
+        """
+        服务器报告令牌已失效时调用，下次 get() 将重新获取。
+
+        只清除与传入值相同的令牌，避免把其他线程或进程刚刷新的新令牌也清掉。
+        """
+        with self._lock:
+            if self._token == token:
+                self._token, self._expires_at = None, 0.0
+            if self.cache_file:
+                with FileLock(self.cache_file + '.lock'):
+                    entries = self._read_cache()
+                    entry = entries.get(self.key)
+                    if entry and entry.get('access_token') == token:
+                        del entries[self.key]
+                        self._write_cache(entries)
+
+    def close(self) -> None:
+        """停止后台刷新线程"""
+        self._stop.set()
+        refresher = self._refresher
+        if refresher is not None and refresher is not threading.current_thread():
+            refresher.join()
+
+    def _refresh(self, accept: Callable[[Optional[str], float], bool]) -> Optional[str]:
+        """
+        单飞刷新：持有锁后先复查内存与磁盘缓存，仍不满足 accept 时才请求新令牌
+
+        Args:
+            accept: 判断 (令牌, 过期时间) 是否可以直接使用
+        """
+        with self._lock:
+            if accept(self._token, self._expires_at):
+                return self._token
+            if not self.cache_file:
+                return self._fetch()
+
+            with FileLock(self.cache_file + '.lock'):
+                entries = self._read_cache()
+                entry = entries.get(self.key) or {}
+                token, expires_at = entry.get('access_token'), float(entry.get('expires_at', 0))
+                if accept(token, expires_at):
+                    # 其他进程已经刷新过
+                    self._token, self._expires_at = token, expires_at
+                    return token
+                token = self._fetch()
+                if token:
+                    entries[self.key] = {'access_token': token, 'expires_at': self._expires_at}
+                    self._write_cache(entries)
+                return token
+
+    def _fetch(self) -> Optional[str]:
+        """请求新令牌并写入内存，失败时保留仍可用的旧令牌"""
+        result = self.fetch()
+        if not result:
+            return self.token
+        self._token, expires_in = result
+        self._expires_at = time.time() + expires_in
+        return self._token
+
+    def _read_cache(self) -> Dict[str, Dict]:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取令牌缓存 {self.cache_file} 失败，将重新获取: {e}")
+            return {}
+
+    def _write_cache(self, entries: Dict[str, Dict]) -> None:
+        # 先写临时文件再替换，读取方不会看到写了一半的内容
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.warning(f"写入令牌缓存 {self.cache_file} 失败: {e}")
+
+    def _start_refresher(self) -> None:
+        if self._refresher is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name=f'token-{self.key}',
+                                                   daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        """在令牌进入刷新窗口时主动刷新，直到 close()"""
+        delay = 0.0
+        while not self._stop.wait(delay):
+            expires_at = self._expires_at
+            if expires_at - self.refresh_margin > time.time():
+                delay = expires_at - self.refresh_margin - time.time()
+                continue
+            if self._fresh(self.refresh(), self._expires_at):
+                delay = 0.0
+            else:
+                logger.warning(f"后台刷新令牌 {self.key} 失败，{REFRESH_RETRY_INTERVAL} 秒后重试")
+                delay = REFRESH_RETRY_INTERVAL
@@ -0,0 +1,123 @@
+"""
+基于内容哈希的上传缓存
+
+以 (平台, 账户, 类型, 文件内容哈希) 为键记录上传后得到的远程地址或 media_id，
+同一进程内的所有发布器共享同一个缓存实例，数据持久化到 SQLite 文件中以便跨重启复用。
+对于远程地址会过期的平台，写入时指定 TTL，过期记录在读取时失效并在打开时清理。
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class UploadCache:
+    """上传结果缓存，可在多个线程间共享。"""
+
+    def __init__(self, db_path: Union[str, Path] = ':memory:'):
+        """
+        Args:
+            db_path: 缓存数据库文件路径，':memory:' 表示仅保存在内存中
+        """
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS uploads ('
+            ' platform TEXT NOT NULL,'
+            ' account TEXT NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' expires_at REAL,'
+            ' PRIMARY KEY (platform, account, kind, content_hash))'
+        )
+        self._conn.commit()
+        self.evict_expired()
+
+    def get(self, platform: str, account: str, content_hash: str, kind: str = 'image') -> Optional[str]:
+        """
+        查询缓存的上传结果
+
+        Returns:
+            远程地址或 media_id，未命中或已过期返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM uploads '
+                'WHERE platform = ? AND account = ? AND kind = ? AND content_hash = ?',
+                (platform, account, kind, content_hash)
+            ).fetchone()
+        if not row:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def put(self, platform: str, account: str, content_hash: str, value: str,
+            kind: str = 'image', ttl: Optional[float] = None) -> None:
+        """
+        写入上传结果
+
+        Args:
+            ttl: 有效期（秒），None 表示永久有效
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO uploads '
+                '(platform, account, kind, content_hash, value, created_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (platform, account, kind, content_hash, value, now, expires_at)
+            )
+            self._conn.commit()
+
+    def evict_expired(self) -> int:
+        """
+        删除所有已过期的记录
+
+        Returns:
+            被删除的记录数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM uploads WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_shared_caches: Dict[str, UploadCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_upload_cache(db_path: Union[str, Path, None] = None) -> UploadCache:
+    """
+    获取指定路径的共享缓存实例，同一路径在进程内只打开一次
+
+    Args:
+        db_path: 缓存数据库文件路径，None 表示进程内共享的内存缓存
+    """
+    if db_path is None or str(db_path) == ':memory:':
+        key = ':memory:'
+    else:
+        key = str(Path(db_path).resolve())
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = UploadCache(key)
+            _shared_caches[key] = cache
+        return cache
@@ -0,0 +1,375 @@
+"""
+文件变更检测引擎
+
+提供可插拔的目录监控后端：Linux 下使用 inotify 事件驱动，其他平台
+或 inotify 不可用时回退到定时轮询。两种后端都输出经过去抖的
+创建/修改/移入/删除事件。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from utils.logger import get_logger
+
+logger = get_logger('watcher')
+
+EVENT_CREATED = 'created'
+EVENT_MODIFIED = 'modified'
+EVENT_MOVED = 'moved'
+EVENT_DELETED = 'deleted'
+
+
+@dataclass(frozen=True)
+class FileEvent:
+    """一次经过去抖的文件变更事件"""
+    event_type: str
+    path: str
+
+
+def normalize_file_types(file_types: Iterable[str]) -> Tuple[str, ...]:
+    """将 ['md', '.Markdown'] 之类的配置统一为小写且带点的扩展名元组"""
+    return tuple(ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in file_types)
+
+
+def scan_directory(watch_dir: Union[str, Path], file_types: Iterable[str] = ('.md', '.markdown')) -> Dict[str, float]:
+    """
+    遍历目录，返回所有匹配文件的修改时间
+
+    Args:
+        watch_dir: 要遍历的根目录
+        file_types: 需要关注的文件扩展名
+
+    Returns:
+        文件绝对路径到 mtime 的映射
+    """
+    suffixes = normalize_file_types(file_types)
+    states = {}
+    for root, _, files in os.walk(watch_dir):
+        for name in files:
+            if name.lower().endswith(suffixes):
+                path = os.path.join(root, name)
+                try:
+                    states[path] = os.path.getmtime(path)
+                except FileNotFoundError:
+                    # 文件可能在遍历和获取mtime之间被删除
+                    continue
+    return states
+
+
+class BaseWatcher(ABC):
+    """
+    目录监控后端的基类。
+
+    子类只需实现 `_read_raw_events`，去抖与事件合并由基类统一完成：
+    同一路径在 `debounce` 秒内的多次变更只会产生一个事件。
+    """
+
+    backend_name: str = ''
+
+    def __init__(self, watch_dir: Union[str, Path], file_types: Iterable[str] = ('.md', '.markdown'),
+                 debounce: float = 0.5):
+        """
+        Args:
+            watch_dir: 监控的根目录
+            file_types: 需要关注的文件扩展名
+            debounce: 去抖时间（秒），路径在此时间内没有新变更才会被投递
+        """
+        self.watch_dir = str(Path(watch_dir).resolve())
+        self.file_types = normalize_file_types(file_types)
+        self.debounce = debounce
+        self._pending: Dict[str, Tuple[str, float]] = {}
+
+    def is_watched_file(self, path: str) -> bool:
+        """检查路径是否是需要关注的文件类型"""
+        return path.lower().endswith(self.file_types)
+
+    @abstractmethod
+    def _read_raw_events(self, timeout: Optional[float]) -> List[FileEvent]:
+        """
+        读取底层后端产生的原始事件
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待直到有事件
+
+        Returns:
+            原始事件列表，超时返回空列表
+        """
+        raise NotImplementedError
+
+    def _queue(self, event: FileEvent) -> None:
+        """将原始事件合并进待投递队列"""
+        previous = self._pending.get(event.path)
+        event_type = event.event_type
+        if previous:
+            previous_type = previous[0]
+            if event_type == EVENT_DELETED and previous_type == EVENT_CREATED:
+                # 创建后在去抖窗口内又被删除，视为从未出现
+                del self._pending[event.path]
+                return
+            if event_type == EVENT_MODIFIED and previous_type in (EVENT_CREATED, EVENT_MOVED):
+                event_type = previous_type
+        self._pending[event.path] = (event_type, time.monotonic())
+
+    def _pop_ready(self) -> List[FileEvent]:
+        """取出已经稳定超过去抖时间的事件"""
+        now = time.monotonic()
+        ready = [path for path, (_, seen) in self._pending.items() if now - seen >= self.debounce]
+        return [FileEvent(self._pending.pop(path)[0], path) for path in sorted(ready)]
+
+    def wait(self, timeout: Optional[float] = None) -> List[FileEvent]:
+        """
+        阻塞等待去抖后的文件事件
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            事件列表，超时则返回空列表
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ready = self._pop_ready()
+            if ready:
+                return ready
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return []
+
+            wait_for = None if deadline is None else deadline - now
+            if self._pending:
+                oldest = min(seen for _, seen in self._pending.values())
+                until_ready = max(0.0, oldest + self.debounce - now)
+                wait_for = until_ready if wait_for is None else min(wait_for, until_ready)
+
+            for event in self._read_raw_events(wait_for):
+                self._queue(event)
+
+    def close(self) -> None:
+        """释放后端资源"""
+
+    def __enter__(self) -> 'BaseWatcher':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class PollingWatcher(BaseWatcher):
+    """通过定期遍历目录比较 mtime 检测变更的后端，适用于所有平台。"""
+
+    backend_name = 'polling'
+
+    def __init__(self, watch_dir: Union[str, Path], file_types: Iterable[str] = ('.md', '.markdown'),
+                 debounce: float = 0.5, poll_interval: float = 2.0):
+        super().__init__(watch_dir, file_types, debounce)
+        self.poll_interval = poll_interval
+        self._file_states = scan_directory(self.watch_dir, self.file_types)
+        self._next_poll = time.monotonic() + poll_interval
+
+    def _read_raw_events(self, timeout: Optional[float]) -> List[FileEvent]:
+        now = time.monotonic()
+        if now < self._next_poll:
+            sleep_for = self._next_poll - now
+            if timeout is not None and timeout < sleep_for:
+                time.sleep(timeout)
+                return []
+            time.sleep(sleep_for)
+        self._next_poll = time.monotonic() + self.poll_interval
+
+        logger.debug(f"正在轮询目录: {self.watch_dir}")
+        current = scan_directory(self.watch_dir, self.file_types)
+        events = []
+        for path, mtime in current.items():
+            if path not in self._file_states:
+                events.append(FileEvent(EVENT_CREATED, path))
+            elif self._file_states[path] != mtime:
+                events.append(FileEvent(EVENT_MODIFIED, path))
+        for path in self._file_states.keys() - current.keys():
+            events.append(FileEvent(EVENT_DELETED, path))
+        self._file_states = current
+        return events
+
+
+# inotify 常量，参见 <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+               IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher(BaseWatcher):
+    """基于 Linux inotify 的事件驱动后端，目录空闲时不产生任何 CPU 开销。"""
+
+    backend_name = 'inotify'
+
+    def __init__(self, watch_dir: Union[str, Path], file_types: Iterable[str] = ('.md', '.markdown'),
+                 debounce: float = 0.5):
+        super().__init__(watch_dir, file_types, debounce)
+        if not sys.platform.startswith('linux'):
+            raise OSError(f"inotify 仅在 Linux 上可用 (当前平台: {sys.platform})")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 失败: {os.strerror(err)}")
+
+        self._wd_to_dir: Dict[int, str] = {}
+        self._dir_to_wd: Dict[str, int] = {}
+        try:
+            self._add_tree(self.watch_dir)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch 失败: {os.strerror(err)}", directory)
+        self._wd_to_dir[wd] = directory
+        self._dir_to_wd[directory] = wd
+
+    def _add_tree(self, root: str, emit: bool = False) -> List[FileEvent]:
+        """为 root 及其所有子目录添加监控；emit 为 True 时为已存在的文件生成创建事件"""
+        events = []
+        for current, _, files in os.walk(root):
+            self._add_watch(current)
+            if emit:
+                events.extend(FileEvent(EVENT_CREATED, os.path.join(current, name))
+                              for name in files if self.is_watched_file(name))
+        return events
+
+    def _forget_tree(self, root: str) -> None:
+        """目录被移出后清除其下所有监控的路径映射"""
+        prefix = root + os.sep
+        for directory in [d for d in self._dir_to_wd if d == root or d.startswith(prefix)]:
+            wd = self._dir_to_wd.pop(directory)
+            self._wd_to_dir.pop(wd, None)
+
+    def _resync(self) -> List[FileEvent]:
+        """事件队列溢出后重新建立监控，并把所有文件当作已修改重新投递"""
+        logger.warning("inotify 事件队列溢出，正在重新建立监控并扫描监控目录")
+        # 丢失的事件中可能有目录的删除和创建：清除已不存在的目录，为新目录添加监控
+        # （对已监控的目录再次 inotify_add_watch 返回原来的监控描述符）
+        for directory in [d for d in self._dir_to_wd if not os.path.isdir(d)]:
+            self._wd_to_dir.pop(self._dir_to_wd.pop(directory), None)
+        try:
+            self._add_tree(str(self.watch_dir))
+        except OSError as e:
+            logger.warning(f"重新建立监控时出错: {e}")
+        return [FileEvent(EVENT_MODIFIED, path) for path in scan_directory(self.watch_dir, self.file_types)]
+
+    def _read_raw_events(self, timeout: Optional[float]) -> List[FileEvent]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.extend(self._resync())
+                continue
+
+            directory = self._wd_to_dir.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_to_dir.pop(wd, None)
+                if self._dir_to_wd.get(directory) == wd:
+                    del self._dir_to_wd[directory]
+                continue
+
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        events.extend(self._add_tree(path, emit=True))
+                    except OSError as e:
+                        logger.warning(f"无法监控新目录 {path}: {e}")
+                elif mask & IN_MOVED_FROM:
+                    self._forget_tree(path)
+                continue
+
+            if not name or not self.is_watched_file(name):
+                continue
+            if mask & IN_CREATE:
+                events.append(FileEvent(EVENT_CREATED, path))
+            elif mask & IN_MOVED_TO:
+                events.append(FileEvent(EVENT_MOVED, path))
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE):
+                events.append(FileEvent(EVENT_MODIFIED, path))
+            elif mask & (IN_MOVED_FROM | IN_DELETE):
+                events.append(FileEvent(EVENT_DELETED, path))
+        return events
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(watch_dir: Union[str, Path], file_types: Iterable[str] = ('.md', '.markdown'),
+                   backend: str = 'auto', debounce: float = 0.5, poll_interval: float = 2.0) -> BaseWatcher:
+    """
+    根据配置创建监控后端
+
+    Args:
+        watch_dir: 监控的根目录
+        file_types: 需要关注的文件扩展名
+        backend: 'auto'（优先 inotify）、'inotify' 或 'polling'
+        debounce: 去抖时间（秒）
+        poll_interval: 轮询后端的扫描间隔（秒）
+
+    Returns:
+        可用的监控后端实例
+    """
+    backend = (backend or 'auto').lower()
+    if backend not in ('auto', 'inotify', 'polling'):
+        raise ValueError(f"未知的监控后端: {backend}")
+
+    if backend in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(watch_dir, file_types, debounce)
+        except OSError as e:
+            if backend == 'inotify':
+                raise
+            logger.warning(f"inotify 不可用，回退到轮询模式: {e}")
+    elif backend == 'inotify':
+        raise OSError(f"inotify 仅在 Linux 上可用 (当前平台: {sys.platform})")
+
+    return PollingWatcher(watch_dir, file_types, debounce, poll_interval)
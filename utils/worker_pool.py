@@ -0,0 +1,148 @@
+"""
+多进程发布工作池
+
+Markdown 渲染、HTML 改写、样式内联和图片压缩都是 CPU 密集的工作，
+在同一进程的多个线程中受 GIL 限制只能使用一个核心。多进程模式下，
+主进程（协调者）仍负责发现文件、维护扫描索引和任务队列、移动文件，
+只把每个 (文件, 账户) 的 publish 调用交给进程池执行。
+
+每个工作进程启动时读取同一份配置，用 `publisher_factory`（即 main.initialize_publishers）
+创建自己的发布器实例；访问令牌通过令牌缓存文件在进程间共享，任务队列使用
+SQLite WAL，工作进程直接写入发布过程中完成的步骤。
+
+工作进程记录的指标（`utils.metrics`）随每次发布的结果发回协调者合并。
+
+工作进程的日志通过 QueueHandler 发回协调者，由 QueueListener 交给协调者中
+同名的日志记录器处理，写入与单进程模式相同的控制台和日志文件。
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils.config import Config
+from utils.job_queue import JobCheckpoint, JobQueue, activate
+from utils.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# 以下为工作进程内的全局状态，由 _init_worker 设置
+_worker_publishers: Dict[str, Any] = {}
+_worker_job_queue: Optional[JobQueue] = None
+
+
+class _DispatchHandler(logging.Handler):
+    """把工作进程发回的日志记录交给协调者中同名的日志记录器处理"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def _init_worker(log_queue: Any, log_level: int, config_path: str, env_path: str,
+                 publisher_factory: Callable[[Dict], Dict[str, Any]], job_queue_path: Optional[str]) -> None:
+    """工作进程初始化：日志改为发回协调者，创建本进程的发布器"""
+    global _worker_publishers, _worker_job_queue
+
+    root_logger = logging.getLogger()
+    # 以 fork 方式启动时会继承协调者的处理器，写文件和控制台统一交给协调者
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(log_level)
+
+    settings = Config(config_path=config_path, env_path=env_path).get_config()
+    # 每个工作进程已经占用一个核心，图片默认在工作进程内直接转码，不再各自启动转码进程池
+    common = settings['common'] = dict(settings.get('common') or {})
+    common.setdefault('image_workers', 0)
+    _worker_publishers = publisher_factory(settings)
+    if job_queue_path and job_queue_path != ':memory:':
+        _worker_job_queue = JobQueue(job_queue_path)
+
+
+def _publish_in_worker(account_name: str, file_path: str, steps: Dict[str, Dict[str, Any]],
+                       attempts: int) -> Tuple[bool, Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    在工作进程中发布单个文件
+
+    Returns:
+        (是否成功, 任务已完成的步骤, 本进程自上次发布以来的指标增量)
+    """
+    publisher = _worker_publishers.get(account_name)
+    if publisher is None:
+        raise KeyError(f"工作进程中没有账户 '{account_name}' 的发布器")
+    checkpoint = JobCheckpoint(_worker_job_queue, file_path, account_name, steps, attempts)
+    metrics = get_metrics()
+    with activate(checkpoint), metrics.trace() as trace:
+        success = publisher.publish(file_path)
+    logger.info(f"发布耗时 ({account_name}): {trace.summary()}")
+    return bool(success), checkpoint.steps, metrics.drain()
+
+
+class WorkerPool:
+    """执行 publish 调用的进程池，进程意外退出后自动重建"""
+
+    def __init__(self, workers: int, config_path: str, env_path: str,
+                 publisher_factory: Callable[[Dict], Dict[str, Any]],
+                 job_queue_path: Optional[str] = None, log_level: Optional[int] = None,
+                 mp_context: Optional[multiprocessing.context.BaseContext] = None):
+        """
+        Args:
+            workers: 工作进程数
+            config_path: 配置文件路径，工作进程据此创建发布器
+            env_path: 环境变量文件路径
+            publisher_factory: 根据配置字典创建 账户名 -> 发布器 的函数，必须可以被 pickle（模块级函数）
+            job_queue_path: 任务队列数据库路径，工作进程直接写入完成的步骤；None 或 ':memory:' 时
+                由协调者在 publish 返回后写入
+            log_level: 工作进程的日志级别，默认与协调者的根日志记录器相同
+            mp_context: multiprocessing 上下文，默认以 spawn 方式启动：协调者持有 SQLite 连接并运行着
+                多个线程，fork 出的子进程继承这些状态后可能出现数据库锁错误或死锁
+        """
+        self.workers = max(1, int(workers))
+        self._context = mp_context or multiprocessing.get_context('spawn')
+        self._log_queue = self._context.Queue()
+        self._initargs = (self._log_queue, log_level if log_level is not None else logging.getLogger().level,
+                          config_path, env_path, publisher_factory, job_queue_path)
+        self._listener = logging.handlers.QueueListener(self._log_queue, _DispatchHandler())
+        self._listener.start()
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                   initializer=_init_worker, initargs=self._initargs)
+
+    def publish(self, account_name: str, file_path: str, checkpoint: JobCheckpoint) -> bool:
+        """
+        在工作进程中发布文件，阻塞到完成；完成的步骤合并回 checkpoint
+
+        Raises:
+            工作进程中 publish 抛出的异常，或进程意外退出时的 BrokenProcessPool
+        """
+        with self._lock:
+            executor = self._executor
+        try:
+            success, steps, metrics = executor.submit(_publish_in_worker, account_name, file_path,
+                                                      checkpoint.steps, checkpoint.attempts).result()
+        except BrokenProcessPool:
+            with self._lock:
+                # 只重建一次：其他线程可能已经换上了新的进程池
+                if self._executor is executor:
+                    logger.error("发布工作进程意外退出，正在重建进程池")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._create_executor()
+            raise
+        checkpoint.update(steps)
+        # 工作进程中记录的指标合并到协调者，由协调者统一导出
+        get_metrics().merge(metrics)
+        return success
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭进程池，并在处理完剩余的日志后停止日志监听"""
+        with self._lock:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        self._listener.stop()
+        self._log_queue.close()
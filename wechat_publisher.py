@@ -7,17 +7,12 @@ import requests
 import re
 from datetime import datetime, timedelta
 import tempfile
-from pexels_api import API
-from PIL import Image
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 from concurrent.futures import ThreadPoolExecutor
-from markdown import Markdown
-from bs4 import BeautifulSoup
-from premailer import Premailer
 from dotenv import load_dotenv
 import urllib.parse
 
+from utils.multipart import post_file
+
 # --- 1. 日志配置 ---
 class AccountLogFilter(logging.Filter):
     """自定义日志过滤器，为日志记录添加公众号名称。"""
@@ -37,6 +32,9 @@ def setup_logging():
 
 setup_logging()
 
+# 压缩封面图时的最长边（像素），同时限制了解码原图所需的内存
+COMPRESS_MAX_DIMENSION = 1920
+
 # --- 2. 配置加载 ---
 def load_config():
     """加载 .env 和 config.yaml 文件。"""
@@ -64,6 +62,7 @@ class WeChatPublisher:
         image_url = None
         if pexels_api_key:
             try:
+                from pexels_api import API
                 api = API(pexels_api_key)
                 api.search(keywords, page=1, results_per_page=1)
                 photos = api.get_entries()
@@ -205,6 +204,7 @@ class WeChatPublisher:
         self.token_expires_at = 0
         self.session = requests.Session()
         # FIX: 启用一组丰富的Markdown扩展，确保图片、表格等都能被正确解析
+        from markdown import Markdown
         self.markdown_converter = Markdown(extensions=[
             'meta',          # 支持YAML元数据
             'extra',         # 包含表格、围栏代码块、缩写等
@@ -280,6 +280,7 @@ class WeChatPublisher:
         digest = metadata.get('digest', [''])[0]
 
         if not title:
+            from bs4 import BeautifulSoup
             soup = BeautifulSoup(html_body, 'html.parser')
             h1 = soup.find('h1')
             if h1: title = h1.text.strip()
@@ -291,6 +292,7 @@ class WeChatPublisher:
     # FIX:
     # FIX:
     def _upload_and_replace_images(self, html_body, base_path):
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_body, 'html.parser')
         images = soup.find_all('img')
         local_image_paths = []
@@ -387,6 +389,7 @@ class WeChatPublisher:
         try:
             with open(css_path, 'r', encoding='utf-8') as f: css_content = f.read()
             full_html = f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title><style>{css_content}</style></head><body><article class="markdown-body">{html_body}</article></body></html>'
+            from premailer import Premailer
             premailer_instance = Premailer(full_html, remove_classes=True)
             return premailer_instance.transform()
         except FileNotFoundError:
@@ -454,23 +457,21 @@ class WeChatPublisher:
             params['type'] = media_type
 
         try:
-            with open(image_path, 'rb') as f:
-                files = {'media': (os.path.basename(image_path), f)}
-                response = self.session.post(url, files=files, params=params, timeout=30)
-                logging.info(f"[_upload_media] API 响应状态码: {response.status_code} for {image_path}", extra={'account_name': self.account_name})
-                data = response.json()
-                logging.info(f"[_upload_media] API 响应内容: {data}", extra={'account_name': self.account_name})
-                response.raise_for_status()
-                
-                if 'errcode' in data and data['errcode'] != 0:
-                    logging.error(f"微信API错误: {data}", extra={'account_name': self.account_name})
-                    return None
-                if return_key in data:
-                    logging.info(f"[_upload_media] 成功从响应中提取到 '{return_key}'.", extra={'account_name': self.account_name})
-                    return data[return_key]
-                else:
-                    logging.error(f"API响应中缺少键 '{return_key}': {data}", extra={'account_name': self.account_name})
-                    return None
+            response = post_file(self.session, url, 'media', image_path, params=params, timeout=30)
+            logging.info(f"[_upload_media] API 响应状态码: {response.status_code} for {image_path}", extra={'account_name': self.account_name})
+            data = response.json()
+            logging.info(f"[_upload_media] API 响应内容: {data}", extra={'account_name': self.account_name})
+            response.raise_for_status()
+            
+            if 'errcode' in data and data['errcode'] != 0:
+                logging.error(f"微信API错误: {data}", extra={'account_name': self.account_name})
+                return None
+            if return_key in data:
+                logging.info(f"[_upload_media] 成功从响应中提取到 '{return_key}'.", extra={'account_name': self.account_name})
+                return data[return_key]
+            else:
+                logging.error(f"API响应中缺少键 '{return_key}': {data}", extra={'account_name': self.account_name})
+                return None
         except FileNotFoundError:
             logging.error(f"上传媒体失败：文件未找到: {image_path}", extra={'account_name': self.account_name})
             return None
@@ -485,9 +486,14 @@ class WeChatPublisher:
         try:
             if os.path.getsize(image_path) <= max_size_kb * 1024: return image_path, False
             import tempfile
-            img = Image.open(image_path).convert('RGB')
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-            img.save(temp_file.name, 'jpeg', quality=85, optimize=True)
+            from PIL import Image
+            with Image.open(image_path) as img:
+                # JPEG 在解码时直接按 1/2、1/4、1/8 缩小，不必把整张原图解码进内存
+                img.draft('RGB', (COMPRESS_MAX_DIMENSION, COMPRESS_MAX_DIMENSION))
+                img.thumbnail((COMPRESS_MAX_DIMENSION, COMPRESS_MAX_DIMENSION))
+                img = img.convert('RGB')
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
+                img.save(temp_file, 'jpeg', quality=85, optimize=True)
             logging.info(f"图片 {os.path.basename(image_path)} 已压缩至 {os.path.getsize(temp_file.name) / 1024:.2f}KB", extra={'account_name': self.account_name})
             return temp_file.name, True
         except Exception as e:
@@ -531,7 +537,7 @@ class WeChatPublisher:
             return None
 
 # --- 4. 文件监控 ---
-class DocumentWatcher(FileSystemEventHandler):
+class DocumentWatcher:
     """监控文档变化，并将处理任务提交到线程池，包含文件锁去重逻辑。"""
     def __init__(self, publishers, watch_dir, executor):
         self.publishers = publishers
@@ -539,6 +545,13 @@ class DocumentWatcher(FileSystemEventHandler):
         self.executor = executor
         self.processing_files = set()
 
+    def dispatch(self, event):
+        """watchdog 的事件入口：按事件类型分发到 on_modified / on_created。
+        不继承 FileSystemEventHandler，导入本模块时不必加载 watchdog。"""
+        handler = getattr(self, f'on_{event.event_type}', None)
+        if handler is not None:
+            handler(event)
+
     def on_modified(self, event):
         if not event.is_directory and event.src_path.endswith(('.md', '.markdown')):
             self._handle_event(event.src_path)
@@ -645,6 +658,8 @@ def main():
     # 创建一个最大工作线程为3的线程池
     executor = ThreadPoolExecutor(max_workers=3)
 
+    from watchdog.observers import Observer
+
     event_handler = DocumentWatcher(publishers, watch_dir, executor)
     observer = Observer()
     observer.schedule(event_handler, watch_dir, recursive=True)